@@ -0,0 +1,162 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Callable, Iterable, Optional
+
+from app.models import Battle, BattleEvent
+
+
+EffectKey = tuple[str, str]
+# Сколько последних ходов держим в памяти для показа; полная история — в battle_events.
+RECENT_EVENTS = 2
+
+
+class BattleConflict(Exception):
+    # Бой изменили в другой транзакции, пока мы считали ход.
+    def __init__(self, battle_id: int) -> None:
+        super().__init__(f"Battle {battle_id} was changed concurrently")
+        self.battle_id = battle_id
+
+
+@dataclass
+class HotBattle:
+    battle: Battle
+    effects: dict[EffectKey, dict] = field(default_factory=dict)
+    changed: bool = False
+    events: deque[BattleEvent] = field(default_factory=lambda: deque(maxlen=RECENT_EVENTS))
+    # Ходы, ещё не дописанные в battle_events.
+    pending_events: list[BattleEvent] = field(default_factory=list)
+    # Версия, с которой копию взяли в работу; на коммите сверяется с текущей.
+    base_version: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.base_version = self.battle.version
+
+    def copy(self) -> "HotBattle":
+        return HotBattle(
+            battle=replace(self.battle),
+            effects={key: dict(eff) for key, eff in self.effects.items()},
+            events=deque(self.events, maxlen=RECENT_EVENTS),
+            pending_events=list(self.pending_events),
+        )
+
+
+class BattleStore:
+    def __init__(self, idle_ttl: float = 1800.0) -> None:
+        self.idle_ttl = idle_ttl
+        self._battles: dict[int, HotBattle] = {}
+        self._dirty: set[int] = set()
+        self._touched: dict[int, float] = {}
+        # Бои, чей коммит идёт прямо сейчас.
+        self._committing: set[int] = set()
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.flushed_battles = 0
+
+    def checkout(self, battle_id: int) -> Optional[HotBattle]:
+        with self._lock:
+            hot = self._battles.get(battle_id)
+            if hot is None:
+                return None
+            self._touched[battle_id] = time.monotonic()
+            return hot.copy()
+
+    def publish(self, staged: Iterable[HotBattle], commit: Callable[[], None]) -> None:
+        # Compare-and-swap: под локом сверяем версии и бронируем бои, SQL фиксируем уже без лока,
+        # чтобы чтения других боёв не ждали fsync. Из двух транзакций, начавших с одной
+        # версии боя, проходит первая; вторая упрётся в версию или в бронь.
+        staged = list(staged)
+        changed = {hot.battle.id for hot in staged if hot.changed}
+        with self._lock:
+            for hot in staged:
+                if not hot.changed:
+                    continue
+                current = self._battles.get(hot.battle.id)
+                if hot.battle.id in self._committing or (
+                    current is not None and current.battle.version != hot.base_version
+                ):
+                    raise BattleConflict(hot.battle.id)
+            self._committing |= changed
+        try:
+            commit()
+        except BaseException:
+            with self._lock:
+                self._committing -= changed
+            raise
+        with self._lock:
+            self._committing -= changed
+            for hot in staged:
+                battle_id = hot.battle.id
+                # Неизменённый бой, поднятый из БД, тоже становится горячим,
+                # если его не успели занять или забронировать другие.
+                if not hot.changed and (battle_id in self._battles or battle_id in self._committing):
+                    continue
+                if hot.changed:
+                    hot.battle.version = hot.base_version + 1
+                self._battles[battle_id] = hot.copy()
+                self._touched[battle_id] = time.monotonic()
+                if hot.battle.status != "active":
+                    # Итог уже записан в БД в той же транзакции; запись остаётся до вытеснения,
+                    # чтобы опоздавший ход по этому бою упёрся в версию.
+                    self._dirty.discard(battle_id)
+                elif hot.changed:
+                    self._dirty.add(battle_id)
+
+    def take_dirty(self) -> list[HotBattle]:
+        with self._lock:
+            pending = []
+            for battle_id in self._dirty:
+                hot = self._battles[battle_id]
+                pending.append(hot.copy())
+                hot.pending_events.clear()
+            self._dirty.clear()
+            return pending
+
+    def requeue(self, pending: Iterable[HotBattle]) -> None:
+        # Сброс не удался: возвращаем бои в грязные вместе с недописанными ходами.
+        with self._lock:
+            for hot in pending:
+                current = self._battles.get(hot.battle.id)
+                if current is None:
+                    continue
+                current.pending_events[:0] = hot.pending_events
+                self._dirty.add(hot.battle.id)
+
+    def record_flush(self, count: int) -> None:
+        with self._lock:
+            self.flushes += 1
+            self.flushed_battles += count
+
+    def evict_idle(self) -> int:
+        deadline = time.monotonic() - self.idle_ttl
+        with self._lock:
+            stale = [
+                battle_id
+                for battle_id, touched in self._touched.items()
+                if touched < deadline and battle_id not in self._dirty
+            ]
+            for battle_id in stale:
+                self._drop(battle_id)
+            return len(stale)
+
+    def _drop(self, battle_id: int) -> None:
+        self._battles.pop(battle_id, None)
+        self._dirty.discard(battle_id)
+        self._touched.pop(battle_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._battles.clear()
+            self._dirty.clear()
+            self._touched.clear()
+            self._committing.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "active": sum(hot.battle.status == "active" for hot in self._battles.values()),
+                "dirty": len(self._dirty),
+                "flushes": self.flushes,
+                "flushed_battles": self.flushed_battles,
+            }
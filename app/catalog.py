@@ -0,0 +1,169 @@
+import json
+import sqlite3
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Optional
+
+from app.combat.status import compile_effects, parse_effects_json
+from app.models import Achievement, Case, Monster, Skill
+from app.sampling import CasePool
+
+
+def _parse_tags(raw: str) -> tuple[str, ...]:
+    try:
+        data = json.loads(raw) if raw else []
+    except json.JSONDecodeError:
+        return ()
+    return tuple(data) if isinstance(data, list) else ()
+
+
+class GameCatalog:
+    def __init__(
+        self,
+        skills: list[Skill],
+        monsters: list[Monster],
+        cases: list[Case],
+        achievements: list[Achievement],
+    ) -> None:
+        self.skills = tuple(skills)
+        self.monsters = tuple(monsters)
+        self.cases = tuple(sorted(cases, key=lambda case: case.id))
+        self.achievements = tuple(achievements)
+
+        self._skills_by_id = MappingProxyType({skill.id: skill for skill in self.skills})
+        self._skills_by_name = MappingProxyType(
+            {skill.name.lower(): skill for skill in self.skills}
+        )
+        by_rarity: dict[str, list[Skill]] = {}
+        for skill in self.skills:
+            by_rarity.setdefault(skill.rarity, []).append(skill)
+        self._skills_by_rarity = MappingProxyType(
+            {rarity: tuple(items) for rarity, items in by_rarity.items()}
+        )
+
+        self._monsters_by_id = MappingProxyType(
+            {monster.id: monster for monster in self.monsters}
+        )
+        by_rank: dict[str, list[Monster]] = {}
+        for monster in self.monsters:
+            by_rank.setdefault(monster.rank, []).append(monster)
+        self._monsters_by_rank = MappingProxyType(
+            {rank: tuple(items) for rank, items in by_rank.items()}
+        )
+
+        # Правила достижений по счётчику, отсортированы по порогу для bisect.
+        by_counter: dict[str, list[Achievement]] = {}
+        for ach in self.achievements:
+            if ach.counter:
+                by_counter.setdefault(ach.counter, []).append(ach)
+        self._achievement_rules = MappingProxyType(
+            {
+                counter: (
+                    tuple(ach.threshold for ach in rules),
+                    tuple(rules),
+                )
+                for counter, rules in (
+                    (counter, sorted(rules, key=lambda ach: (ach.threshold, ach.id)))
+                    for counter, rules in by_counter.items()
+                )
+            }
+        )
+
+        self._cases_by_id = MappingProxyType({case.id: case for case in self.cases})
+        self._cases_by_name = MappingProxyType(
+            {case.name.lower(): case for case in self.cases}
+        )
+        self._case_pools = MappingProxyType(
+            {
+                case.id: CasePool.build(
+                    case.id, bool(case.allow_hidden), case.weights, self._skills_by_rarity
+                )
+                for case in self.cases
+            }
+        )
+
+    @classmethod
+    def from_connection(cls, conn: sqlite3.Connection) -> "GameCatalog":
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT id, name, type, stamina_cost, damage_multiplier,
+                   range, effect, rarity, hidden, description,
+                   effects_json, combo_tags_json
+            FROM skills
+            ORDER BY id
+            """
+        )
+        skills = [
+            Skill(
+                **row,
+                effects=compile_effects(parse_effects_json(row["effects_json"])),
+                combo_tags=_parse_tags(row["combo_tags_json"]),
+            )
+            for row in cursor.fetchall()
+        ]
+        cursor.execute("SELECT * FROM monsters ORDER BY id")
+        monsters = [Monster(**row) for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT id, name, description, min_rolls, max_rolls,
+                   weights_json, allow_hidden, price
+            FROM cases
+            ORDER BY id
+            """
+        )
+        cases = [
+            Case(**row, weights=MappingProxyType(json.loads(row["weights_json"])))
+            for row in cursor.fetchall()
+        ]
+        cursor.execute("SELECT * FROM achievements ORDER BY id")
+        achievements = [Achievement(**row) for row in cursor.fetchall()]
+        return cls(skills, monsters, cases, achievements)
+
+    def skill(self, skill_id: int) -> Optional[Skill]:
+        return self._skills_by_id.get(skill_id)
+
+    def skill_by_name(self, name: str) -> Optional[Skill]:
+        return self._skills_by_name.get(name.strip().lower())
+
+    def skills_by_rarity(self, rarity: str) -> tuple[Skill, ...]:
+        return self._skills_by_rarity.get(rarity, ())
+
+    def monster(self, monster_id: int) -> Optional[Monster]:
+        return self._monsters_by_id.get(monster_id)
+
+    def monsters_by_rank(self, rank: str) -> tuple[Monster, ...]:
+        # Ранг игрока может быть с плюсами (F+, D++), монстры заведены по букве.
+        return self._monsters_by_rank.get(rank) or self._monsters_by_rank.get(rank[:1], ())
+
+    def achievements_crossed(self, counter: str, old: int, new: int) -> tuple[Achievement, ...]:
+        # Только правила, чей порог лежит в (old, new]: стоимость не зависит от числа достижений.
+        rules = self._achievement_rules.get(counter)
+        if not rules or new <= old:
+            return ()
+        thresholds, achievements = rules
+        return achievements[bisect_right(thresholds, old) : bisect_right(thresholds, new)]
+
+    def case(self, case_id: int) -> Optional[Case]:
+        return self._cases_by_id.get(case_id)
+
+    def case_by_name(self, name: str) -> Optional[Case]:
+        return self._cases_by_name.get(name.strip().lower())
+
+    def case_pool(self, case_id: int) -> Optional[CasePool]:
+        return self._case_pools.get(case_id)
+
+
+_catalog: Optional[GameCatalog] = None
+
+
+def load_catalog(conn: sqlite3.Connection) -> GameCatalog:
+    global _catalog
+    _catalog = GameCatalog.from_connection(conn)
+    return _catalog
+
+
+def get_catalog(conn: sqlite3.Connection) -> GameCatalog:
+    if _catalog is None:
+        return load_catalog(conn)
+    return _catalog
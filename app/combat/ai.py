@@ -1,40 +1,61 @@
 import random
+from bisect import bisect
+from itertools import accumulate
 
-from app.combat.formulas import ATTACK, DEFEND, DODGE, SKILL
+from app.combat.formulas import ACTIONS
 
 
-def choose_monster_action(
-    behavior_type: str, hp: int, max_hp: int, stamina: int
-) -> str:
+# Веса действий в порядке ATTACK, DEFEND, DODGE, SKILL.
+BASE_WEIGHTS = (40, 20, 20, 20)
+BEHAVIORS = ("aggressive", "defensive", "trickster", "berserk", "stamina_drain")
+B_AGGRESSIVE, B_DEFENSIVE, B_TRICKSTER, B_BERSERK, B_STAMINA_DRAIN = range(len(BEHAVIORS))
+# Неизвестное поведение — базовые веса без модификаторов.
+B_NEUTRAL = len(BEHAVIORS)
+BEHAVIOR_CODES = {behavior: code for code, behavior in enumerate(BEHAVIORS)}
+BEHAVIOR_BONUS = (
+    (20, 0, 0, 10),
+    (0, 25, 10, 0),
+    (0, 0, 25, 15),
+    (0, 0, 0, 0),
+    (0, 10, 0, 25),
+    (0, 0, 0, 0),
+)
+BERSERK_BONUS = (30, 0, 0, 20)
+LOW_STAMINA_BONUS = (0, 10, 10, 0)
+
+
+def _cumulative(*parts: tuple[int, ...]) -> tuple[int, ...]:
+    return tuple(accumulate(sum(column) for column in zip(BASE_WEIGHTS, *parts)))
+
+
+# Накопленные веса для random.choices: [поведение][ярость][мало выносливости].
+_NO_BONUS = (0, 0, 0, 0)
+MONSTER_CUM_WEIGHTS = tuple(
+    tuple(
+        tuple(
+            _cumulative(bonus, BERSERK_BONUS if rage else _NO_BONUS, LOW_STAMINA_BONUS if low else _NO_BONUS)
+            for low in (False, True)
+        )
+        for rage in (False, True)
+    )
+    for bonus in BEHAVIOR_BONUS
+)
+
+
+def behavior_code(behavior_type: str) -> int:
+    return BEHAVIOR_CODES.get(behavior_type, B_NEUTRAL)
+
+
+def monster_action_code(
+    behavior: int, hp: int, max_hp: int, stamina: int, rng: random.Random
+) -> int:
     hp_ratio = hp / max_hp if max_hp else 1.0
+    cum = MONSTER_CUM_WEIGHTS[behavior][behavior == B_BERSERK and hp_ratio < 0.35][stamina < 20]
+    # Ровно то, что делает random.choices(k=1): один random() и bisect по накопленным весам.
+    return bisect(cum, rng.random() * cum[-1], 0, len(cum) - 1)
 
-    weights = {
-        ATTACK: 40,
-        DEFEND: 20,
-        DODGE: 20,
-        SKILL: 20,
-    }
-
-    if behavior_type == "aggressive":
-        weights[ATTACK] += 20
-        weights[SKILL] += 10
-    elif behavior_type == "defensive":
-        weights[DEFEND] += 25
-        weights[DODGE] += 10
-    elif behavior_type == "trickster":
-        weights[DODGE] += 25
-        weights[SKILL] += 15
-    elif behavior_type == "berserk":
-        if hp_ratio < 0.35:
-            weights[ATTACK] += 30
-            weights[SKILL] += 20
-    elif behavior_type == "stamina_drain":
-        weights[SKILL] += 25
-        weights[DEFEND] += 10
-
-    if stamina < 20:
-        weights[DEFEND] += 10
-        weights[DODGE] += 10
-
-    choices, probs = zip(*weights.items())
-    return random.choices(choices, weights=probs, k=1)[0]
+
+def choose_monster_action(
+    behavior_type: str, hp: int, max_hp: int, stamina: int, rng: random.Random
+) -> str:
+    return ACTIONS[monster_action_code(behavior_code(behavior_type), hp, max_hp, stamina, rng)]
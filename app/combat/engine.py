@@ -1,24 +1,30 @@
 from dataclasses import dataclass
 import random
 
-from app.combat.ai import choose_monster_action
+from app.combat.ai import behavior_code, monster_action_code
 from app.combat.formulas import (
-    ATTACK,
-    DEFEND,
-    DODGE,
-    SKILL,
-    SKIP,
-    STAMINA_COSTS,
+    A_DODGE,
+    A_SKILL,
+    ACTION_CODES,
+    ACTIONS,
+    COUNTER_RULES,
+    CRIT,
+    HIT,
     MAX_STAMINA,
-    DamageResult,
+    MISS,
+    POSITION_CODES,
+    POSITION_CRIT_BONUS,
+    POSITION_DAMAGE_MOD,
+    POSITION_DODGE_BONUS,
+    POSITION_SHIFT,
     POSITIONS,
-    clamp_stamina,
-    compute_damage,
+    STAMINA_DELTA,
+    base_damage,
 )
-from app.ui import templates
+from app.combat.status import Modifiers
 
 
-@dataclass
+@dataclass(slots=True)
 class FighterState:
     name: str
     hp: int
@@ -27,37 +33,103 @@ class FighterState:
     defense: int
     luck: int
     max_hp: int
-
-
-def apply_stamina(action: str, stamina: int, override_cost: int | None = None) -> int:
-    if override_cost is not None:
-        delta = -abs(override_cost)
+    # Модификаторы хода (бонусы эффектов в процентах, цена и множитель навыка).
+    ignore_def_pct: float = 0.0
+    damage_pct: float = 0.0
+    crit_pct: float = 0.0
+    dodge_pct: float = 0.0
+    skill_cost: int | None = None
+    skill_multiplier: float = 1.0
+    # Итог последнего удара: урон и HIT/CRIT/MISS.
+    dealt: int = 0
+    hit: int = HIT
+
+    def set_modifiers(self, bonus: Modifiers, skill_cost: int | None, skill_multiplier: float) -> None:
+        self.ignore_def_pct = bonus.ignore_def_pct
+        self.damage_pct = bonus.damage_pct
+        self.crit_pct = bonus.crit_pct
+        self.dodge_pct = bonus.dodge_pct
+        self.skill_cost = skill_cost
+        self.skill_multiplier = skill_multiplier
+
+
+def spend_stamina(fighter: FighterState, action: int) -> None:
+    if fighter.skill_cost is not None:
+        stamina = fighter.stamina - abs(fighter.skill_cost)
     else:
-        delta = STAMINA_COSTS.get(action, 0)
-    return clamp_stamina(stamina + delta)
-
-
-def _roll_damage_log(actor: str, result: DamageResult) -> str:
-    if result.was_miss:
-        return f"🏃 {actor} промахивается."
-    if result.is_crit:
-        return f"💥 {actor} наносит критический удар на {result.damage}."
-    return f"⚔️ {actor} наносит {result.damage} урона."
+        stamina = fighter.stamina + STAMINA_DELTA[action]
+    fighter.stamina = 0 if stamina < 0 else MAX_STAMINA if stamina > MAX_STAMINA else stamina
+
+
+def strike(
+    attacker: FighterState,
+    defender: FighterState,
+    attacker_action: int,
+    defender_action: int,
+    position: int,
+    rng: random.Random,
+) -> None:
+    effective_def = int(defender.defense * (1 - attacker.ignore_def_pct / 100))
+    damage = base_damage(attacker.atk, effective_def if effective_def > 0 else 0)
+    if attacker_action == A_SKILL:
+        damage = int(damage * attacker.skill_multiplier)
+    damage = int(damage * POSITION_DAMAGE_MOD[attacker_action][position])
+    if attacker.damage_pct:
+        damage = int(damage * (1 + attacker.damage_pct / 100))
+    if attacker.stamina <= 0:
+        damage = max(1, int(damage * 0.7))
+
+    counter = COUNTER_RULES[attacker_action][defender_action]
+    if counter is None:
+        attacker.dealt = 0
+        attacker.hit = MISS
+        return
+    damage = int(damage * counter)
+
+    dodge_chance = 0.05 + defender.luck * 0.003
+    if defender_action == A_DODGE:
+        dodge_chance += 0.25
+    dodge_chance += POSITION_DODGE_BONUS[position]
+    dodge_chance += defender.dodge_pct / 100
+    if rng.random() < max(0.0, min(0.6, dodge_chance)):
+        attacker.dealt = 0
+        attacker.hit = MISS
+        return
+
+    crit_chance = attacker.luck * 0.005
+    crit_chance += POSITION_CRIT_BONUS[position]
+    crit_chance += attacker.crit_pct / 100
+    if rng.random() < max(0.0, min(0.5, crit_chance)):
+        attacker.dealt = damage * 2
+        attacker.hit = CRIT
+    else:
+        attacker.dealt = damage
+        attacker.hit = HIT
 
 
-def _shift_position(current: str, player_action: str, enemy_action: str) -> str:
-    idx = POSITIONS.index(current)
-    delta = 0
-    if player_action == ATTACK:
-        delta -= 1
-    elif player_action == DODGE:
-        delta += 1
-    if enemy_action == ATTACK:
-        delta -= 1
-    elif enemy_action == DODGE:
-        delta += 1
-    new_idx = max(0, min(len(POSITIONS) - 1, idx + delta))
-    return POSITIONS[new_idx]
+def resolve_turn(
+    player: FighterState,
+    enemy: FighterState,
+    player_action: int,
+    enemy_action: int,
+    position: int,
+    rng: random.Random,
+    spread: bool = False,
+) -> int:
+    spend_stamina(player, player_action)
+    spend_stamina(enemy, enemy_action)
+    strike(player, enemy, player_action, enemy_action, position, rng)
+    strike(enemy, player, enemy_action, player_action, position, rng)
+    if spread:
+        # ±10% randomness for PVP balance
+        player.dealt = int(player.dealt * rng.uniform(0.9, 1.1))
+        enemy.dealt = int(enemy.dealt * rng.uniform(0.9, 1.1))
+
+    enemy.hp = max(0, enemy.hp - player.dealt)
+    player.hp = max(0, player.hp - enemy.dealt)
+
+    new_position = position + POSITION_SHIFT[player_action] + POSITION_SHIFT[enemy_action]
+    return 0 if new_position < 0 else 2 if new_position > 2 else new_position
 
 
 def process_pve_turn(
@@ -65,78 +137,33 @@ def process_pve_turn(
     player: FighterState,
     monster: FighterState,
     monster_behavior: str,
-    battle_turn: int,
     position: str,
-    player_bonus: dict,
-    monster_bonus: dict,
-    player_status_text: str,
-    monster_status_text: str,
-    combo_text: str,
+    player_bonus: Modifiers,
+    monster_bonus: Modifiers,
     player_skill_cost: int | None,
     monster_skill_cost: int | None,
     player_skill_multiplier: float,
     monster_skill_multiplier: float,
-) -> tuple[str, str, int, int, int, int, bool, bool, str]:
-    monster_action = choose_monster_action(
-        monster_behavior, monster.hp, monster.max_hp, monster.stamina
+    rng: random.Random,
+) -> tuple[str, int, int, int, int, bool, bool, str]:
+    monster_code = monster_action_code(
+        behavior_code(monster_behavior), monster.hp, monster.max_hp, monster.stamina, rng
     )
-
-    player.stamina = apply_stamina(player_action, player.stamina, player_skill_cost)
-    monster.stamina = apply_stamina(monster_action, monster.stamina, monster_skill_cost)
-
-    player_damage = compute_damage(
-        atk=player.atk,
-        defense=monster.defense,
-        attacker_action=player_action,
-        defender_action=monster_action,
-        attacker_luck=player.luck,
-        attacker_stamina=player.stamina,
-        defender_luck=monster.luck,
-        position=position,
-        ignore_def_pct=player_bonus.get("ignore_def_pct", 0.0),
-        bonus_damage_pct=player_bonus.get("damage_pct", 0.0),
-        bonus_crit_pct=player_bonus.get("crit_pct", 0.0),
-        bonus_dodge_pct=monster_bonus.get("dodge_pct", 0.0),
-        skill_multiplier=player_skill_multiplier if player_action == SKILL else 1.0,
-    )
-    monster_damage = compute_damage(
-        atk=monster.atk,
-        defense=player.defense,
-        attacker_action=monster_action,
-        defender_action=player_action,
-        attacker_luck=monster.luck,
-        attacker_stamina=monster.stamina,
-        defender_luck=player.luck,
-        position=position,
-        ignore_def_pct=monster_bonus.get("ignore_def_pct", 0.0),
-        bonus_damage_pct=monster_bonus.get("damage_pct", 0.0),
-        bonus_crit_pct=monster_bonus.get("crit_pct", 0.0),
-        bonus_dodge_pct=player_bonus.get("dodge_pct", 0.0),
-        skill_multiplier=monster_skill_multiplier if monster_action == SKILL else 1.0,
-    )
-
-    monster.hp = max(0, monster.hp - player_damage.damage)
-    player.hp = max(0, player.hp - monster_damage.damage)
-
-    new_position = _shift_position(position, player_action, monster_action)
-    log_lines = [
-        templates.round_header(battle_turn),
-        templates.round_separator(),
-        f"🧍 Дистанция: {templates.distance_visual(position)}",
-        f"⚡ STA: Игрок {player.stamina} | Монстр {monster.stamina}",
-        f"🧪 Эффекты: Игрок {player_status_text} | Монстр {monster_status_text}",
-        combo_text,
-        f"🧝 Игрок -> {templates.action_label(player_action)} | 👹 Монстр -> {templates.action_label(monster_action)}",
-        f"📍 Позиция: {templates.position_label(position)} → {templates.position_label(new_position)}",
-        _roll_damage_log("Игрок", player_damage),
-        _roll_damage_log(monster.name, monster_damage),
-        f"❤️ HP Игрока: {player.hp} | 💀 HP Монстра: {monster.hp}",
-        templates.round_separator(),
+    player.set_modifiers(player_bonus, player_skill_cost, player_skill_multiplier)
+    monster.set_modifiers(monster_bonus, monster_skill_cost, monster_skill_multiplier)
+    new_position = POSITIONS[
+        resolve_turn(
+            player,
+            monster,
+            ACTION_CODES[player_action],
+            monster_code,
+            POSITION_CODES[position],
+            rng,
+        )
     ]
 
     return (
-        monster_action,
-        "\n".join(log_lines),
+        ACTIONS[monster_code],
         player.hp,
         player.stamina,
         monster.hp,
@@ -152,78 +179,31 @@ def process_pvp_turn(
     enemy_action: str,
     player: FighterState,
     enemy: FighterState,
-    battle_turn: int,
     position: str,
-    player_bonus: dict,
-    enemy_bonus: dict,
-    player_status_text: str,
-    enemy_status_text: str,
-    combo_text: str,
+    player_bonus: Modifiers,
+    enemy_bonus: Modifiers,
     player_skill_cost: int | None,
     enemy_skill_cost: int | None,
     player_skill_multiplier: float,
     enemy_skill_multiplier: float,
-) -> tuple[str, str, int, int, int, int, bool, bool, str]:
-    player.stamina = apply_stamina(player_action, player.stamina, player_skill_cost)
-    enemy.stamina = apply_stamina(enemy_action, enemy.stamina, enemy_skill_cost)
-
-    player_damage = compute_damage(
-        atk=player.atk,
-        defense=enemy.defense,
-        attacker_action=player_action,
-        defender_action=enemy_action,
-        attacker_luck=player.luck,
-        attacker_stamina=player.stamina,
-        defender_luck=enemy.luck,
-        position=position,
-        ignore_def_pct=player_bonus.get("ignore_def_pct", 0.0),
-        bonus_damage_pct=player_bonus.get("damage_pct", 0.0),
-        bonus_crit_pct=player_bonus.get("crit_pct", 0.0),
-        bonus_dodge_pct=enemy_bonus.get("dodge_pct", 0.0),
-        skill_multiplier=player_skill_multiplier if player_action == SKILL else 1.0,
-    )
-    enemy_damage = compute_damage(
-        atk=enemy.atk,
-        defense=player.defense,
-        attacker_action=enemy_action,
-        defender_action=player_action,
-        attacker_luck=enemy.luck,
-        attacker_stamina=enemy.stamina,
-        defender_luck=player.luck,
-        position=position,
-        ignore_def_pct=enemy_bonus.get("ignore_def_pct", 0.0),
-        bonus_damage_pct=enemy_bonus.get("damage_pct", 0.0),
-        bonus_crit_pct=enemy_bonus.get("crit_pct", 0.0),
-        bonus_dodge_pct=player_bonus.get("dodge_pct", 0.0),
-        skill_multiplier=enemy_skill_multiplier if enemy_action == SKILL else 1.0,
-    )
-
-    # ±10% randomness for PVP balance
-    player_damage.damage = int(player_damage.damage * random.uniform(0.9, 1.1))
-    enemy_damage.damage = int(enemy_damage.damage * random.uniform(0.9, 1.1))
-
-    enemy.hp = max(0, enemy.hp - player_damage.damage)
-    player.hp = max(0, player.hp - enemy_damage.damage)
-
-    new_position = _shift_position(position, player_action, enemy_action)
-    log_lines = [
-        templates.round_header(battle_turn),
-        templates.round_separator(),
-        f"🧍 Дистанция: {templates.distance_visual(position)}",
-        f"⚡ STA: Игрок {player.stamina} | Противник {enemy.stamina}",
-        f"🧪 Эффекты: Игрок {player_status_text} | Противник {enemy_status_text}",
-        combo_text,
-        f"🧝 Игрок -> {templates.action_label(player_action)} | 🧟 Противник -> {templates.action_label(enemy_action)}",
-        f"📍 Позиция: {templates.position_label(position)} → {templates.position_label(new_position)}",
-        _roll_damage_log("Игрок", player_damage),
-        _roll_damage_log("Противник", enemy_damage),
-        f"❤️ HP Игрока: {player.hp} | 💀 HP Противника: {enemy.hp}",
-        templates.round_separator(),
+    rng: random.Random,
+) -> tuple[str, int, int, int, int, bool, bool, str]:
+    player.set_modifiers(player_bonus, player_skill_cost, player_skill_multiplier)
+    enemy.set_modifiers(enemy_bonus, enemy_skill_cost, enemy_skill_multiplier)
+    new_position = POSITIONS[
+        resolve_turn(
+            player,
+            enemy,
+            ACTION_CODES[player_action],
+            ACTION_CODES[enemy_action],
+            POSITION_CODES[position],
+            rng,
+            spread=True,
+        )
     ]
 
     return (
         enemy_action,
-        "\n".join(log_lines),
         player.hp,
         player.stamina,
         enemy.hp,
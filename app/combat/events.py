@@ -0,0 +1,102 @@
+from typing import Iterable, Optional
+
+from app.combat.engine import FighterState
+from app.combat.formulas import CRIT, MISS
+from app.combat.status import summarize_effects
+from app.models import Battle, BattleEvent
+from app.ui import templates
+
+
+def effects_snapshot(rows: Iterable) -> tuple[tuple[str, int, int], ...]:
+    return tuple((row["effect_type"], row["duration"], row["stacks"]) for row in rows)
+
+
+def combo_snapshot(state: dict) -> tuple[int, int, int]:
+    return (int(state["active"]), state["steps"], state["remaining"])
+
+
+def turn_event(
+    battle: Battle,
+    player_action: str,
+    enemy_action: str,
+    new_position: str,
+    player: FighterState,
+    enemy: FighterState,
+    player_effects: Iterable,
+    enemy_effects: Iterable,
+    player_combo: dict,
+    enemy_combo: Optional[dict] = None,
+) -> BattleEvent:
+    # Вызывается до того, как ход записан в battle: turn, position и rng_draws — на начало хода.
+    return BattleEvent(
+        turn=battle.turn,
+        rng_draws=battle.rng_draws,
+        player_action=player_action,
+        enemy_action=enemy_action,
+        player_damage=player.dealt,
+        player_hit=player.hit,
+        enemy_damage=enemy.dealt,
+        enemy_hit=enemy.hit,
+        position_from=battle.position,
+        position_to=new_position,
+        player_hp=player.hp,
+        player_stamina=player.stamina,
+        enemy_hp=enemy.hp,
+        enemy_stamina=enemy.stamina,
+        player_effects=effects_snapshot(player_effects),
+        enemy_effects=effects_snapshot(enemy_effects),
+        player_combo=combo_snapshot(player_combo),
+        enemy_combo=combo_snapshot(enemy_combo) if enemy_combo is not None else None,
+    )
+
+
+def _hit_text(actor: str, hit: int, damage: int) -> str:
+    if hit == MISS:
+        return f"🏃 {actor} промахивается."
+    if hit == CRIT:
+        return f"💥 {actor} наносит критический удар на {damage}."
+    return f"⚔️ {actor} наносит {damage} урона."
+
+
+def _effects_text(effects: tuple[tuple[str, int, int], ...]) -> str:
+    return summarize_effects(
+        [{"effect_type": name, "duration": duration, "stacks": stacks} for name, duration, stacks in effects]
+    )
+
+
+def _combo_text(event: BattleEvent) -> str:
+    if event.enemy_combo is not None:
+        return (
+            f"🔗 Комбо: Игрок {event.player_combo[1]}/{event.player_combo[2]} | "
+            f"Противник {event.enemy_combo[1]}/{event.enemy_combo[2]}"
+        )
+    active, steps, remaining = event.player_combo
+    return f"🔗 Комбо: шагов {steps} | осталось {remaining}" if active else "🔗 Комбо: нет"
+
+
+def render_battle_event(event: BattleEvent, monster_name: Optional[str] = None) -> str:
+    # Без имени монстра — дуэль.
+    enemy_label, enemy_icon, enemy_actor, enemy_hp = (
+        ("Монстр", "👹", monster_name, "Монстра")
+        if monster_name is not None
+        else ("Противник", "🧟", "Противник", "Противника")
+    )
+    return "\n".join(
+        (
+            templates.round_header(event.turn),
+            templates.round_separator(),
+            f"🧍 Дистанция: {templates.distance_visual(event.position_from)}",
+            f"⚡ STA: Игрок {event.player_stamina} | {enemy_label} {event.enemy_stamina}",
+            f"🧪 Эффекты: Игрок {_effects_text(event.player_effects)} | "
+            f"{enemy_label} {_effects_text(event.enemy_effects)}",
+            _combo_text(event),
+            f"🧝 Игрок -> {templates.action_label(event.player_action)} | "
+            f"{enemy_icon} {enemy_label} -> {templates.action_label(event.enemy_action)}",
+            f"📍 Позиция: {templates.position_label(event.position_from)} → "
+            f"{templates.position_label(event.position_to)}",
+            _hit_text("Игрок", event.player_hit, event.player_damage),
+            _hit_text(enemy_actor, event.enemy_hit, event.enemy_damage),
+            f"❤️ HP Игрока: {event.player_hp} | 💀 HP {enemy_hp}: {event.enemy_hp}",
+            templates.round_separator(),
+        )
+    )
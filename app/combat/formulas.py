@@ -1,7 +1,3 @@
-import random
-from dataclasses import dataclass
-
-
 ATTACK = "ATTACK"
 DEFEND = "DEFEND"
 SKILL = "SKILL"
@@ -19,13 +15,38 @@ STAMINA_COSTS = {
 MAX_STAMINA = 100
 POSITIONS = ("far", "medium", "close")
 
-
-@dataclass
-class DamageResult:
-    damage: int
-    is_crit: bool
-    was_miss: bool
-    dodge_chance: float
+# Целочисленные коды для горячего цикла боя — это индексы в таблицах ниже.
+# Первые четыре действия идут в порядке весов ИИ монстра.
+ACTIONS = (ATTACK, DEFEND, DODGE, SKILL, SKIP)
+A_ATTACK, A_DEFEND, A_DODGE, A_SKILL, A_SKIP = range(len(ACTIONS))
+ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+P_FAR, P_MEDIUM, P_CLOSE = range(len(POSITIONS))
+POSITION_CODES = {position: code for code, position in enumerate(POSITIONS)}
+HIT, CRIT, MISS = range(3)
+
+STAMINA_DELTA = tuple(STAMINA_COSTS[action] for action in ACTIONS)
+# Дистанция меняет урон только обычной атаки: [действие][позиция].
+POSITION_DAMAGE_MOD = tuple(
+    (0.9, 1.0, 1.2) if action == ATTACK else (1.0, 1.0, 1.0) for action in ACTIONS
+)
+POSITION_DODGE_BONUS = (0.20, 0.0, -0.10)
+POSITION_CRIT_BONUS = (-0.03, 0.0, 0.05)
+# Атака сокращает шаг дистанции к "far", уклонение — к "close" (индекс в POSITIONS).
+POSITION_SHIFT = tuple(-1 if action == ATTACK else 1 if action == DODGE else 0 for action in ACTIONS)
+# Контр-правила [атакующий][защищающийся]: множитель урона, None — гарантированный промах.
+COUNTER_RULES = tuple(
+    tuple(
+        None
+        if attacker in (ATTACK, SKILL) and defender == DODGE
+        else 0.5
+        if attacker == ATTACK and defender == DEFEND
+        else 1.3
+        if attacker == SKILL and defender == DEFEND
+        else 1.0
+        for defender in ACTIONS
+    )
+    for attacker in ACTIONS
+)
 
 
 def clamp_stamina(value: int) -> int:
@@ -35,112 +56,3 @@ def clamp_stamina(value: int) -> int:
 def base_damage(atk: int, defense: int) -> int:
     raw = int(atk - (defense * 0.5))
     return max(1, raw)
-
-
-def position_damage_modifier(position: str, attacker_action: str) -> float:
-    if attacker_action != ATTACK:
-        return 1.0
-    if position == "close":
-        return 1.2
-    if position == "far":
-        return 0.9
-    return 1.0
-
-
-def position_dodge_bonus(position: str) -> float:
-    if position == "close":
-        return -0.10
-    if position == "far":
-        return 0.20
-    return 0.0
-
-
-def apply_stamina_penalty(damage: int, stamina: int) -> int:
-    if stamina <= 0:
-        return max(1, int(damage * 0.7))
-    return damage
-
-
-def apply_counter_rules(
-    damage: int, attacker_action: str, defender_action: str
-) -> DamageResult:
-    if attacker_action == ATTACK and defender_action == DEFEND:
-        return DamageResult(
-            damage=int(damage * 0.5), is_crit=False, was_miss=False, dodge_chance=0.0
-        )
-    if attacker_action == ATTACK and defender_action == DODGE:
-        return DamageResult(damage=0, is_crit=False, was_miss=True, dodge_chance=1.0)
-    if attacker_action == SKILL and defender_action == DEFEND:
-        return DamageResult(
-            damage=int(damage * 1.3), is_crit=False, was_miss=False, dodge_chance=0.0
-        )
-    if attacker_action == SKILL and defender_action == DODGE:
-        return DamageResult(damage=0, is_crit=False, was_miss=True, dodge_chance=1.0)
-    return DamageResult(damage=damage, is_crit=False, was_miss=False, dodge_chance=0.0)
-
-
-def apply_crit(damage: int, luck: int, position: str, bonus_crit: float = 0.0) -> DamageResult:
-    crit_chance = luck * 0.005
-    if position == "close":
-        crit_chance += 0.05
-    elif position == "far":
-        crit_chance -= 0.03
-    crit_chance += bonus_crit
-    crit_chance = max(0.0, min(0.5, crit_chance))
-    if random.random() < crit_chance:
-        return DamageResult(
-            damage=damage * 2, is_crit=True, was_miss=False, dodge_chance=0.0
-        )
-    return DamageResult(damage=damage, is_crit=False, was_miss=False, dodge_chance=0.0)
-
-
-def roll_dodge(defender_luck: int, defender_action: str, position: str, bonus_dodge: float = 0.0) -> float:
-    base = 0.05 + defender_luck * 0.003
-    if defender_action == DODGE:
-        base += 0.25
-    base += position_dodge_bonus(position)
-    base += bonus_dodge
-    return max(0.0, min(0.6, base))
-
-
-def compute_damage(
-    atk: int,
-    defense: int,
-    attacker_action: str,
-    defender_action: str,
-    attacker_luck: int,
-    attacker_stamina: int,
-    defender_luck: int,
-    position: str,
-    ignore_def_pct: float = 0.0,
-    bonus_damage_pct: float = 0.0,
-    bonus_crit_pct: float = 0.0,
-    bonus_dodge_pct: float = 0.0,
-    skill_multiplier: float = 1.0,
-) -> DamageResult:
-    effective_def = int(defense * (1 - ignore_def_pct / 100))
-    damage = base_damage(atk, max(0, effective_def))
-    if attacker_action == SKILL:
-        damage = int(damage * skill_multiplier)
-    damage = int(damage * position_damage_modifier(position, attacker_action))
-    if bonus_damage_pct:
-        damage = int(damage * (1 + bonus_damage_pct / 100))
-    damage = apply_stamina_penalty(damage, attacker_stamina)
-
-    counter_result = apply_counter_rules(damage, attacker_action, defender_action)
-    if counter_result.was_miss:
-        return counter_result
-
-    dodge_chance = roll_dodge(defender_luck, defender_action, position, bonus_dodge_pct / 100)
-    if random.random() < dodge_chance:
-        return DamageResult(
-            damage=0, is_crit=False, was_miss=True, dodge_chance=dodge_chance
-        )
-
-    crit_result = apply_crit(counter_result.damage, attacker_luck, position, bonus_crit_pct / 100)
-    return DamageResult(
-        damage=crit_result.damage,
-        is_crit=crit_result.is_crit,
-        was_miss=False,
-        dodge_chance=dodge_chance,
-    )
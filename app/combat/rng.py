@@ -0,0 +1,27 @@
+import random
+import secrets
+
+
+def new_battle_seed() -> int:
+    return secrets.randbits(63)
+
+
+class BattleRng(random.Random):
+    # Собственный ГСЧ боя: сид лежит в battles.rng_seed, число бросков — в rng_draws.
+    # Раз random() переопределён, а getrandbits нет, Random сводит к нему и choice/randint,
+    # поэтому состояние восстанавливается перемоткой на draws бросков.
+    def __init__(self, seed: int, draws: int = 0) -> None:
+        super().__init__(seed)
+        self.seed_value = seed
+        self.draws = 0
+        self.skip(draws)
+
+    def random(self) -> float:
+        self.draws += 1
+        return super().random()
+
+    def skip(self, count: int) -> None:
+        draw = super().random
+        for _ in range(count):
+            draw()
+        self.draws += count
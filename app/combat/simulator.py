@@ -0,0 +1,420 @@
+import argparse
+import math
+import random
+import sys
+from dataclasses import dataclass
+from typing import Mapping, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover
+    raise RuntimeError("Симулятору баланса нужен numpy: pip install numpy") from exc
+
+from app.combat import ai
+from app.combat.engine import FighterState, resolve_turn
+from app.combat.formulas import (
+    A_DODGE,
+    A_SKILL,
+    ACTION_CODES,
+    ACTIONS,
+    ATTACK,
+    COUNTER_RULES,
+    MAX_STAMINA,
+    P_MEDIUM,
+    POSITION_CRIT_BONUS,
+    POSITION_DAMAGE_MOD,
+    POSITION_DODGE_BONUS,
+    POSITION_SHIFT,
+    STAMINA_DELTA,
+)
+from app.game_data import MONSTER_SEED
+from app.models import Monster
+from app.progression import level_stat_growth
+
+
+# Таблицы боевого ядра в виде массивов, индексы — коды действий и позиций.
+STAMINA_DELTA_ARR = np.array(STAMINA_DELTA, dtype=np.int64)
+POSITION_DAMAGE_ARR = np.array(POSITION_DAMAGE_MOD)
+DODGE_POSITION_ARR = np.array(POSITION_DODGE_BONUS)
+CRIT_POSITION_ARR = np.array(POSITION_CRIT_BONUS)
+POSITION_SHIFT_ARR = np.array(POSITION_SHIFT, dtype=np.int64)
+COUNTER_MOD = np.array([[0.0 if mod is None else mod for mod in row] for row in COUNTER_RULES])
+COUNTER_MISS = np.array([[mod is None for mod in row] for row in COUNTER_RULES])
+
+# Веса ИИ монстра по поведению, последняя строка — неизвестное поведение.
+BEHAVIOR_WEIGHTS = np.array(ai.BASE_WEIGHTS, dtype=np.float64) + np.array(ai.BEHAVIOR_BONUS)
+BERSERK_WEIGHTS = np.array(ai.BERSERK_BONUS, dtype=np.float64)
+LOW_STAMINA_WEIGHTS = np.array(ai.LOW_STAMINA_BONUS, dtype=np.float64)
+
+# Как в обработчиках боя и create_player.
+MONSTER_LUCK = 4
+MONSTER_STAMINA = 100
+LOSS_GOLD = 10
+BASE_PLAYER_STATS = {"hp": 100, "stamina": 100, "attack": 12, "defense": 6, "luck": 5}
+
+
+@dataclass(frozen=True)
+class PlayerStats:
+    level: int
+    hp: int
+    stamina: int
+    attack: int
+    defense: int
+    luck: int
+
+    @classmethod
+    def for_level(cls, level: int) -> "PlayerStats":
+        growth = level_stat_growth(level - 1)
+        return cls(
+            level=level,
+            hp=BASE_PLAYER_STATS["hp"] + growth["hp"],
+            stamina=BASE_PLAYER_STATS["stamina"] + growth["stamina"],
+            attack=BASE_PLAYER_STATS["attack"] + growth["attack"],
+            defense=BASE_PLAYER_STATS["defense"] + growth["defense"],
+            luck=BASE_PLAYER_STATS["luck"] + growth["luck"],
+        )
+
+
+@dataclass(frozen=True)
+class SimulationResult:
+    level: int
+    rank: str
+    fights: int
+    wins: int
+    losses: int
+    timeouts: int
+    turns: np.ndarray
+    xp_per_minute: float
+    gold_per_minute: float
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.fights if self.fights else 0.0
+
+    @property
+    def mean_turns(self) -> float:
+        return float(self.turns.mean()) if self.fights else 0.0
+
+    def turn_percentile(self, q: float) -> float:
+        return float(np.percentile(self.turns, q)) if self.fights else 0.0
+
+    def turn_histogram(self) -> dict[int, int]:
+        values, counts = np.unique(self.turns, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+
+def seed_monsters() -> list[Monster]:
+    return [
+        Monster(
+            id=idx,
+            name=name,
+            rank=rank,
+            hp=hp,
+            atk=atk,
+            defense=defense,
+            behavior_type=behavior,
+            reward_xp=xp,
+            reward_gold=gold,
+        )
+        for idx, (name, rank, hp, atk, defense, behavior, xp, gold) in enumerate(MONSTER_SEED, 1)
+    ]
+
+
+def monsters_for_rank(monsters: Sequence[Monster], rank: str) -> list[Monster]:
+    # Та же логика, что в GameCatalog.monsters_by_rank: F+ ищет монстров ранга F.
+    exact = [monster for monster in monsters if monster.rank == rank]
+    return exact or [monster for monster in monsters if monster.rank == rank[:1]]
+
+
+def _policy_codes(policy: Mapping[str, float]) -> tuple[np.ndarray, np.ndarray]:
+    codes = np.array([ACTION_CODES[action] for action in policy], dtype=np.int64)
+    weights = np.array([float(weight) for weight in policy.values()])
+    if not len(codes) or weights.sum() <= 0:
+        raise ValueError("policy needs at least one positive weight")
+    return codes, np.cumsum(weights / weights.sum())
+
+
+def _choose_monster_actions(rng, base_weights, berserk, hp, max_hp, stamina) -> np.ndarray:
+    hp_ratio = hp / np.maximum(max_hp, 1)
+    weights = base_weights + (berserk & (hp_ratio < 0.35))[:, None] * BERSERK_WEIGHTS
+    weights = weights + (stamina < 20)[:, None] * LOW_STAMINA_WEIGHTS
+    cum = np.cumsum(weights, axis=1)
+    roll = rng.random(len(hp)) * cum[:, -1]
+    # random.choices: bisect_right по накопленным весам.
+    return (cum <= roll[:, None]).sum(axis=1)
+
+
+def _compute_damage(rng, atk, defense, attacker_action, defender_action,
+                    attacker_luck, attacker_stamina, defender_luck, position,
+                    skill_multiplier: float) -> np.ndarray:
+    damage = np.maximum(1.0, np.trunc(atk - defense * 0.5))
+    damage = np.where(attacker_action == A_SKILL, np.trunc(damage * skill_multiplier), damage)
+    damage = np.trunc(damage * POSITION_DAMAGE_ARR[attacker_action, position])
+    damage = np.where(attacker_stamina <= 0, np.maximum(1.0, np.trunc(damage * 0.7)), damage)
+    damage = np.trunc(damage * COUNTER_MOD[attacker_action, defender_action])
+    miss = COUNTER_MISS[attacker_action, defender_action]
+
+    dodge_chance = 0.05 + defender_luck * 0.003
+    dodge_chance = dodge_chance + np.where(defender_action == A_DODGE, 0.25, 0.0)
+    dodge_chance = np.clip(dodge_chance + DODGE_POSITION_ARR[position], 0.0, 0.6)
+    dodged = rng.random(len(damage)) < dodge_chance
+
+    crit_chance = np.clip(attacker_luck * 0.005 + CRIT_POSITION_ARR[position], 0.0, 0.5)
+    crit = rng.random(len(damage)) < crit_chance
+    damage = np.where(crit, damage * 2, damage)
+    return np.where(miss | dodged, 0, damage).astype(np.int64)
+
+
+def simulate(
+    player: PlayerStats,
+    monsters: Sequence[Monster],
+    fights: int,
+    policy: Optional[Mapping[str, float]] = None,
+    skill_multiplier: float = 1.0,
+    max_turns: int = 200,
+    seconds_per_turn: float = 4.0,
+    seconds_per_fight: float = 10.0,
+    seed: Optional[int] = None,
+    rank: str = "",
+) -> SimulationResult:
+    if not monsters:
+        raise ValueError("no monsters to fight")
+    rng = np.random.default_rng(seed)
+    policy_codes, policy_cum = _policy_codes(policy or {ATTACK: 1.0})
+
+    pick = rng.integers(len(monsters), size=fights)
+    m_max_hp = np.array([m.hp for m in monsters], dtype=np.int64)[pick]
+    m_atk = np.array([m.atk for m in monsters], dtype=np.int64)[pick]
+    m_def = np.array([m.defense for m in monsters], dtype=np.int64)[pick]
+    m_behavior = np.array([ai.behavior_code(m.behavior_type) for m in monsters], dtype=np.int64)[pick]
+    m_xp = np.array([m.reward_xp for m in monsters], dtype=np.int64)[pick]
+    m_gold = np.array([m.reward_gold for m in monsters], dtype=np.int64)[pick]
+
+    p_hp = np.full(fights, player.hp, dtype=np.int64)
+    p_sta = np.full(fights, player.stamina, dtype=np.int64)
+    m_hp = m_max_hp.copy()
+    m_sta = np.full(fights, MONSTER_STAMINA, dtype=np.int64)
+    position = np.full(fights, P_MEDIUM, dtype=np.int64)
+    turns = np.zeros(fights, dtype=np.int64)
+    outcome = np.zeros(fights, dtype=np.int8)  # 1 победа, -1 поражение, 0 не закончен
+
+    base_weights = BEHAVIOR_WEIGHTS[m_behavior]
+    berserk = m_behavior == ai.B_BERSERK
+
+    active = np.arange(fights)
+    for _ in range(max_turns):
+        if not len(active):
+            break
+        hp, sta, mhp, msta, pos = p_hp[active], p_sta[active], m_hp[active], m_sta[active], position[active]
+
+        monster_action = _choose_monster_actions(
+            rng, base_weights[active], berserk[active], mhp, m_max_hp[active], msta
+        )
+        player_action = policy_codes[
+            np.minimum(np.searchsorted(policy_cum, rng.random(len(active)), side="right"), len(policy_codes) - 1)
+        ]
+
+        sta = np.clip(sta + STAMINA_DELTA_ARR[player_action], 0, MAX_STAMINA)
+        msta = np.clip(msta + STAMINA_DELTA_ARR[monster_action], 0, MAX_STAMINA)
+
+        player_damage = _compute_damage(
+            rng, player.attack, m_def[active], player_action, monster_action,
+            player.luck, sta, MONSTER_LUCK, pos, skill_multiplier,
+        )
+        monster_damage = _compute_damage(
+            rng, m_atk[active], player.defense, monster_action, player_action,
+            MONSTER_LUCK, msta, player.luck, pos, 1.0,
+        )
+        mhp = np.maximum(0, mhp - player_damage)
+        hp = np.maximum(0, hp - monster_damage)
+        pos = np.clip(pos + POSITION_SHIFT_ARR[player_action] + POSITION_SHIFT_ARR[monster_action], 0, 2)
+
+        p_hp[active], p_sta[active], m_hp[active], m_sta[active], position[active] = hp, sta, mhp, msta, pos
+        turns[active] += 1
+        # Как в обработчике: смерть игрока проверяется первой, даже если монстр тоже погиб.
+        lost = hp <= 0
+        won = ~lost & (mhp <= 0)
+        outcome[active[lost]] = -1
+        outcome[active[won]] = 1
+        active = active[~(lost | won)]
+
+    wins = outcome == 1
+    losses = outcome == -1
+    xp = np.where(wins, m_xp, 0).sum()
+    gold = np.where(wins, m_gold, 0).sum() - LOSS_GOLD * losses.sum()
+    minutes = (fights * seconds_per_fight + turns.sum() * seconds_per_turn) / 60
+    return SimulationResult(
+        level=player.level,
+        rank=rank,
+        fights=fights,
+        wins=int(wins.sum()),
+        losses=int(losses.sum()),
+        timeouts=int((outcome == 0).sum()),
+        turns=turns,
+        xp_per_minute=float(xp / minutes) if minutes else 0.0,
+        gold_per_minute=float(gold / minutes) if minutes else 0.0,
+    )
+
+
+def simulate_grid(
+    levels: Sequence[int],
+    ranks: Sequence[str],
+    fights: int,
+    seed: Optional[int] = None,
+    **kwargs,
+) -> list[SimulationResult]:
+    monsters = seed_monsters()
+    seeds = np.random.SeedSequence(seed).spawn(len(levels) * len(ranks))
+    results = []
+    for idx, (level, rank) in enumerate((level, rank) for level in levels for rank in ranks):
+        results.append(
+            simulate(
+                PlayerStats.for_level(level),
+                monsters_for_rank(monsters, rank),
+                fights,
+                seed=seeds[idx],
+                rank=rank,
+                **kwargs,
+            )
+        )
+    return results
+
+
+def simulate_scalar(
+    player: PlayerStats,
+    monsters: Sequence[Monster],
+    fights: int,
+    policy: Optional[Mapping[str, float]] = None,
+    max_turns: int = 200,
+    seed: Optional[int] = None,
+) -> tuple[int, int, list[int]]:
+    # Эталон: тот же бой через скалярное ядро движка, со своим ГСЧ.
+    policy = dict(policy or {ATTACK: 1.0})
+    actions = [ACTION_CODES[action] for action in policy]
+    weights = list(policy.values())
+    rng = random.Random(seed)
+    wins = losses = 0
+    turns: list[int] = []
+    for _ in range(fights):
+        monster = rng.choice(monsters)
+        behavior = ai.behavior_code(monster.behavior_type)
+        hero = FighterState("Игрок", player.hp, player.stamina, player.attack,
+                            player.defense, player.luck, player.hp)
+        enemy = FighterState(monster.name, monster.hp, MONSTER_STAMINA, monster.atk,
+                             monster.defense, MONSTER_LUCK, monster.hp)
+        position = P_MEDIUM
+        turn = 0
+        while turn < max_turns:
+            turn += 1
+            monster_action = ai.monster_action_code(
+                behavior, enemy.hp, enemy.max_hp, enemy.stamina, rng
+            )
+            action = rng.choices(actions, weights=weights)[0]
+            position = resolve_turn(hero, enemy, action, monster_action, position, rng)
+            if hero.hp <= 0:
+                losses += 1
+                break
+            if enemy.hp <= 0:
+                wins += 1
+                break
+        turns.append(turn)
+    return wins, losses, turns
+
+
+def cross_check(
+    level: int,
+    rank: str,
+    fights: int = 2000,
+    policy: Optional[Mapping[str, float]] = None,
+    seed: Optional[int] = None,
+    z: float = 4.0,
+) -> tuple[bool, str]:
+    # Сравниваем долю побед и среднюю длину боя с движком в пределах z стандартных ошибок.
+    monsters = monsters_for_rank(seed_monsters(), rank)
+    player = PlayerStats.for_level(level)
+    vector = simulate(player, monsters, fights * 50, policy=policy, seed=seed, rank=rank)
+    wins, _, turns = simulate_scalar(player, monsters, fights, policy=policy, seed=seed)
+
+    p_scalar = wins / fights
+    p_vector = vector.win_rate
+    pooled = (wins + vector.wins) / (fights + vector.fights)
+    win_se = math.sqrt(max(pooled * (1 - pooled), 1e-12) * (1 / fights + 1 / vector.fights))
+    scalar_turns = np.array(turns)
+    turns_se = math.sqrt(
+        scalar_turns.var(ddof=1) / fights + vector.turns.var(ddof=1) / vector.fights
+    )
+    win_ok = abs(p_scalar - p_vector) <= z * win_se
+    turns_ok = abs(scalar_turns.mean() - vector.mean_turns) <= z * max(turns_se, 1e-9)
+    report = (
+        f"lvl {level} rank {rank}: win {p_scalar:.3f} vs {p_vector:.3f} (±{z * win_se:.3f}), "
+        f"turns {scalar_turns.mean():.2f} vs {vector.mean_turns:.2f} (±{z * turns_se:.2f})"
+    )
+    return win_ok and turns_ok, report
+
+
+def _parse_policy(raw: str) -> dict[str, float]:
+    policy: dict[str, float] = {}
+    for part in raw.split(","):
+        action, _, weight = part.partition("=")
+        action = action.strip().upper()
+        if action not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"unknown action: {action}")
+        policy[action] = float(weight) if weight else 1.0
+    return policy
+
+
+def format_table(results: Sequence[SimulationResult]) -> str:
+    lines = [
+        f"{'lvl':>4} {'rank':<4} {'win%':>6} {'turns':>6} {'p50':>4} {'p90':>4} "
+        f"{'timeout':>7} {'xp/min':>8} {'gold/min':>8}"
+    ]
+    for res in results:
+        lines.append(
+            f"{res.level:>4} {res.rank:<4} {res.win_rate * 100:>6.1f} {res.mean_turns:>6.2f} "
+            f"{res.turn_percentile(50):>4.0f} {res.turn_percentile(90):>4.0f} "
+            f"{res.timeouts:>7} {res.xp_per_minute:>8.1f} {res.gold_per_minute:>8.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Monte Carlo баланс PvE боёв")
+    parser.add_argument("--fights", type=int, default=100_000)
+    parser.add_argument("--levels", default="1,3,5,10,15,20,30")
+    parser.add_argument("--ranks", default=",".join(dict.fromkeys(row[1] for row in MONSTER_SEED)))
+    parser.add_argument("--policy", type=_parse_policy, default={ATTACK: 1.0},
+                        help="веса действий игрока, например ATTACK=3,DEFEND=1")
+    parser.add_argument("--seconds-per-turn", type=float, default=4.0)
+    parser.add_argument("--seconds-per-fight", type=float, default=10.0)
+    parser.add_argument("--max-turns", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--check", action="store_true", help="сверить со скалярным движком боя")
+    args = parser.parse_args(argv)
+
+    levels = [int(value) for value in args.levels.split(",")]
+    ranks = [value.strip() for value in args.ranks.split(",")]
+    if args.check:
+        ok = True
+        for level in levels:
+            for rank in ranks:
+                passed, report = cross_check(level, rank, policy=args.policy, seed=args.seed)
+                ok = ok and passed
+                print(("OK   " if passed else "FAIL ") + report)
+        return 0 if ok else 1
+
+    results = simulate_grid(
+        levels,
+        ranks,
+        args.fights,
+        seed=args.seed,
+        policy=args.policy,
+        max_turns=args.max_turns,
+        seconds_per_turn=args.seconds_per_turn,
+        seconds_per_fight=args.seconds_per_fight,
+    )
+    print(format_table(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
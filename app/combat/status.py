@@ -1,5 +1,6 @@
 import json
-from typing import Iterable
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
 
 
 def parse_effects_json(effects_json: str) -> list[dict]:
@@ -29,49 +30,158 @@ def summarize_effects(effects: Iterable) -> str:
     return ", ".join(parts)
 
 
-def effects_to_modifiers(effects: Iterable[dict]) -> dict:
-    mods = {
-        "def_pct": 0.0,
-        "dodge_pct": 0.0,
-        "crit_pct": 0.0,
-        "damage_pct": 0.0,
-        "stunned": False,
-    }
-    for eff in effects:
-        etype = eff.get("effect_type") or eff.get("type")
-        value = float(eff.get("value", 0))
-        stacks = int(eff.get("stacks", 1))
-        if etype == "def_down":
-            mods["def_pct"] -= value * stacks
-        elif etype == "def_up":
-            mods["def_pct"] += value * stacks
-        elif etype == "dodge_up":
-            mods["dodge_pct"] += value * stacks
-        elif etype == "dodge_down":
-            mods["dodge_pct"] -= value * stacks
-        elif etype == "crit_up":
-            mods["crit_pct"] += value * stacks
-        elif etype == "crit_down":
-            mods["crit_pct"] -= value * stacks
-        elif etype == "damage_up":
-            mods["damage_pct"] += value * stacks
-        elif etype == "stun":
-            mods["stunned"] = True
-    return mods
+@dataclass(slots=True)
+class Modifiers:
+    # Вектор модификаторов бойца на ход: собирается за один проход по эффектам.
+    def_pct: float = 0.0
+    dodge_pct: float = 0.0
+    crit_pct: float = 0.0
+    damage_pct: float = 0.0
+    ignore_def_pct: float = 0.0
+    stunned: bool = False
+    dot: int = 0
+    # Мгновенные эффекты навыка.
+    stamina_restore: float = 0.0
+    move: float = 0.0
+
+
+EffectHandler = Callable[[Modifiers, float, int], None]
+
+# Реестр обработчиков: тип эффекта -> функция(mods, value, stacks).
+# Новый тип эффекта — это один обработчик здесь (и поле в Modifiers, если нужно).
+EFFECT_HANDLERS: dict[str, EffectHandler] = {}
+# Мгновенные эффекты срабатывают при применении навыка и не попадают в battle_effects.
+INSTANT_EFFECTS: set[str] = set()
+
+
+def effect_handler(*effect_types: str, instant: bool = False) -> Callable[[EffectHandler], EffectHandler]:
+    def register(handler: EffectHandler) -> EffectHandler:
+        for effect_type in effect_types:
+            EFFECT_HANDLERS[effect_type] = handler
+            if instant:
+                INSTANT_EFFECTS.add(effect_type)
+        return handler
+
+    return register
+
+
+@effect_handler("def_up")
+def _def_up(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.def_pct += value * stacks
+
+
+@effect_handler("def_down")
+def _def_down(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.def_pct -= value * stacks
+
+
+@effect_handler("dodge_up")
+def _dodge_up(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.dodge_pct += value * stacks
+
+
+@effect_handler("dodge_down")
+def _dodge_down(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.dodge_pct -= value * stacks
+
+
+@effect_handler("crit_up")
+def _crit_up(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.crit_pct += value * stacks
+
+
+@effect_handler("crit_down")
+def _crit_down(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.crit_pct -= value * stacks
+
+
+@effect_handler("damage_up", instant=True)
+def _damage_up(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.damage_pct += value * stacks
+
+
+@effect_handler("stun")
+def _stun(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.stunned = True
 
 
-def apply_dot_effects(effects: Iterable, hp: int) -> tuple[int, int]:
-    total = 0
+@effect_handler("bleed", "burn")
+def _dot(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.dot += int(value) * stacks
+
+
+@effect_handler("ignore_def", instant=True)
+def _ignore_def(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.ignore_def_pct += value * stacks
+
+
+@effect_handler("stamina_restore", instant=True)
+def _stamina_restore(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.stamina_restore += value * stacks
+
+
+@effect_handler("move", instant=True)
+def _move(mods: Modifiers, value: float, stacks: int) -> None:
+    mods.move += value * stacks
+
+
+def _ignore(mods: Modifiers, value: float, stacks: int) -> None:
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class SkillEffect:
+    type: str
+    value: float
+    duration: int
+    max_stacks: int
+    target: Optional[str]
+    handler: EffectHandler
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledEffects:
+    # Эффекты навыка, разобранные один раз при загрузке каталога.
+    instant: tuple[SkillEffect, ...] = ()
+    lasting: tuple[SkillEffect, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.instant or self.lasting)
+
+    def cast(self, mods: Modifiers, target: str) -> list[tuple[str, str, float, int, int]]:
+        # Мгновенные эффекты идут в модификаторы заклинателя,
+        # длительные возвращаются в формате apply_battle_effects.
+        for eff in self.instant:
+            eff.handler(mods, eff.value, 1)
+        return [
+            (eff.target or target, eff.type, eff.value, eff.duration, eff.max_stacks)
+            for eff in self.lasting
+        ]
+
+
+NO_EFFECTS = CompiledEffects()
+
+
+def compile_effects(raw: Iterable[dict]) -> CompiledEffects:
+    instant = []
+    lasting = []
+    for eff in raw:
+        effect_type = eff.get("type")
+        compiled = SkillEffect(
+            type=effect_type,
+            value=eff.get("value", 0),
+            duration=eff.get("duration", 1),
+            max_stacks=eff.get("max_stacks", 1),
+            target=eff.get("target"),
+            handler=EFFECT_HANDLERS.get(effect_type, _ignore),
+        )
+        (instant if effect_type in INSTANT_EFFECTS else lasting).append(compiled)
+    return CompiledEffects(tuple(instant), tuple(lasting)) if instant or lasting else NO_EFFECTS
+
+
+def turn_modifiers(effects: Iterable[dict]) -> Modifiers:
+    # Один проход по активным эффектам бойца: модификаторы и урон DoT за ход.
+    mods = Modifiers()
     for eff in effects:
-        if isinstance(eff, dict):
-            etype = eff.get("effect_type") or eff.get("type")
-            value = int(eff.get("value", 0))
-            stacks = int(eff.get("stacks", 1))
-        else:
-            etype = eff["effect_type"]
-            value = int(eff["value"])
-            stacks = int(eff["stacks"])
-        if etype in {"bleed", "burn"}:
-            total += value * stacks
-    new_hp = max(0, hp - total)
-    return new_hp, total
+        EFFECT_HANDLERS.get(eff["effect_type"], _ignore)(mods, float(eff["value"]), int(eff["stacks"]))
+    return mods
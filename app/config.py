@@ -1,11 +1,43 @@
 from dataclasses import dataclass
 import os
+import tempfile
+
+
+SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
+RUN_MODES = {"polling", "webhook"}
 
 
 @dataclass(frozen=True)
 class Config:
     bot_token: str
     db_path: str
+    db_pool_size: int = 8
+    db_synchronous: str = "NORMAL"
+    db_cache_size: int = -16000
+    db_mmap_size: int = 128 * 1024 * 1024
+    db_busy_timeout: int = 5000
+    db_workers: int = 4
+    player_cache_size: int = 10000
+    battle_flush_interval: float = 2.0
+    battle_idle_ttl: float = 1800.0
+    update_dedupe_size: int = 10000
+    update_dedupe_ttl: float = 600.0
+    run_mode: str = "polling"
+    max_concurrent_updates: int = 64
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "/webhook"
+    webhook_secret: str = ""
+    # Публичный адрес для setWebhook; пусто — вебхук регистрируют снаружи (например, за балансировщиком).
+    webhook_url: str = ""
+    # Больше одного шарда — фронт раздаёт апдейты рабочим процессам по telegram id.
+    shards: int = 1
+    shard_socket: str = ""
+    # Лимиты исходящих сообщений (в секунду): на бота, на личный чат, на группу.
+    # Лимиты на бота и на группу задаются на всего бота и делятся между шардами.
+    outbox_global_rate: float = 30.0
+    outbox_chat_rate: float = 1.0
+    outbox_group_rate: float = 20 / 60
 
 
 def load_config() -> Config:
@@ -13,4 +45,45 @@ def load_config() -> Config:
     if not bot_token:
         raise RuntimeError("BOT_TOKEN is not set")
     db_path = os.getenv("DB_PATH", "rpg_bot.sqlite3")
-    return Config(bot_token=bot_token, db_path=db_path)
+    db_synchronous = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+    if db_synchronous not in SYNCHRONOUS_MODES:
+        raise RuntimeError(f"DB_SYNCHRONOUS must be one of {sorted(SYNCHRONOUS_MODES)}")
+    run_mode = os.getenv("RUN_MODE", "polling").lower()
+    if run_mode not in RUN_MODES:
+        raise RuntimeError(f"RUN_MODE must be one of {sorted(RUN_MODES)}")
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+    if run_mode == "webhook" and not webhook_secret:
+        raise RuntimeError("WEBHOOK_SECRET is required in webhook mode")
+    webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+    if not webhook_path.startswith("/"):
+        raise RuntimeError("WEBHOOK_PATH must start with /")
+    shards = int(os.getenv("SHARDS", "1"))
+    if shards < 1:
+        raise RuntimeError("SHARDS must be at least 1")
+    return Config(
+        bot_token=bot_token,
+        db_path=db_path,
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "8")),
+        db_synchronous=db_synchronous,
+        db_cache_size=int(os.getenv("DB_CACHE_SIZE", "-16000")),
+        db_mmap_size=int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024))),
+        db_busy_timeout=int(os.getenv("DB_BUSY_TIMEOUT", "5000")),
+        db_workers=int(os.getenv("DB_WORKERS", "4")),
+        player_cache_size=int(os.getenv("PLAYER_CACHE_SIZE", "10000")),
+        battle_flush_interval=float(os.getenv("BATTLE_FLUSH_INTERVAL", "2.0")),
+        battle_idle_ttl=float(os.getenv("BATTLE_IDLE_TTL", "1800")),
+        update_dedupe_size=int(os.getenv("UPDATE_DEDUPE_SIZE", "10000")),
+        update_dedupe_ttl=float(os.getenv("UPDATE_DEDUPE_TTL", "600")),
+        run_mode=run_mode,
+        max_concurrent_updates=int(os.getenv("MAX_CONCURRENT_UPDATES", "64")),
+        webhook_host=os.getenv("WEBHOOK_HOST", "0.0.0.0"),
+        webhook_port=int(os.getenv("WEBHOOK_PORT", "8080")),
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_url=os.getenv("WEBHOOK_URL", ""),
+        shards=shards,
+        shard_socket=os.getenv("SHARD_SOCKET", os.path.join(tempfile.gettempdir(), "rpg_bot_shards.sock")),
+        outbox_global_rate=float(os.getenv("OUTBOX_GLOBAL_RATE", "30")),
+        outbox_chat_rate=float(os.getenv("OUTBOX_CHAT_RATE", "1")),
+        outbox_group_rate=float(os.getenv("OUTBOX_GROUP_RATE", str(20 / 60))),
+    )
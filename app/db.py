@@ -1,609 +1,266 @@
-import sqlite3
 import json
+import sqlite3
+import random
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import replace
 from datetime import datetime, timezone
-from typing import Optional
-
-from app.models import Battle, Case, Monster, Player, Skill
+from typing import Callable, Iterable, Iterator, Optional
+
+from app.battle_store import BattleConflict, BattleStore, HotBattle
+from app.catalog import get_catalog, load_catalog
+from app.combat.formulas import ACTION_CODES, ACTIONS, POSITION_CODES, POSITIONS
+from app.combat.rng import new_battle_seed
+from app.config import Config
+from app.game_data import (
+    ACHIEVEMENT_SEED,
+    CASE_PRICES,
+    CASE_SEED,
+    MONSTER_SEED,
+    SKILL_EFFECT_SEED,
+    SKILL_LEVEL_THRESHOLDS,
+    SKILL_SEED,
+    catalog_fingerprint,
+)
+from app.migrations import migrate
+from app.leaderboard import get_leaderboard
+from app.models import Battle, BattleEvent, Case, CaseOpening, LeaderboardEntry, Monster, Player, Skill
+from app.player_cache import PlayerCache
 from app.progression import apply_leveling, level_stat_growth, rank_from_level
-from app.cases import roll_case_rewards
+from app.cases import roll_case_batch
+
+
+class PooledConnection(sqlite3.Connection):
+    pool: Optional["ConnectionPool"] = None
+    # Копии игроков, изменённых в текущей транзакции: попадают в кэш только после коммита.
+    staged_players: Optional[dict[int, tuple[Player, Optional[int]]]] = None
+    # Рабочие копии активных боёв; в общее хранилище попадают так же, после коммита.
+    staged_battles: Optional[dict[int, HotBattle]] = None
+    # Действия вне БД (ответы в Telegram), которые выполняются только после коммита.
+    after_commit_actions: Optional[list[Callable[[], object]]] = None
+
+    def commit(self) -> None:
+        battles, self.staged_battles = self.staged_battles, None
+        if battles:
+            _battles.publish(battles.values(), super().commit)
+        else:
+            super().commit()
+        staged, self.staged_players = self.staged_players, None
+        if staged:
+            players = _players.publish(staged.values())
+            if len(players) < len(staged):
+                # Нашу копию обогнала другая транзакция: в топ и другим процессам идёт строка из БД.
+                accepted = {player.id for player in players}
+                players += _reload_players(self, [pid for pid in staged if pid not in accepted])
+            leaderboard = get_leaderboard()
+            for player in players:
+                leaderboard.update(player)
+            if _commit_listener is not None:
+                _commit_listener(players)
+
+    def rollback(self) -> None:
+        self.staged_players = None
+        self.staged_battles = None
+        self.after_commit_actions = None
+        super().rollback()
+
+    def close(self) -> None:
+        self.staged_players = None
+        self.staged_battles = None
+        self.after_commit_actions = None
+        # Соединения из пула не закрываются, а возвращаются обратно.
+        if self.pool is not None:
+            self.pool.release(self)
+            return
+        super().close()
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 8,
+        synchronous: str = "NORMAL",
+        cache_size: int = -16000,
+        mmap_size: int = 128 * 1024 * 1024,
+        busy_timeout: int = 5000,
+    ) -> None:
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout = busy_timeout
+        self._idle: list[PooledConnection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> PooledConnection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000,
+            factory=PooledConnection,
+            check_same_thread=False,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.pool = self
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn: PooledConnection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.pool = None
+        conn.close()
+
+    def close_all(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_players = PlayerCache()
+_battles = BattleStore()
+# Получает игроков после каждого коммита; в шардированном режиме через него
+# о переменах узнают остальные процессы.
+_commit_listener: Optional[Callable[[list[Player]], None]] = None
+
+CATALOG_HASH_KEY = "catalog_hash"
+
+
+def init_pool(config: Config) -> ConnectionPool:
+    global _pool
+    if _pool is not None:
+        _pool.close_all()
+    _pool = ConnectionPool(
+        config.db_path,
+        size=config.db_pool_size,
+        synchronous=config.db_synchronous,
+        cache_size=config.db_cache_size,
+        mmap_size=config.db_mmap_size,
+        busy_timeout=config.db_busy_timeout,
+    )
+    return _pool
 
 
-def get_connection(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.close_all()
+        _pool = None
 
 
-def init_db(db_path: str) -> None:
-    conn = get_connection(db_path)
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS players (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            telegram_id INTEGER UNIQUE NOT NULL,
-            username TEXT NOT NULL,
-            rank TEXT NOT NULL,
-            level INTEGER NOT NULL,
-            xp INTEGER NOT NULL,
-            gold INTEGER NOT NULL,
-            hp INTEGER NOT NULL,
-            stamina INTEGER NOT NULL,
-            attack INTEGER NOT NULL,
-            defense INTEGER NOT NULL,
-            luck INTEGER NOT NULL,
-            current_battle_id INTEGER,
-            title TEXT,
-            wins_pve INTEGER NOT NULL DEFAULT 0,
-            cases_opened INTEGER NOT NULL DEFAULT 0
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS monsters (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            rank TEXT NOT NULL,
-            hp INTEGER NOT NULL,
-            atk INTEGER NOT NULL,
-            defense INTEGER NOT NULL,
-            behavior_type TEXT NOT NULL,
-            reward_xp INTEGER NOT NULL,
-            reward_gold INTEGER NOT NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS battles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type TEXT NOT NULL,
-            turn INTEGER NOT NULL,
-            player_action TEXT,
-            enemy_action TEXT,
-            log TEXT NOT NULL,
-            status TEXT NOT NULL,
-            player_id INTEGER NOT NULL,
-            monster_id INTEGER,
-            enemy_player_id INTEGER,
-            player_hp INTEGER NOT NULL,
-            player_stamina INTEGER NOT NULL,
-            enemy_hp INTEGER NOT NULL,
-            enemy_stamina INTEGER NOT NULL,
-            position TEXT NOT NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS skills (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            type TEXT NOT NULL,
-            stamina_cost INTEGER NOT NULL,
-            damage_multiplier REAL NOT NULL,
-            range TEXT NOT NULL,
-            effect TEXT NOT NULL,
-            rarity TEXT NOT NULL,
-            hidden INTEGER NOT NULL DEFAULT 0,
-            description TEXT NOT NULL,
-            effects_json TEXT NOT NULL DEFAULT '[]',
-            combo_tags_json TEXT NOT NULL DEFAULT '[]'
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS battle_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            battle_id INTEGER NOT NULL,
-            chat_id INTEGER NOT NULL,
-            message_id INTEGER NOT NULL,
-            created_at TEXT NOT NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS battle_effects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            battle_id INTEGER NOT NULL,
-            target TEXT NOT NULL,
-            effect_type TEXT NOT NULL,
-            value REAL NOT NULL,
-            duration INTEGER NOT NULL,
-            stacks INTEGER NOT NULL,
-            max_stacks INTEGER NOT NULL
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS cases (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL UNIQUE,
-            description TEXT NOT NULL,
-            min_rolls INTEGER NOT NULL,
-            max_rolls INTEGER NOT NULL,
-            weights_json TEXT NOT NULL,
-            allow_hidden INTEGER NOT NULL DEFAULT 0,
-            price INTEGER NOT NULL DEFAULT 0
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS player_cases (
-            player_id INTEGER NOT NULL,
-            case_id INTEGER NOT NULL,
-            quantity INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (player_id, case_id)
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS achievements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            code TEXT NOT NULL UNIQUE,
-            name TEXT NOT NULL,
-            description TEXT NOT NULL,
-            title TEXT,
-            case_reward TEXT,
-            case_qty INTEGER NOT NULL DEFAULT 0
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS player_achievements (
-            player_id INTEGER NOT NULL,
-            achievement_id INTEGER NOT NULL,
-            unlocked_at TEXT NOT NULL,
-            PRIMARY KEY (player_id, achievement_id)
-        )
-        """
-    )
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS app_meta (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL
-        )
-        """
-    )
-    _ensure_battle_columns(conn)
-    _ensure_skill_columns(conn)
-    _ensure_player_skills_table(conn)
-    _ensure_player_skills_columns(conn)
-    _ensure_case_columns(conn)
-    _ensure_battle_effect_columns(conn)
-    _ensure_player_columns(conn)
-    conn.commit()
-    seed_data(conn)
-    _dedupe_skills_by_name(conn)
-    _maybe_resync_skills(conn)
-    _ensure_case_prices(conn)
-    conn.close()
+def init_player_cache(max_size: int) -> PlayerCache:
+    global _players
+    _players = PlayerCache(max_size)
+    return _players
 
 
-def _ensure_battle_columns(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(battles)")
-    columns = {row["name"] for row in cursor.fetchall()}
-    if "position" not in columns:
-        cursor.execute(
-            "ALTER TABLE battles ADD COLUMN position TEXT NOT NULL DEFAULT 'medium'"
-        )
-    if "player_skill_id" not in columns:
-        cursor.execute(
-            "ALTER TABLE battles ADD COLUMN player_skill_id INTEGER"
-        )
-    if "enemy_skill_id" not in columns:
-        cursor.execute(
-            "ALTER TABLE battles ADD COLUMN enemy_skill_id INTEGER"
-        )
-    if "player_combo_json" not in columns:
-        cursor.execute(
-            "ALTER TABLE battles ADD COLUMN player_combo_json TEXT NOT NULL DEFAULT '{}'"
-        )
-    if "enemy_combo_json" not in columns:
-        cursor.execute(
-            "ALTER TABLE battles ADD COLUMN enemy_combo_json TEXT NOT NULL DEFAULT '{}'"
-        )
+def player_cache_stats() -> dict[str, float]:
+    return _players.stats()
 
 
-def _ensure_skill_columns(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(skills)")
-    columns = {row["name"] for row in cursor.fetchall()}
-    required = {
-        "type": "TEXT NOT NULL DEFAULT 'ATTACK'",
-        "range": "TEXT NOT NULL DEFAULT 'MID'",
-        "effect": "TEXT NOT NULL DEFAULT ''",
-        "rarity": "TEXT NOT NULL DEFAULT 'COMMON'",
-        "hidden": "INTEGER NOT NULL DEFAULT 0",
-        "description": "TEXT NOT NULL DEFAULT ''",
-        "effects_json": "TEXT NOT NULL DEFAULT '[]'",
-        "combo_tags_json": "TEXT NOT NULL DEFAULT '[]'",
-    }
-    for name, ddl in required.items():
-        if name not in columns:
-            cursor.execute(f"ALTER TABLE skills ADD COLUMN {name} {ddl}")
+def init_battle_store(idle_ttl: float) -> BattleStore:
+    global _battles
+    _battles = BattleStore(idle_ttl)
+    return _battles
 
 
-def _ensure_player_skills_table(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        CREATE TABLE IF NOT EXISTS player_skills (
-            player_id INTEGER NOT NULL,
-            skill_id INTEGER NOT NULL,
-            is_unlocked INTEGER NOT NULL DEFAULT 1,
-            level INTEGER NOT NULL DEFAULT 1,
-            copies INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (player_id, skill_id)
-        )
-        """
-    )
+def battle_store_stats() -> dict[str, int]:
+    return _battles.stats()
 
 
-def _ensure_player_skills_columns(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(player_skills)")
-    columns = {row["name"] for row in cursor.fetchall()}
-    if "level" not in columns:
-        cursor.execute("ALTER TABLE player_skills ADD COLUMN level INTEGER NOT NULL DEFAULT 1")
-    if "copies" not in columns:
-        cursor.execute("ALTER TABLE player_skills ADD COLUMN copies INTEGER NOT NULL DEFAULT 0")
+def set_commit_listener(listener: Optional[Callable[[list[Player]], None]]) -> None:
+    global _commit_listener
+    _commit_listener = listener
 
 
-def _ensure_player_columns(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(players)")
-    columns = {row["name"] for row in cursor.fetchall()}
-    if "title" not in columns:
-        cursor.execute("ALTER TABLE players ADD COLUMN title TEXT")
-    if "wins_pve" not in columns:
-        cursor.execute("ALTER TABLE players ADD COLUMN wins_pve INTEGER NOT NULL DEFAULT 0")
-    if "cases_opened" not in columns:
-        cursor.execute("ALTER TABLE players ADD COLUMN cases_opened INTEGER NOT NULL DEFAULT 0")
+def apply_remote_players(players: Iterable[Player]) -> None:
+    # Игроков закоммитил другой процесс: своя копия в кэше больше не верна.
+    leaderboard = get_leaderboard()
+    for player in players:
+        _players.invalidate(player.id)
+        leaderboard.update(player)
 
 
-def _ensure_case_columns(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(cases)")
-    columns = {row["name"] for row in cursor.fetchall()}
-    if "price" not in columns:
-        cursor.execute("ALTER TABLE cases ADD COLUMN price INTEGER NOT NULL DEFAULT 0")
+def get_connection(db_path: str) -> sqlite3.Connection:
+    if _pool is not None and _pool.db_path == db_path:
+        return _pool.acquire()
+    conn = sqlite3.connect(db_path, factory=PooledConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
 
 
-def _ensure_battle_effect_columns(conn: sqlite3.Connection) -> None:
-    cursor = conn.cursor()
-    cursor.execute("PRAGMA table_info(battle_effects)")
-    columns = {row["name"] for row in cursor.fetchall()}
-    if not columns:
-        return
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # Хелперы ниже сами не коммитят: фиксирует изменения только владелец транзакции.
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def init_db(db_path: str) -> None:
+    conn = get_connection(db_path)
+    migrate(conn)
+    with transaction(conn):
+        # Каталог пересеивается только если изменились исходные данные.
+        fingerprint = catalog_fingerprint()
+        if _get_meta(conn, CATALOG_HASH_KEY) != fingerprint:
+            seed_data(conn)
+            _dedupe_skills_by_name(conn)
+            _ensure_case_prices(conn)
+            _set_meta(conn, CATALOG_HASH_KEY, fingerprint)
+        _maybe_resync_skills(conn)
+        load_catalog(conn)
+        load_leaderboard(conn)
+    conn.close()
 
 
 def seed_data(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     cursor.execute("SELECT COUNT(*) as cnt FROM monsters")
     if cursor.fetchone()["cnt"] == 0:
-        monsters = [
-            ("Песчаный слизень", "F", 60, 8, 4, "aggressive", 20, 15),
-            ("Лесной волк", "F", 70, 10, 5, "trickster", 24, 18),
-            ("Костяной страж", "D", 120, 16, 10, "defensive", 45, 40),
-            ("Болотный тролль", "C", 180, 22, 14, "berserk", 80, 65),
-            ("Кровавый рыцарь", "B", 240, 30, 18, "aggressive", 130, 110),
-            ("Дракон-страж", "A", 320, 40, 24, "berserk", 200, 180),
-            ("Тень древних", "S", 420, 52, 30, "stamina_drain", 320, 280),
-        ]
         cursor.executemany(
             """
             INSERT INTO monsters (name, rank, hp, atk, defense, behavior_type, reward_xp, reward_gold)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            monsters,
+            MONSTER_SEED,
         )
-    skills = [
-            (
-                "Power Strike",
-                "ATTACK",
-                20,
-                1.5,
-                "MELEE",
-                "Оглушение на 1 ход (20% шанс).",
-                "COMMON",
-                0,
-                "Сильный удар на ближней дистанции.",
-            ),
-            (
-                "Twin Slash",
-                "ATTACK",
-                18,
-                1.3,
-                "MELEE",
-                "Кровотечение на 2 хода.",
-                "COMMON",
-                0,
-                "Два быстрых разреза.",
-            ),
-            (
-                "Piercing Shot",
-                "ATTACK",
-                22,
-                1.4,
-                "LONG",
-                "Игнорирует 20% DEF цели.",
-                "RARE",
-                0,
-                "Дальний выстрел по слабому месту.",
-            ),
-            (
-                "Whirlwind",
-                "ATTACK",
-                26,
-                1.6,
-                "MELEE",
-                "Снижает DEF цели на 10% на 2 хода.",
-                "RARE",
-                0,
-                "Вихревой удар по площади.",
-            ),
-            (
-                "Seismic удар",
-                "ATTACK",
-                30,
-                1.8,
-                "MID",
-                "Отбрасывает цель на 1 позицию.",
-                "EPIC",
-                0,
-                "Сильный удар с ударной волной.",
-            ),
-            (
-                "Shadow Lunge",
-                "ATTACK",
-                28,
-                1.7,
-                "MID",
-                "Сближает на 1 позицию и даёт +10% крит.",
-                "EPIC",
-                1,
-                "Скрытый выпад из тени. Открывается после победы над 10 монстрами.",
-            ),
-            (
-                "Iron Wall",
-                "DEFENSE",
-                15,
-                0.8,
-                "MELEE",
-                "Снижает урон на 30% в этом ходу.",
-                "COMMON",
-                0,
-                "Глухая оборона.",
-            ),
-            (
-                "Mirror Guard",
-                "DEFENSE",
-                20,
-                0.9,
-                "MID",
-                "Шанс отразить 20% урона.",
-                "RARE",
-                0,
-                "Защита с отражением.",
-            ),
-            (
-                "Evasion Step",
-                "DEFENSE",
-                18,
-                0.7,
-                "LONG",
-                "Отступает на 1 позицию, +15% уклон.",
-                "RARE",
-                0,
-                "Лёгкий шаг в сторону.",
-            ),
-            (
-                "Fortress Stance",
-                "DEFENSE",
-                24,
-                0.6,
-                "MELEE",
-                "Иммунитет к криту на 1 ход.",
-                "EPIC",
-                1,
-                "Секретная стойка. Открывается при ранге B.",
-            ),
-            (
-                "Second Wind",
-                "SUPPORT",
-                0,
-                0.0,
-                "MID",
-                "Восстанавливает 25 STA.",
-                "COMMON",
-                0,
-                "Восстановление дыхания.",
-            ),
-            (
-                "Battle Focus",
-                "SUPPORT",
-                10,
-                0.0,
-                "MID",
-                "Даёт +10% уклон и +10% крит на 2 хода.",
-                "RARE",
-                0,
-                "Фокус и холодный разум.",
-            ),
-            (
-                "Smoke Bomb",
-                "SUPPORT",
-                16,
-                0.0,
-                "LONG",
-                "Увеличивает дистанцию на 1.",
-                "RARE",
-                0,
-                "Дымовая завеса для отступления.",
-            ),
-            (
-                "Blazing Uppercut",
-                "ATTACK",
-                24,
-                1.45,
-                "MELEE",
-                "Подбрасывает цель, снижая её уклон на 10% на 1 ход.",
-                "COMMON",
-                0,
-                "Мощный удар снизу с огненным следом.",
-            ),
-            (
-                "Frost Lance",
-                "ATTACK",
-                26,
-                1.55,
-                "MID",
-                "Замедляет цель: -10% шанс уклонения на 2 хода.",
-                "RARE",
-                0,
-                "Ледяной выпад с контролем дистанции.",
-            ),
-            (
-                "Ranger Volley",
-                "ATTACK",
-                28,
-                1.6,
-                "LONG",
-                "Наносит урон и увеличивает дистанцию на 1.",
-                "RARE",
-                0,
-                "Серия дальних выстрелов.",
-            ),
-            (
-                "Crimson Edge",
-                "ATTACK",
-                32,
-                1.8,
-                "MELEE",
-                "Усиливает кровотечение: +1 ход к длительности.",
-                "EPIC",
-                0,
-                "Алый клинок оставляет глубокие раны.",
-            ),
-            (
-                "Meteor Break",
-                "ATTACK",
-                36,
-                2.0,
-                "MID",
-                "Снижает DEF цели на 20% на 2 хода.",
-                "LEGENDARY",
-                1,
-                "Легендарный удар с небес. Открывается после ранга A.",
-            ),
-            (
-                "Aegis Shift",
-                "DEFENSE",
-                18,
-                0.7,
-                "MID",
-                "Снимает отрицательный эффект и даёт +10% DEF на 2 хода.",
-                "COMMON",
-                0,
-                "Смена стойки, очищающая ауры.",
-            ),
-            (
-                "Steel Pulse",
-                "DEFENSE",
-                22,
-                0.6,
-                "MELEE",
-                "Отражает 10% урона и сдвигает позицию к средней.",
-                "RARE",
-                0,
-                "Ритмичная стойка стража.",
-            ),
-            (
-                "Guardian Halo",
-                "DEFENSE",
-                30,
-                0.5,
-                "MID",
-                "Снижает входящий урон на 40% на 1 ход.",
-                "EPIC",
-                0,
-                "Защитный барьер света.",
-            ),
-            (
-                "Void Bastion",
-                "DEFENSE",
-                34,
-                0.5,
-                "MELEE",
-                "Иммунитет к криту и -20% входящего урона на 1 ход.",
-                "LEGENDARY",
-                1,
-                "Тёмная бастилия. Открывается после 5 побед над S-рангом.",
-            ),
-            (
-                "Quick Reset",
-                "SUPPORT",
-                12,
-                0.0,
-                "MID",
-                "Восстанавливает 15 STA и даёт +5% крит на 1 ход.",
-                "COMMON",
-                0,
-                "Быстрое восстановление темпа.",
-            ),
-            (
-                "Adrenal Rush",
-                "SUPPORT",
-                20,
-                0.0,
-                "MELEE",
-                "Сближает на 1 позицию и даёт +15% урон на 1 ход.",
-                "RARE",
-                0,
-                "Рывок с выбросом адреналина.",
-            ),
-            (
-                "Arcane Surge",
-                "SUPPORT",
-                24,
-                0.0,
-                "LONG",
-                "Восстанавливает 30 STA и даёт +10% уклон на 2 хода.",
-                "EPIC",
-                0,
-                "Всплеск магической энергии.",
-            ),
-            (
-                "Eclipse Pact",
-                "SUPPORT",
-                0,
-                0.0,
-                "MID",
-                "Обнуляет STA, но даёт +30% крит и +20% урон на 1 ход.",
-                "LEGENDARY",
-                1,
-                "Договор затмения. Открывается на ранге S.",
-            ),
-        ]
     cursor.executemany(
         """
         INSERT OR IGNORE INTO skills
         (name, type, stamina_cost, damage_multiplier, range, effect, rarity, hidden, description, effects_json, combo_tags_json)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
-        [(*skill, "[]", "[]") if len(skill) == 9 else skill for skill in skills],
+        [(*skill, "[]", "[]") if len(skill) == 9 else skill for skill in SKILL_SEED],
     )
-    conn.commit()
     _seed_skill_effects(conn)
     _seed_achievements(conn)
     _assign_defaults_to_existing_players(conn)
@@ -611,212 +268,64 @@ def seed_data(conn: sqlite3.Connection) -> None:
 
 
 def _assign_defaults_to_existing_players(conn: sqlite3.Connection) -> None:
+    _backfill_default_skills(conn)
     cursor = conn.cursor()
-    cursor.execute("SELECT id FROM players")
-    player_ids = [row["id"] for row in cursor.fetchall()]
-    for player_id in player_ids:
-        assign_default_skills(conn, player_id)
-        grant_case(conn, player_id, "Novice Case", 1)
+    # Стартовый кейс получают только те, у кого его ещё не было: строка player_cases
+    # остаётся и после открытия, так что правка каталога новых кейсов не раздаёт.
+    cursor.execute(
+        """
+        INSERT OR IGNORE INTO player_cases (player_id, case_id, quantity)
+        SELECT p.id, c.id, 1
+        FROM players p
+        JOIN cases c ON c.name = 'Novice Case'
+        """
+    )
+
+
+def _backfill_default_skills(conn: sqlite3.Connection) -> None:
+    thresholds = ", ".join("(?, ?)" for _ in SKILL_LEVEL_THRESHOLDS)
+    params = [value for item in SKILL_LEVEL_THRESHOLDS.items() for value in item]
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        WITH thresholds(rarity, min_level) AS (VALUES {thresholds})
+        INSERT OR IGNORE INTO player_skills (player_id, skill_id, is_unlocked, level, copies)
+        SELECT p.id, s.id, 1, 1, 0
+        FROM players p
+        JOIN skills s ON s.hidden = 0
+        JOIN thresholds t ON t.rarity = s.rarity AND max(p.level, 1) >= t.min_level
+        """,
+        params,
+    )
 
 
 def _seed_skill_effects(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
-    effects = {
-        "Power Strike": (
-            json.dumps(
-                [{"type": "stun", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["STARTER"]),
-        ),
-        "Twin Slash": (
-            json.dumps(
-                [{"type": "bleed", "value": 5, "duration": 2, "stacks": 1, "max_stacks": 2, "target": "enemy"}]
-            ),
-            json.dumps(["LINK"]),
-        ),
-        "Piercing Shot": (
-            json.dumps(
-                [{"type": "ignore_def", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["STARTER"]),
-        ),
-        "Whirlwind": (
-            json.dumps(
-                [{"type": "def_down", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["LINK"]),
-        ),
-        "Seismic удар": (
-            json.dumps(
-                [{"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Shadow Lunge": (
-            json.dumps(
-                [{"type": "move", "value": -1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["STARTER", "MOTION"]),
-        ),
-        "Iron Wall": (
-            json.dumps(
-                [{"type": "def_up", "value": 30, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Mirror Guard": (
-            json.dumps(
-                [{"type": "def_up", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Evasion Step": (
-            json.dumps(
-                [{"type": "dodge_up", "value": 15, "duration": 2, "stacks": 1, "max_stacks": 2, "target": "self"},
-                 {"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["MOTION"]),
-        ),
-        "Fortress Stance": (
-            json.dumps(
-                [{"type": "crit_down", "value": 100, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Second Wind": (
-            json.dumps(
-                [{"type": "stamina_restore", "value": 25, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["SUPPORT"]),
-        ),
-        "Battle Focus": (
-            json.dumps(
-                [{"type": "dodge_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"},
-                 {"type": "crit_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["LINK"]),
-        ),
-        "Smoke Bomb": (
-            json.dumps(
-                [{"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["MOTION"]),
-        ),
-        "Blazing Uppercut": (
-            json.dumps(
-                [{"type": "dodge_down", "value": 10, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["STARTER"]),
-        ),
-        "Frost Lance": (
-            json.dumps(
-                [{"type": "dodge_down", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["LINK", "CONTROL"]),
-        ),
-        "Ranger Volley": (
-            json.dumps(
-                [{"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["MOTION"]),
-        ),
-        "Crimson Edge": (
-            json.dumps(
-                [{"type": "bleed", "value": 6, "duration": 3, "stacks": 1, "max_stacks": 2, "target": "enemy"}]
-            ),
-            json.dumps(["FINISH"]),
-        ),
-        "Meteor Break": (
-            json.dumps(
-                [{"type": "def_down", "value": 20, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
-            ),
-            json.dumps(["FINISH"]),
-        ),
-        "Aegis Shift": (
-            json.dumps(
-                [{"type": "def_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["SUPPORT"]),
-        ),
-        "Steel Pulse": (
-            json.dumps(
-                [{"type": "def_up", "value": 10, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Guardian Halo": (
-            json.dumps(
-                [{"type": "def_up", "value": 40, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Void Bastion": (
-            json.dumps(
-                [{"type": "def_up", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["CONTROL"]),
-        ),
-        "Quick Reset": (
-            json.dumps(
-                [{"type": "stamina_restore", "value": 15, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
-                 {"type": "crit_up", "value": 5, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["LINK"]),
-        ),
-        "Adrenal Rush": (
-            json.dumps(
-                [{"type": "move", "value": -1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
-                 {"type": "damage_up", "value": 15, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["STARTER", "MOTION"]),
-        ),
-        "Arcane Surge": (
-            json.dumps(
-                [{"type": "stamina_restore", "value": 30, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
-                 {"type": "dodge_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["SUPPORT"]),
-        ),
-        "Eclipse Pact": (
-            json.dumps(
-                [{"type": "stamina_restore", "value": -1000, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
-                 {"type": "crit_up", "value": 30, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
-                 {"type": "damage_up", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
-            ),
-            json.dumps(["FINISH"]),
-        ),
-    }
-    for name, (effects_json, combo_json) in effects.items():
-        cursor.execute(
-            """
-            UPDATE skills
-            SET effects_json = ?, combo_tags_json = ?
-            WHERE name = ? AND (effects_json = '[]' OR combo_tags_json = '[]')
-            """,
-            (effects_json, combo_json, name),
-        )
-    conn.commit()
+    cursor.executemany(
+        """
+        UPDATE skills
+        SET effects_json = ?, combo_tags_json = ?
+        WHERE name = ? AND (effects_json = '[]' OR combo_tags_json = '[]')
+        """,
+        [
+            (effects_json, combo_json, name)
+            for name, (effects_json, combo_json) in SKILL_EFFECT_SEED.items()
+        ],
+    )
 
 
 def _seed_achievements(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) as cnt FROM achievements")
-    if cursor.fetchone()["cnt"] > 0:
-        return
-    achievements = [
-        ("first_win", "Первая кровь", "Победить в бою 1 раз.", "Боец", "Novice Case", 1),
-        ("level_5", "Страж", "Достичь 5 уровня.", "Страж", "Hunter Case", 1),
-        ("level_10", "Ветеран", "Достичь 10 уровня.", "Ветеран", "Champion Case", 1),
-        ("cases_5", "Коллекционер", "Открыть 5 кейсов.", "Коллекционер", "Novice Case", 2),
-    ]
     cursor.executemany(
         """
-        INSERT INTO achievements (code, name, description, title, case_reward, case_qty)
-        VALUES (?, ?, ?, ?, ?, ?)
+        INSERT INTO achievements (code, name, description, title, case_reward, case_qty, counter, threshold)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(code) DO UPDATE SET
+            counter = excluded.counter,
+            threshold = excluded.threshold
         """,
-        achievements,
+        ACHIEVEMENT_SEED,
     )
-    conn.commit()
 
 
 def _seed_cases(conn: sqlite3.Connection) -> None:
@@ -824,82 +333,25 @@ def _seed_cases(conn: sqlite3.Connection) -> None:
     cursor.execute("SELECT COUNT(*) as cnt FROM cases")
     if cursor.fetchone()["cnt"] > 0:
         return
-    cases = [
-        (
-            "Novice Case",
-            "Стартовый кейс новичка. Содержит COMMON навыки.",
-            3,
-            4,
-            json.dumps({"COMMON": 1.0}),
-            0,
-            50,
-        ),
-        (
-            "Hunter Case",
-            "Награда за охоту. COMMON/RARE навыки.",
-            3,
-            5,
-            json.dumps({"COMMON": 0.65, "RARE": 0.30, "EPIC": 0.05}),
-            0,
-            120,
-        ),
-        (
-            "Champion Case",
-            "Кейс чемпиона. RARE/EPIC навыки.",
-            3,
-            5,
-            json.dumps({"RARE": 0.55, "EPIC": 0.35, "LEGENDARY": 0.10}),
-            0,
-            250,
-        ),
-        (
-            "Shadow Case",
-            "Теневой кейс. EPIC/LEGENDARY навыки.",
-            4,
-            5,
-            json.dumps({"RARE": 0.05, "EPIC": 0.55, "LEGENDARY": 0.40}),
-            1,
-            500,
-        ),
-        (
-            "Event Case",
-            "Ивентовый кейс. RARE/EPIC/LEGENDARY навыки.",
-            3,
-            5,
-            json.dumps({"RARE": 0.45, "EPIC": 0.40, "LEGENDARY": 0.15}),
-            1,
-            300,
-        ),
-    ]
     cursor.executemany(
         """
         INSERT INTO cases (name, description, min_rolls, max_rolls, weights_json, allow_hidden, price)
         VALUES (?, ?, ?, ?, ?, ?, ?)
         """,
-        cases,
+        CASE_SEED,
     )
-    conn.commit()
 
 
 def _ensure_case_prices(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
-    prices = {
-        "Novice Case": 50,
-        "Hunter Case": 120,
-        "Champion Case": 250,
-        "Shadow Case": 500,
-        "Event Case": 300,
-    }
-    for name, price in prices.items():
-        cursor.execute(
-            """
-            UPDATE cases
-            SET price = ?
-            WHERE name = ? AND (price IS NULL OR price = 0)
-            """,
-            (price, name),
-        )
-    conn.commit()
+    cursor.executemany(
+        """
+        UPDATE cases
+        SET price = ?
+        WHERE name = ? AND (price IS NULL OR price = 0)
+        """,
+        [(price, name) for name, price in CASE_PRICES.items()],
+    )
 
 
 def create_player(conn: sqlite3.Connection, telegram_id: int, username: str) -> Player:
@@ -911,21 +363,33 @@ def create_player(conn: sqlite3.Connection, telegram_id: int, username: str) ->
         """,
         (telegram_id, username),
     )
-    conn.commit()
-    player = get_player_by_telegram(conn, telegram_id)
-    if player:
-        assign_default_skills(conn, player.id)
-        grant_case(conn, player.id, "Novice Case", 1)
-    return player
+    player = Player(
+        id=cursor.lastrowid,
+        telegram_id=telegram_id,
+        username=username,
+        rank="F",
+        level=1,
+        xp=0,
+        gold=50,
+        hp=100,
+        stamina=100,
+        attack=12,
+        defense=6,
+        luck=5,
+        current_battle_id=None,
+    )
+    _stage_player(conn, player, None)
+    assign_default_skills(conn, player.id)
+    grant_case(conn, player.id, "Novice Case", 1)
+    return replace(player)
 
 
 def assign_default_skills(conn: sqlite3.Connection, player_id: int) -> None:
-    cursor = conn.cursor()
-    cursor.execute("SELECT level FROM players WHERE id = ?", (player_id,))
-    row = cursor.fetchone()
-    if not row:
+    player = _load_player(conn, player_id)
+    if not player:
         return
-    skill_ids = _list_skills_by_level(conn, row["level"])
+    cursor = conn.cursor()
+    skill_ids = _list_skills_by_level(conn, player.level)
     cursor.executemany(
         """
         INSERT OR IGNORE INTO player_skills (player_id, skill_id, is_unlocked, level, copies)
@@ -933,83 +397,72 @@ def assign_default_skills(conn: sqlite3.Connection, player_id: int) -> None:
         """,
         [(player_id, skill_id) for skill_id in skill_ids],
     )
-    conn.commit()
 
 
 def apply_skill_reward(conn: sqlite3.Connection, player_id: int, skill_id: int) -> None:
+    apply_skill_rewards(conn, player_id, [skill_id])
+
+
+def apply_skill_rewards(
+    conn: sqlite3.Connection, player_id: int, skill_ids: Iterable[int]
+) -> tuple[frozenset[int], dict[int, int]]:
+    # Дубликаты сворачиваются заранее: каждые 3 копии дают уровень, запись — один executemany.
+    counts = Counter(skill_ids)
+    if not counts:
+        return frozenset(), {}
     cursor = conn.cursor()
+    placeholders = ", ".join("?" for _ in counts)
     cursor.execute(
-        """
-        SELECT level, copies FROM player_skills
-        WHERE player_id = ? AND skill_id = ?
+        f"""
+        SELECT skill_id, level, copies FROM player_skills
+        WHERE player_id = ? AND skill_id IN ({placeholders})
         """,
-        (player_id, skill_id),
+        (player_id, *counts),
     )
-    row = cursor.fetchone()
-    if not row:
-        cursor.execute(
-            """
-            INSERT INTO player_skills (player_id, skill_id, is_unlocked, level, copies)
-            VALUES (?, ?, 1, 1, 0)
-            """,
-            (player_id, skill_id),
-        )
-        conn.commit()
-        return
-    copies = row["copies"] + 1
-    level = row["level"]
-    while copies >= 3:
-        copies -= 3
-        level += 1
-    cursor.execute(
+    current = {row["skill_id"]: (row["level"], row["copies"]) for row in cursor.fetchall()}
+    rows = []
+    level_ups: dict[int, int] = {}
+    for skill_id, times in counts.items():
+        if skill_id in current:
+            level, copies = current[skill_id]
+        else:
+            # Первая копия только открывает навык.
+            level, copies = 1, 0
+            times -= 1
+        gained, copies = divmod(copies + times, 3)
+        rows.append((player_id, skill_id, level + gained, copies))
+        if gained:
+            level_ups[skill_id] = gained
+    cursor.executemany(
         """
-        UPDATE player_skills
-        SET level = ?, copies = ?
-        WHERE player_id = ? AND skill_id = ?
+        INSERT INTO player_skills (player_id, skill_id, is_unlocked, level, copies)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT(player_id, skill_id) DO UPDATE SET
+            level = excluded.level,
+            copies = excluded.copies
         """,
-        (level, copies, player_id, skill_id),
+        rows,
     )
-    conn.commit()
+    return frozenset(counts.keys() - current.keys()), level_ups
 
 
 def _list_skills_by_level(conn: sqlite3.Connection, level: int) -> list[int]:
-    cursor = conn.cursor()
-    thresholds = {
-        "COMMON": 1,
-        "RARE": 5,
-        "EPIC": 10,
-        "LEGENDARY": 15,
-    }
-    allowed = [rarity for rarity, min_level in thresholds.items() if level >= min_level]
+    allowed = [rarity for rarity, min_level in SKILL_LEVEL_THRESHOLDS.items() if level >= min_level]
     if not allowed:
         allowed = ["COMMON"]
-    placeholders = ",".join("?" for _ in allowed)
-    cursor.execute(
-        f"""
-        SELECT id FROM skills
-        WHERE hidden = 0 AND rarity IN ({placeholders})
-        """,
-        allowed,
-    )
-    return [row["id"] for row in cursor.fetchall()]
+    catalog = get_catalog(conn)
+    return [
+        skill.id
+        for rarity in allowed
+        for skill in catalog.skills_by_rarity(rarity)
+        if not skill.hidden
+    ]
 
 
 def resync_player_skills_by_level(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
-    cursor.execute("SELECT id, level FROM players")
-    players = cursor.fetchall()
-    for row in players:
-        player_id = row["id"]
-        cursor.execute("DELETE FROM player_skills WHERE player_id = ?", (player_id,))
-        skill_ids = _list_skills_by_level(conn, row["level"])
-        cursor.executemany(
-            """
-            INSERT INTO player_skills (player_id, skill_id, is_unlocked, level, copies)
-            VALUES (?, ?, 1, 1, 0)
-            """,
-            [(player_id, skill_id) for skill_id in skill_ids],
-        )
-    conn.commit()
+    cursor.execute("DELETE FROM player_skills")
+    _backfill_default_skills(conn)
 
 
 def _get_meta(conn: sqlite3.Connection, key: str) -> str | None:
@@ -1025,7 +478,6 @@ def _set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
         "INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)",
         (key, value),
     )
-    conn.commit()
 
 
 def _maybe_resync_skills(conn: sqlite3.Connection) -> None:
@@ -1036,71 +488,70 @@ def _maybe_resync_skills(conn: sqlite3.Connection) -> None:
 
 
 def _increment_cases_opened(conn: sqlite3.Connection, player_id: int, delta: int) -> None:
+    player = _player_for_update(conn, player_id)
+    if not player:
+        return
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE players SET cases_opened = cases_opened + ? WHERE id = ?",
         (delta, player_id),
     )
-    conn.commit()
+    player.cases_opened += delta
+    _check_and_award_achievements(conn, player, "cases_opened", player.cases_opened - delta)
 
 
 def increment_wins(conn: sqlite3.Connection, player_id: int, delta: int) -> None:
+    player = _player_for_update(conn, player_id)
+    if not player:
+        return
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE players SET wins_pve = wins_pve + ? WHERE id = ?",
         (delta, player_id),
     )
-    conn.commit()
-    _check_and_award_achievements(conn, player_id)
+    player.wins_pve += delta
+    _check_and_award_achievements(conn, player, "wins_pve", player.wins_pve - delta)
 
 
-def _check_and_award_achievements(conn: sqlite3.Connection, player_id: int) -> None:
+def _check_and_award_achievements(
+    conn: sqlite3.Connection, player: Player, counter: str, previous: int
+) -> None:
+    # player — копия из транзакции (_player_for_update); счётчик уже увеличен.
+    catalog = get_catalog(conn)
     cursor = conn.cursor()
-    cursor.execute(
-        "SELECT level, wins_pve, cases_opened FROM players WHERE id = ?",
-        (player_id,),
-    )
-    player = cursor.fetchone()
-    if not player:
-        return
-    cursor.execute("SELECT * FROM achievements")
-    achievements = cursor.fetchall()
-    for ach in achievements:
+    if player.achievement_ids is None:
+        # Первая проверка игрока в процессе: подгружаем открытые и добираем всё уже заслуженное.
         cursor.execute(
-            """
-            SELECT 1 FROM player_achievements
-            WHERE player_id = ? AND achievement_id = ?
-            """,
-            (player_id, ach["id"]),
+            "SELECT achievement_id FROM player_achievements WHERE player_id = ?",
+            (player.id,),
         )
-        if cursor.fetchone():
-            continue
-        unlock = False
-        if ach["code"] == "first_win" and player["wins_pve"] >= 1:
-            unlock = True
-        elif ach["code"] == "level_5" and player["level"] >= 5:
-            unlock = True
-        elif ach["code"] == "level_10" and player["level"] >= 10:
-            unlock = True
-        elif ach["code"] == "cases_5" and player["cases_opened"] >= 5:
-            unlock = True
-        if not unlock:
+        player.achievement_ids = frozenset(row["achievement_id"] for row in cursor.fetchall())
+        candidates = [
+            ach
+            for ach in catalog.achievements
+            if ach.counter and getattr(player, ach.counter, 0) >= ach.threshold
+        ]
+    else:
+        candidates = catalog.achievements_crossed(counter, previous, getattr(player, counter))
+    for ach in sorted(candidates, key=lambda item: item.id):
+        if ach.id in player.achievement_ids:
             continue
+        player.achievement_ids = player.achievement_ids | {ach.id}
         cursor.execute(
             """
             INSERT INTO player_achievements (player_id, achievement_id, unlocked_at)
             VALUES (?, ?, ?)
             """,
-            (player_id, ach["id"], datetime.now(timezone.utc).isoformat()),
+            (player.id, ach.id, datetime.now(timezone.utc).isoformat()),
         )
-        if ach["title"]:
+        if ach.title:
             cursor.execute(
                 "UPDATE players SET title = ? WHERE id = ?",
-                (ach["title"], player_id),
+                (ach.title, player.id),
             )
-        if ach["case_reward"] and ach["case_qty"] > 0:
-            grant_case(conn, player_id, ach["case_reward"], ach["case_qty"])
-    conn.commit()
+            player.title = ach.title
+        if ach.case_reward and ach.case_qty > 0:
+            grant_case(conn, player.id, ach.case_reward, ach.case_qty)
 
 
 def _dedupe_skills_by_name(conn: sqlite3.Connection) -> None:
@@ -1135,25 +586,71 @@ def _dedupe_skills_by_name(conn: sqlite3.Connection) -> None:
             )
             cursor.execute("DELETE FROM player_skills WHERE skill_id = ?", (dup_id,))
             cursor.execute("DELETE FROM skills WHERE id = ?", (dup_id,))
-    conn.commit()
 
 
-def get_player_by_telegram(conn: sqlite3.Connection, telegram_id: int) -> Optional[Player]:
+def _stage_player(conn: sqlite3.Connection, player: Player, version: Optional[int]) -> None:
+    if not isinstance(conn, PooledConnection):
+        _players.invalidate(player.id)
+        return
+    if conn.staged_players is None:
+        conn.staged_players = {}
+    conn.staged_players[player.id] = (player, version)
+
+
+def _staged_player(conn: sqlite3.Connection, player_id: int) -> Optional[Player]:
+    staged = getattr(conn, "staged_players", None)
+    entry = staged.get(player_id) if staged else None
+    return entry[0] if entry else None
+
+
+def _fetch_player(conn: sqlite3.Connection, column: str, value: object) -> Optional[tuple[Player, Optional[int]]]:
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM players WHERE telegram_id = ?", (telegram_id,))
+    cursor.execute(f"SELECT * FROM players WHERE {column} = ?", (value,))
     row = cursor.fetchone()
     if not row:
         return None
-    return Player(**row)
+    player = Player(**row)
+    return player, _players.fill(player)
 
 
-def get_player_by_id(conn: sqlite3.Connection, player_id: int) -> Optional[Player]:
+def _reload_players(conn: sqlite3.Connection, player_ids: list[int]) -> list[Player]:
+    placeholders = ",".join("?" * len(player_ids))
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM players WHERE id = ?", (player_id,))
-    row = cursor.fetchone()
-    if not row:
+    cursor.execute(f"SELECT * FROM players WHERE id IN ({placeholders})", player_ids)
+    return [Player(**row) for row in cursor.fetchall()]
+
+
+def _load_player(conn: sqlite3.Connection, player_id: int) -> Optional[Player]:
+    player = _staged_player(conn, player_id)
+    if player:
+        return player
+    entry = _players.get_by_id(player_id) or _fetch_player(conn, "id", player_id)
+    return entry[0] if entry else None
+
+
+def _player_for_update(conn: sqlite3.Connection, player_id: int) -> Optional[Player]:
+    # Изменения пишутся в личную копию транзакции; в общий кэш она уйдёт на коммите.
+    player = _staged_player(conn, player_id)
+    if player:
+        return player
+    entry = _players.get_by_id(player_id) or _fetch_player(conn, "id", player_id)
+    if not entry:
         return None
-    return Player(**row)
+    _stage_player(conn, *entry)
+    return entry[0]
+
+
+def get_player_by_telegram(conn: sqlite3.Connection, telegram_id: int) -> Optional[Player]:
+    for player, _ in (getattr(conn, "staged_players", None) or {}).values():
+        if player.telegram_id == telegram_id:
+            return replace(player)
+    entry = _players.get_by_telegram(telegram_id) or _fetch_player(conn, "telegram_id", telegram_id)
+    return entry[0] if entry else None
+
+
+def get_player_by_id(conn: sqlite3.Connection, player_id: int) -> Optional[Player]:
+    player = _load_player(conn, player_id)
+    return replace(player) if player else None
 
 
 def get_player_by_username(conn: sqlite3.Connection, username: str) -> Optional[Player]:
@@ -1162,52 +659,255 @@ def get_player_by_username(conn: sqlite3.Connection, username: str) -> Optional[
     row = cursor.fetchone()
     if not row:
         return None
-    return Player(**row)
+    player = _staged_player(conn, row["id"])
+    if player:
+        return replace(player)
+    player = Player(**row)
+    _players.fill(player)
+    return player
 
 
 def update_player_battle(conn: sqlite3.Connection, player_id: int, battle_id: Optional[int]) -> None:
+    player = _player_for_update(conn, player_id)
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE players SET current_battle_id = ? WHERE id = ?",
         (battle_id, player_id),
     )
-    conn.commit()
+    if player:
+        player.current_battle_id = battle_id
 
 
-def list_top_players(conn: sqlite3.Connection, limit: int = 10) -> list[Player]:
+def load_leaderboard(conn: sqlite3.Connection) -> None:
     cursor = conn.cursor()
     cursor.execute(
-        "SELECT * FROM players ORDER BY level DESC, xp DESC LIMIT ?",
-        (limit,),
+        "SELECT id AS player_id, telegram_id, username, rank, level, xp FROM players"
     )
-    rows = cursor.fetchall()
-    return [Player(**row) for row in rows]
+    get_leaderboard().reset(LeaderboardEntry(**row) for row in cursor.fetchall())
 
 
-def get_monster_by_rank(conn: sqlite3.Connection, rank: str) -> Monster:
+def list_pvp_routes(conn: sqlite3.Connection) -> list[tuple[int, int]]:
+    # Активные дуэли: (telegram_id соперника, telegram_id зачинщика).
     cursor = conn.cursor()
     cursor.execute(
-        "SELECT * FROM monsters WHERE rank = ? ORDER BY RANDOM() LIMIT 1",
-        (rank,),
+        """
+        SELECT enemy.telegram_id, owner.telegram_id
+        FROM battles b
+        JOIN players owner ON owner.id = b.player_id
+        JOIN players enemy ON enemy.id = b.enemy_player_id
+        WHERE b.type = 'PVP' AND b.status = 'active'
+        """
     )
-    row = cursor.fetchone()
-    return Monster(**row)
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+
+def get_monster_by_rank(conn: sqlite3.Connection, rank: str) -> Monster:
+    return random.choice(get_catalog(conn).monsters_by_rank(rank))
 
 
 def get_monster_by_id(conn: sqlite3.Connection, monster_id: int) -> Monster:
+    return get_catalog(conn).monster(monster_id)
+
+
+def _hot_battle(conn: sqlite3.Connection, battle_id: int) -> Optional[HotBattle]:
+    # Активный бой живёт в памяти; из БД читаем только при первом обращении
+    # (в том числе после рестарта — это состояние последнего сброса).
+    staged = conn.staged_battles
+    if staged and battle_id in staged:
+        return staged[battle_id]
+    hot = _battles.checkout(battle_id)
+    if hot is None:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM battles WHERE id = ?", (battle_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        cursor.execute(
+            "SELECT * FROM battle_effects WHERE battle_id = ? ORDER BY id",
+            (battle_id,),
+        )
+        effects = {(eff["target"], eff["effect_type"]): dict(eff) for eff in cursor.fetchall()}
+        hot = HotBattle(Battle(**row), effects)
+        cursor.execute(
+            "SELECT * FROM battle_events WHERE battle_id = ? ORDER BY turn DESC LIMIT ?",
+            (battle_id, hot.events.maxlen),
+        )
+        hot.events.extendleft(_event_from_row(event) for event in cursor.fetchall())
+    if conn.staged_battles is None:
+        conn.staged_battles = {}
+    conn.staged_battles[battle_id] = hot
+    return hot
+
+
+def _write_battle(cursor: sqlite3.Cursor, hot: HotBattle, only_active: bool = False) -> bool:
+    battle = hot.battle
+    cursor.execute(
+        f"""
+        UPDATE battles
+        SET turn = ?, player_action = ?, enemy_action = ?, status = ?,
+            player_hp = ?, player_stamina = ?, enemy_hp = ?, enemy_stamina = ?, position = ?,
+            player_skill_id = ?, enemy_skill_id = ?, player_combo_json = ?, enemy_combo_json = ?,
+            rng_draws = ?, version = ?
+        WHERE id = ? AND version < ?{" AND status = 'active'" if only_active else ""}
+        """,
+        (
+            battle.turn,
+            battle.player_action,
+            battle.enemy_action,
+            battle.status,
+            battle.player_hp,
+            battle.player_stamina,
+            battle.enemy_hp,
+            battle.enemy_stamina,
+            battle.position,
+            battle.player_skill_id,
+            battle.enemy_skill_id,
+            battle.player_combo_json,
+            battle.enemy_combo_json,
+            battle.rng_draws,
+            battle.version,
+            battle.id,
+            battle.version,
+        ),
+    )
+    # Версия в БД только растёт: старый снимок не затрёт более новую запись.
+    if cursor.rowcount == 0:
+        return False
+    if hot.pending_events:
+        # Ходы только дописываются; повтор после неудачного сброса просто игнорируется.
+        cursor.executemany(
+            """
+            INSERT OR IGNORE INTO battle_events (
+                battle_id, turn, rng_draws, player_action, enemy_action,
+                player_damage, player_hit, enemy_damage, enemy_hit, position_from, position_to,
+                player_hp, player_stamina, enemy_hp, enemy_stamina, extra_json
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [_event_row(battle.id, event) for event in hot.pending_events],
+        )
+    # Эффекты синхронизируем двумя операциями на бой: UPSERT живых и удаление истёкших.
+    cursor.executemany(
+        """
+        INSERT INTO battle_effects (battle_id, target, effect_type, value, duration, stacks, max_stacks)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(battle_id, target, effect_type) DO UPDATE SET
+            value = excluded.value,
+            duration = excluded.duration,
+            stacks = excluded.stacks,
+            max_stacks = excluded.max_stacks
+        """,
+        [
+            (battle.id, target, effect_type, eff["value"], eff["duration"], eff["stacks"], eff["max_stacks"])
+            for (target, effect_type), eff in hot.effects.items()
+        ],
+    )
+    cursor.execute(
+        """
+        DELETE FROM battle_effects
+        WHERE battle_id = ?
+          AND json_array(target, effect_type) NOT IN (SELECT value FROM json_each(?))
+        """,
+        (battle.id, json.dumps([list(key) for key in hot.effects], separators=(",", ":"))),
+    )
+    return True
+
+
+def flush_battles(conn: sqlite3.Connection) -> int:
+    pending = _battles.take_dirty()
+    if pending:
+        try:
+            with transaction(conn):
+                cursor = conn.cursor()
+                for hot in pending:
+                    # Завершённый бой уже записан своим апдейтом — старый снимок его не затрёт.
+                    _write_battle(cursor, hot, only_active=True)
+        except BaseException:
+            _battles.requeue(pending)
+            raise
+        _battles.record_flush(len(pending))
+    _battles.evict_idle()
+    return len(pending)
+
+
+def _event_row(battle_id: int, event: BattleEvent) -> tuple:
+    return (
+        battle_id,
+        event.turn,
+        event.rng_draws,
+        ACTION_CODES[event.player_action],
+        ACTION_CODES[event.enemy_action],
+        event.player_damage,
+        event.player_hit,
+        event.enemy_damage,
+        event.enemy_hit,
+        POSITION_CODES[event.position_from],
+        POSITION_CODES[event.position_to],
+        event.player_hp,
+        event.player_stamina,
+        event.enemy_hp,
+        event.enemy_stamina,
+        json.dumps(
+            [event.player_effects, event.enemy_effects, event.player_combo, event.enemy_combo],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ),
+    )
+
+
+def _event_from_row(row: sqlite3.Row) -> BattleEvent:
+    player_effects, enemy_effects, player_combo, enemy_combo = json.loads(row["extra_json"])
+    return BattleEvent(
+        turn=row["turn"],
+        rng_draws=row["rng_draws"],
+        player_action=ACTIONS[row["player_action"]],
+        enemy_action=ACTIONS[row["enemy_action"]],
+        player_damage=row["player_damage"],
+        player_hit=row["player_hit"],
+        enemy_damage=row["enemy_damage"],
+        enemy_hit=row["enemy_hit"],
+        position_from=POSITIONS[row["position_from"]],
+        position_to=POSITIONS[row["position_to"]],
+        player_hp=row["player_hp"],
+        player_stamina=row["player_stamina"],
+        enemy_hp=row["enemy_hp"],
+        enemy_stamina=row["enemy_stamina"],
+        player_effects=tuple(tuple(eff) for eff in player_effects),
+        enemy_effects=tuple(tuple(eff) for eff in enemy_effects),
+        player_combo=tuple(player_combo),
+        enemy_combo=tuple(enemy_combo) if enemy_combo is not None else None,
+    )
+
+
+def add_battle_event(conn: sqlite3.Connection, battle_id: int, event: BattleEvent) -> None:
+    hot = _hot_battle(conn, battle_id)
+    if not hot:
+        return
+    hot.events.append(event)
+    hot.pending_events.append(event)
+    hot.changed = True
+
+
+def recent_battle_events(conn: sqlite3.Connection, battle_id: int) -> list[BattleEvent]:
+    hot = _hot_battle(conn, battle_id)
+    return list(hot.events) if hot else []
+
+
+def list_battle_events(conn: sqlite3.Connection, battle_id: int) -> list[BattleEvent]:
+    # Полная история для разбора споров: (rng_seed, rng_draws) каждого хода воспроизводит его.
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM monsters WHERE id = ?", (monster_id,))
-    row = cursor.fetchone()
-    return Monster(**row)
+    cursor.execute("SELECT * FROM battle_events WHERE battle_id = ? ORDER BY turn", (battle_id,))
+    events = [_event_from_row(row) for row in cursor.fetchall()]
+    hot = _hot_battle(conn, battle_id)
+    if hot:
+        flushed = events[-1].turn if events else 0
+        events.extend(event for event in hot.pending_events if event.turn > flushed)
+    return events
 
 
 def get_battle(conn: sqlite3.Connection, battle_id: int) -> Optional[Battle]:
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM battles WHERE id = ?", (battle_id,))
-    row = cursor.fetchone()
-    if not row:
-        return None
-    return Battle(**row)
+    hot = _hot_battle(conn, battle_id)
+    return replace(hot.battle) if hot else None
 
 
 def create_pve_battle(
@@ -1218,8 +918,8 @@ def create_pve_battle(
         """
         INSERT INTO battles (type, turn, player_action, enemy_action, log, status, player_id, monster_id,
                              enemy_player_id, player_hp, player_stamina, enemy_hp, enemy_stamina, position,
-                             player_skill_id, enemy_skill_id, player_combo_json, enemy_combo_json)
-        VALUES ('PVE', 1, NULL, NULL, '', 'active', ?, ?, NULL, ?, ?, ?, ?, 'medium', NULL, NULL, '{}', '{}')
+                             player_skill_id, enemy_skill_id, player_combo_json, enemy_combo_json, rng_seed)
+        VALUES ('PVE', 1, NULL, NULL, '', 'active', ?, ?, NULL, ?, ?, ?, ?, 'medium', NULL, NULL, '{}', '{}', ?)
         """,
         (
             player.id,
@@ -1228,9 +928,9 @@ def create_pve_battle(
             player.stamina,
             monster.hp,
             100,
+            new_battle_seed(),
         ),
     )
-    conn.commit()
     battle_id = cursor.lastrowid
     update_player_battle(conn, player.id, battle_id)
     return get_battle(conn, battle_id)
@@ -1244,8 +944,8 @@ def create_pvp_battle(
         """
         INSERT INTO battles (type, turn, player_action, enemy_action, log, status, player_id, monster_id,
                              enemy_player_id, player_hp, player_stamina, enemy_hp, enemy_stamina, position,
-                             player_skill_id, enemy_skill_id, player_combo_json, enemy_combo_json)
-        VALUES ('PVP', 1, NULL, NULL, '', 'active', ?, NULL, ?, ?, ?, ?, ?, 'medium', NULL, NULL, '{}', '{}')
+                             player_skill_id, enemy_skill_id, player_combo_json, enemy_combo_json, rng_seed)
+        VALUES ('PVP', 1, NULL, NULL, '', 'active', ?, NULL, ?, ?, ?, ?, ?, 'medium', NULL, NULL, '{}', '{}', ?)
         """,
         (
             player.id,
@@ -1254,9 +954,9 @@ def create_pvp_battle(
             player.stamina,
             enemy.hp,
             enemy.stamina,
+            new_battle_seed(),
         ),
     )
-    conn.commit()
     battle_id = cursor.lastrowid
     update_player_battle(conn, player.id, battle_id)
     update_player_battle(conn, enemy.id, battle_id)
@@ -1264,49 +964,31 @@ def create_pvp_battle(
 
 
 def update_battle(conn: sqlite3.Connection, battle: Battle) -> None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        UPDATE battles
-        SET turn = ?, player_action = ?, enemy_action = ?, log = ?, status = ?,
-            player_hp = ?, player_stamina = ?, enemy_hp = ?, enemy_stamina = ?, position = ?,
-            player_skill_id = ?, enemy_skill_id = ?, player_combo_json = ?, enemy_combo_json = ?
-        WHERE id = ?
-        """,
-        (
-            battle.turn,
-            battle.player_action,
-            battle.enemy_action,
-            battle.log,
-            battle.status,
-            battle.player_hp,
-            battle.player_stamina,
-            battle.enemy_hp,
-            battle.enemy_stamina,
-            battle.position,
-            battle.player_skill_id,
-            battle.enemy_skill_id,
-            battle.player_combo_json,
-            battle.enemy_combo_json,
-            battle.id,
-        ),
-    )
-    conn.commit()
+    hot = _hot_battle(conn, battle.id)
+    if not hot:
+        return
+    hot.battle = replace(battle, version=hot.base_version + 1)
+    hot.changed = True
+    if battle.status != "active":
+        # Итог боя пишем сразу, в одной транзакции с наградами; второй итог по той же версии не пройдёт.
+        if not _write_battle(conn.cursor(), hot):
+            raise BattleConflict(battle.id)
 
 
 def reward_player(conn: sqlite3.Connection, player_id: int, xp: int, gold: int) -> None:
+    # Игрока берём до UPDATE: при промахе кэша строка из БД ещё без нашей дельты.
+    player = _player_for_update(conn, player_id)
+    if not player:
+        return
     cursor = conn.cursor()
     cursor.execute(
         "UPDATE players SET xp = xp + ?, gold = gold + ? WHERE id = ?",
         (xp, gold, player_id),
     )
-    conn.commit()
-    cursor.execute("SELECT level, xp FROM players WHERE id = ?", (player_id,))
-    row = cursor.fetchone()
-    if not row:
-        return
-    prev_level = row["level"]
-    new_level, new_xp, levels_gained = apply_leveling(row["level"], row["xp"])
+    player.xp += xp
+    player.gold += gold
+    prev_level = player.level
+    new_level, new_xp, levels_gained = apply_leveling(player.level, player.xp)
     new_rank = rank_from_level(new_level)
     growth = level_stat_growth(levels_gained)
     cursor.execute(
@@ -1329,8 +1011,15 @@ def reward_player(conn: sqlite3.Connection, player_id: int, xp: int, gold: int)
             player_id,
         ),
     )
-    conn.commit()
-    _check_and_award_achievements(conn, player_id)
+    player.level = new_level
+    player.xp = new_xp
+    player.rank = new_rank
+    player.hp += growth["hp"]
+    player.stamina += growth["stamina"]
+    player.attack += growth["attack"]
+    player.defense += growth["defense"]
+    player.luck += growth["luck"]
+    _check_and_award_achievements(conn, player, "level", prev_level)
     if levels_gained > 0:
         for lvl in range(prev_level + 1, new_level + 1):
             grant_case(conn, player_id, "Novice Case", 1)
@@ -1351,7 +1040,6 @@ def add_battle_message(
         """,
         (battle_id, chat_id, message_id, datetime.now(timezone.utc).isoformat()),
     )
-    conn.commit()
 
 
 def list_battle_messages(conn: sqlite3.Connection, battle_id: int, chat_id: int) -> list[sqlite3.Row]:
@@ -1371,19 +1059,40 @@ def list_battle_messages(conn: sqlite3.Connection, battle_id: int, chat_id: int)
 def delete_battle_message(conn: sqlite3.Connection, row_id: int) -> None:
     cursor = conn.cursor()
     cursor.execute("DELETE FROM battle_messages WHERE id = ?", (row_id,))
-    conn.commit()
 
 
-def list_battle_effects(conn: sqlite3.Connection, battle_id: int, target: str) -> list[sqlite3.Row]:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT * FROM battle_effects
-        WHERE battle_id = ? AND target = ?
-        """,
-        (battle_id, target),
-    )
-    return cursor.fetchall()
+def list_battle_effects(conn: sqlite3.Connection, battle_id: int, target: str) -> list[dict]:
+    hot = _hot_battle(conn, battle_id)
+    if not hot:
+        return []
+    return [dict(eff) for (eff_target, _), eff in hot.effects.items() if eff_target == target]
+
+
+def _merge_effect(
+    hot: HotBattle,
+    target: str,
+    effect_type: str,
+    value: float,
+    duration: int,
+    max_stacks: int,
+) -> None:
+    current = hot.effects.get((target, effect_type))
+    if current:
+        current["stacks"] = min(max_stacks, current["stacks"] + 1)
+        current["duration"] = max(duration, current["duration"])
+        current["value"] = value
+        current["max_stacks"] = max_stacks
+    else:
+        hot.effects[(target, effect_type)] = {
+            "battle_id": hot.battle.id,
+            "target": target,
+            "effect_type": effect_type,
+            "value": value,
+            "duration": duration,
+            "stacks": 1,
+            "max_stacks": max_stacks,
+        }
+    hot.changed = True
 
 
 def upsert_battle_effect(
@@ -1395,108 +1104,64 @@ def upsert_battle_effect(
     duration: int,
     max_stacks: int,
 ) -> None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, stacks, duration
-        FROM battle_effects
-        WHERE battle_id = ? AND target = ? AND effect_type = ?
-        """,
-        (battle_id, target, effect_type),
-    )
-    row = cursor.fetchone()
-    if row:
-        new_stacks = min(max_stacks, row["stacks"] + 1)
-        new_duration = max(duration, row["duration"])
-        cursor.execute(
-            """
-            UPDATE battle_effects
-            SET stacks = ?, duration = ?, value = ?, max_stacks = ?
-            WHERE id = ?
-            """,
-            (new_stacks, new_duration, value, max_stacks, row["id"]),
-        )
-    else:
-        cursor.execute(
-            """
-            INSERT INTO battle_effects (battle_id, target, effect_type, value, duration, stacks, max_stacks)
-            VALUES (?, ?, ?, ?, ?, 1, ?)
-            """,
-            (battle_id, target, effect_type, value, duration, max_stacks),
-        )
-    conn.commit()
+    hot = _hot_battle(conn, battle_id)
+    if hot:
+        _merge_effect(hot, target, effect_type, value, duration, max_stacks)
+
+
+def apply_battle_effects(
+    conn: sqlite3.Connection,
+    battle_id: int,
+    effects: Iterable[tuple[str, str, float, int, int]],
+) -> None:
+    # Все эффекты навыка за один вызов: (target, effect_type, value, duration, max_stacks).
+    hot = _hot_battle(conn, battle_id)
+    if not hot:
+        return
+    for target, effect_type, value, duration, max_stacks in effects:
+        _merge_effect(hot, target, effect_type, value, duration, max_stacks)
 
 
 def tick_battle_effects(conn: sqlite3.Connection, battle_id: int) -> None:
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, duration FROM battle_effects WHERE battle_id = ?",
-        (battle_id,),
-    )
-    rows = cursor.fetchall()
-    for row in rows:
-        new_duration = row["duration"] - 1
-        if new_duration <= 0:
-            cursor.execute("DELETE FROM battle_effects WHERE id = ?", (row["id"],))
-        else:
-            cursor.execute(
-                "UPDATE battle_effects SET duration = ? WHERE id = ?",
-                (new_duration, row["id"]),
-            )
-    conn.commit()
+    hot = _hot_battle(conn, battle_id)
+    if not hot:
+        return
+    if not hot.effects:
+        return
+    hot.effects = {
+        key: {**eff, "duration": eff["duration"] - 1}
+        for key, eff in hot.effects.items()
+        if eff["duration"] > 1
+    }
+    hot.changed = True
+
+
 def list_player_skills(conn: sqlite3.Connection, player_id: int) -> list[Skill]:
     cursor = conn.cursor()
     cursor.execute(
         """
-        SELECT s.id, s.name, s.type, s.stamina_cost, s.damage_multiplier,
-               s.range, s.effect, s.rarity, s.hidden, s.description,
-               s.effects_json, s.combo_tags_json,
-               ps.level, ps.copies
-        FROM skills s
-        JOIN player_skills ps ON ps.skill_id = s.id
-        WHERE ps.player_id = ? AND ps.is_unlocked = 1
-        ORDER BY s.rarity, s.name
+        SELECT skill_id, level, copies
+        FROM player_skills
+        WHERE player_id = ? AND is_unlocked = 1
         """,
         (player_id,),
     )
-    rows = cursor.fetchall()
-    return [Skill(**row) for row in rows]
+    catalog = get_catalog(conn)
+    skills = []
+    for row in cursor.fetchall():
+        skill = catalog.skill(row["skill_id"])
+        if skill:
+            skills.append(replace(skill, level=row["level"], copies=row["copies"]))
+    skills.sort(key=lambda skill: (skill.rarity, skill.name))
+    return skills
 
 
 def get_skill_by_name(conn: sqlite3.Connection, name: str) -> Skill | None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, name, type, stamina_cost, damage_multiplier,
-               range, effect, rarity, hidden, description,
-               effects_json, combo_tags_json
-        FROM skills
-        WHERE name = ?
-        """,
-        (name,),
-    )
-    row = cursor.fetchone()
-    if not row:
-        return None
-    return Skill(**row)
+    return get_catalog(conn).skill_by_name(name)
 
 
 def get_skill_by_id(conn: sqlite3.Connection, skill_id: int) -> Skill | None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, name, type, stamina_cost, damage_multiplier,
-               range, effect, rarity, hidden, description,
-               effects_json, combo_tags_json
-        FROM skills
-        WHERE id = ?
-        """,
-        (skill_id,),
-    )
-    row = cursor.fetchone()
-    if not row:
-        return None
-    return Skill(**row)
+    return get_catalog(conn).skill(skill_id)
 
 
 def get_player_skill_meta(conn: sqlite3.Connection, player_id: int, skill_id: int) -> sqlite3.Row | None:
@@ -1541,12 +1206,11 @@ def list_cases_for_player(conn: sqlite3.Connection, player_id: int) -> list[sqli
 
 
 def grant_case(conn: sqlite3.Connection, player_id: int, case_name: str, qty: int) -> None:
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM cases WHERE name = ?", (case_name,))
-    row = cursor.fetchone()
-    if not row:
+    case = get_catalog(conn).case_by_name(case_name)
+    if not case:
         return
-    case_id = row["id"]
+    case_id = case.id
+    cursor = conn.cursor()
     cursor.execute(
         """
         INSERT INTO player_cases (player_id, case_id, quantity)
@@ -1555,67 +1219,37 @@ def grant_case(conn: sqlite3.Connection, player_id: int, case_name: str, qty: in
         """,
         (player_id, case_id, qty, qty),
     )
-    conn.commit()
 
 
-def list_shop_cases(conn: sqlite3.Connection) -> list[sqlite3.Row]:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT id, name, description, price
-        FROM cases
-        ORDER BY id
-        """
-    )
-    return cursor.fetchall()
+def list_shop_cases(conn: sqlite3.Connection) -> list[Case]:
+    return list(get_catalog(conn).cases)
 
 
-def get_case_by_id(conn: sqlite3.Connection, case_id: int) -> sqlite3.Row | None:
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM cases WHERE id = ?", (case_id,))
-    return cursor.fetchone()
+def get_case_by_id(conn: sqlite3.Connection, case_id: int) -> Case | None:
+    return get_catalog(conn).case(case_id)
 
 
-def buy_case(conn: sqlite3.Connection, player_id: int, case_name: str) -> bool:
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, price FROM cases WHERE name = ?", (case_name,))
-    case_row = cursor.fetchone()
-    if not case_row:
-        return False
-    cursor.execute("SELECT gold FROM players WHERE id = ?", (player_id,))
-    player_row = cursor.fetchone()
-    if not player_row or player_row["gold"] < case_row["price"]:
-        return False
-    cursor.execute(
-        "UPDATE players SET gold = gold - ? WHERE id = ?",
-        (case_row["price"], player_id),
-    )
-    cursor.execute(
-        """
-        INSERT INTO player_cases (player_id, case_id, quantity)
-        VALUES (?, ?, 1)
-        ON CONFLICT(player_id, case_id) DO UPDATE SET quantity = quantity + 1
-        """,
-        (player_id, case_row["id"]),
-    )
-    conn.commit()
-    return True
+def buy_case(conn: sqlite3.Connection, player_id: int, case_name: str) -> Optional[int]:
+    case = get_catalog(conn).case_by_name(case_name)
+    if not case:
+        return None
+    return buy_case_by_id(conn, player_id, case.id)
 
 
-def buy_case_by_id(conn: sqlite3.Connection, player_id: int, case_id: int) -> bool:
+def buy_case_by_id(conn: sqlite3.Connection, player_id: int, case_id: int) -> Optional[int]:
+    # Возвращает остаток золота после покупки или None, если купить нельзя.
+    case = get_catalog(conn).case(case_id)
+    if not case:
+        return None
+    player = _player_for_update(conn, player_id)
+    if not player or player.gold < case.price:
+        return None
     cursor = conn.cursor()
-    cursor.execute("SELECT price FROM cases WHERE id = ?", (case_id,))
-    case_row = cursor.fetchone()
-    if not case_row:
-        return False
-    cursor.execute("SELECT gold FROM players WHERE id = ?", (player_id,))
-    player_row = cursor.fetchone()
-    if not player_row or player_row["gold"] < case_row["price"]:
-        return False
     cursor.execute(
         "UPDATE players SET gold = gold - ? WHERE id = ?",
-        (case_row["price"], player_id),
+        (case.price, player_id),
     )
+    player.gold -= case.price
     cursor.execute(
         """
         INSERT INTO player_cases (player_id, case_id, quantity)
@@ -1624,59 +1258,58 @@ def buy_case_by_id(conn: sqlite3.Connection, player_id: int, case_id: int) -> bo
         """,
         (player_id, case_id),
     )
-    conn.commit()
-    return True
+    return player.gold
 
 
 def open_case(conn: sqlite3.Connection, player_id: int, case_name: str) -> list[Skill] | None:
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT c.*, pc.quantity
-        FROM cases c
-        JOIN player_cases pc ON pc.case_id = c.id
-        WHERE lower(c.name) = lower(?) AND pc.player_id = ?
-        """,
-        (case_name.strip(), player_id),
-    )
-    row = cursor.fetchone()
-    if not row or row["quantity"] <= 0:
+    case = get_catalog(conn).case_by_name(case_name)
+    if not case:
         return None
-    cursor.execute(
-        "UPDATE player_cases SET quantity = quantity - 1 WHERE player_id = ? AND case_id = ?",
-        (player_id, row["id"]),
-    )
-    rewards = roll_case_rewards(conn, player_id, row)
-    for skill in rewards:
-        apply_skill_reward(conn, player_id, skill.id)
-    _increment_cases_opened(conn, player_id, 1)
-    _check_and_award_achievements(conn, player_id)
-    conn.commit()
-    return rewards
+    return open_case_by_id(conn, player_id, case.id)
 
 
 def open_case_by_id(conn: sqlite3.Connection, player_id: int, case_id: int) -> list[Skill] | None:
+    opening = open_cases(conn, player_id, case_id, 1)
+    return opening.rewards if opening else None
+
+
+def open_cases(
+    conn: sqlite3.Connection, player_id: int, case_id: int, count: Optional[int] = None
+) -> CaseOpening | None:
+    # count=None — открыть все кейсы этого типа.
+    case = get_catalog(conn).case(case_id)
+    if not case:
+        return None
     cursor = conn.cursor()
     cursor.execute(
-        """
-        SELECT c.*, pc.quantity
-        FROM cases c
-        JOIN player_cases pc ON pc.case_id = c.id
-        WHERE c.id = ? AND pc.player_id = ?
-        """,
-        (case_id, player_id),
+        "SELECT quantity FROM player_cases WHERE player_id = ? AND case_id = ?",
+        (player_id, case_id),
     )
     row = cursor.fetchone()
-    if not row or row["quantity"] <= 0:
+    available = row["quantity"] if row else 0
+    count = available if count is None else min(count, available)
+    if count <= 0:
         return None
     cursor.execute(
-        "UPDATE player_cases SET quantity = quantity - 1 WHERE player_id = ? AND case_id = ?",
-        (player_id, row["id"]),
+        "UPDATE player_cases SET quantity = quantity - ? WHERE player_id = ? AND case_id = ?",
+        (count, player_id, case_id),
+    )
+    rewards = [skill for batch in roll_case_batch(conn, player_id, case, count) for skill in batch]
+    new_skill_ids, level_ups = apply_skill_rewards(conn, player_id, (skill.id for skill in rewards))
+    _increment_cases_opened(conn, player_id, count)
+    return CaseOpening(
+        case=case,
+        opened=count,
+        rewards=rewards,
+        new_skill_ids=new_skill_ids,
+        level_ups=level_ups,
     )
-    rewards = roll_case_rewards(conn, player_id, row)
-    for skill in rewards:
-        apply_skill_reward(conn, player_id, skill.id)
-    _increment_cases_opened(conn, player_id, 1)
-    _check_and_award_achievements(conn, player_id)
-    conn.commit()
-    return rewards
+
+
+def open_cases_by_name(
+    conn: sqlite3.Connection, player_id: int, case_name: str, count: Optional[int] = None
+) -> CaseOpening | None:
+    case = get_catalog(conn).case_by_name(case_name)
+    if not case:
+        return None
+    return open_cases(conn, player_id, case.id, count)
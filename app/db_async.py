@@ -0,0 +1,187 @@
+import asyncio
+import functools
+import logging
+import sqlite3
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from app import db
+
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+# Локи живут, пока их кто-то держит или ждёт.
+_battle_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+BATTLE_CONFLICT_RETRIES = 3
+
+
+def init_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor
+    shutdown_executor()
+    _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="db")
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # Вся работа с SQLite уходит в пул потоков, чтобы не блокировать event loop.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def _wrap(fn: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        return await run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _inline(fn: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    # Чтения из каталога в памяти дешевле самого перехода в пул потоков.
+    @functools.wraps(fn)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+async def get_connection(db_path: str) -> sqlite3.Connection:
+    return await run(db.get_connection, db_path)
+
+
+async def close_connection(conn: sqlite3.Connection) -> None:
+    await run(conn.close)
+
+
+def after_commit(conn: sqlite3.Connection, action: Callable[[], Awaitable[Any]]) -> None:
+    # Откат выбрасывает отложенные действия вместе с транзакцией.
+    if conn.after_commit_actions is None:
+        conn.after_commit_actions = []
+    conn.after_commit_actions.append(action)
+
+
+async def commit(conn: sqlite3.Connection) -> None:
+    while True:
+        if conn.in_transaction:
+            await run(conn.commit)
+        else:
+            # SQL не было — коммит лишь публикует изменения, накопленные в памяти.
+            conn.commit()
+        actions, conn.after_commit_actions = conn.after_commit_actions, None
+        if not actions:
+            return
+        # Отложенные действия могут снова писать в БД (например, id отправленных сообщений):
+        # это уже следующая транзакция, её фиксируем на следующем круге.
+        for action in actions:
+            await action()
+
+
+@asynccontextmanager
+async def session(db_path: str) -> AsyncIterator[sqlite3.Connection]:
+    # Одна транзакция на апдейт: коммит при успехе, откат при любой ошибке.
+    conn = await get_connection(db_path)
+    try:
+        yield conn
+        await commit(conn)
+    except BaseException:
+        await run(conn.rollback)
+        raise
+    finally:
+        await close_connection(conn)
+
+
+def battle_lock(battle_id: int) -> asyncio.Lock:
+    lock = _battle_locks.get(battle_id)
+    if lock is None:
+        lock = _battle_locks[battle_id] = asyncio.Lock()
+    return lock
+
+
+async def run_battle_turn(
+    conn: sqlite3.Connection, battle_id: int, turn: Callable[[], Awaitable[T]]
+) -> T:
+    # Ходы по одному бою в процессе идут по очереди, и лок держится до коммита:
+    # следующий обработчик уже видит результат предыдущего. Если бой всё же поменяли
+    # в обход лока, коммит упрётся в версию — откатываемся и считаем ход заново.
+    # Ответы в Telegram ход откладывает через after_commit, поэтому повтор их не дублирует.
+    async with battle_lock(battle_id):
+        for attempt in range(BATTLE_CONFLICT_RETRIES):
+            try:
+                result = await turn()
+                await commit(conn)
+                return result
+            except db.BattleConflict:
+                await run(conn.rollback)
+                if attempt == BATTLE_CONFLICT_RETRIES - 1:
+                    raise
+                logging.warning("Battle %s changed concurrently, retrying turn", battle_id)
+
+
+async def flush_battles(db_path: str) -> int:
+    conn = await get_connection(db_path)
+    try:
+        return await run(db.flush_battles, conn)
+    finally:
+        await close_connection(conn)
+
+
+async def battle_flusher(db_path: str, interval: float) -> None:
+    # Фоновый сброс изменённых боёв; при остановке задачу отменяют и делают финальный сброс.
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await flush_battles(db_path)
+        except Exception:
+            logging.exception("Battle flush failed")
+
+
+create_player = _wrap(db.create_player)
+assign_default_skills = _wrap(db.assign_default_skills)
+apply_skill_reward = _wrap(db.apply_skill_reward)
+increment_wins = _wrap(db.increment_wins)
+get_player_by_telegram = _wrap(db.get_player_by_telegram)
+get_player_by_id = _wrap(db.get_player_by_id)
+get_player_by_username = _wrap(db.get_player_by_username)
+update_player_battle = _wrap(db.update_player_battle)
+get_monster_by_rank = _inline(db.get_monster_by_rank)
+get_monster_by_id = _inline(db.get_monster_by_id)
+get_battle = _wrap(db.get_battle)
+create_pve_battle = _wrap(db.create_pve_battle)
+create_pvp_battle = _wrap(db.create_pvp_battle)
+update_battle = _wrap(db.update_battle)
+add_battle_event = _wrap(db.add_battle_event)
+recent_battle_events = _wrap(db.recent_battle_events)
+list_battle_events = _wrap(db.list_battle_events)
+reward_player = _wrap(db.reward_player)
+add_battle_message = _wrap(db.add_battle_message)
+list_battle_messages = _wrap(db.list_battle_messages)
+delete_battle_message = _wrap(db.delete_battle_message)
+list_battle_effects = _wrap(db.list_battle_effects)
+upsert_battle_effect = _wrap(db.upsert_battle_effect)
+apply_battle_effects = _wrap(db.apply_battle_effects)
+tick_battle_effects = _wrap(db.tick_battle_effects)
+list_player_skills = _wrap(db.list_player_skills)
+get_skill_by_name = _inline(db.get_skill_by_name)
+get_skill_by_id = _inline(db.get_skill_by_id)
+get_player_skill_meta = _wrap(db.get_player_skill_meta)
+player_has_skill = _wrap(db.player_has_skill)
+list_cases_for_player = _wrap(db.list_cases_for_player)
+grant_case = _wrap(db.grant_case)
+list_shop_cases = _inline(db.list_shop_cases)
+get_case_by_id = _inline(db.get_case_by_id)
+buy_case = _wrap(db.buy_case)
+buy_case_by_id = _wrap(db.buy_case_by_id)
+open_case = _wrap(db.open_case)
+open_case_by_id = _wrap(db.open_case_by_id)
+open_cases = _wrap(db.open_cases)
+open_cases_by_name = _wrap(db.open_cases_by_name)
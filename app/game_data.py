@@ -0,0 +1,562 @@
+import hashlib
+import json
+
+
+MONSTER_SEED = [
+    ("Песчаный слизень", "F", 60, 8, 4, "aggressive", 20, 15),
+    ("Лесной волк", "F", 70, 10, 5, "trickster", 24, 18),
+    ("Костяной страж", "D", 120, 16, 10, "defensive", 45, 40),
+    ("Болотный тролль", "C", 180, 22, 14, "berserk", 80, 65),
+    ("Кровавый рыцарь", "B", 240, 30, 18, "aggressive", 130, 110),
+    ("Дракон-страж", "A", 320, 40, 24, "berserk", 200, 180),
+    ("Тень древних", "S", 420, 52, 30, "stamina_drain", 320, 280),
+]
+
+
+SKILL_SEED = [
+    (
+        "Power Strike",
+        "ATTACK",
+        20,
+        1.5,
+        "MELEE",
+        "Оглушение на 1 ход (20% шанс).",
+        "COMMON",
+        0,
+        "Сильный удар на ближней дистанции.",
+    ),
+    (
+        "Twin Slash",
+        "ATTACK",
+        18,
+        1.3,
+        "MELEE",
+        "Кровотечение на 2 хода.",
+        "COMMON",
+        0,
+        "Два быстрых разреза.",
+    ),
+    (
+        "Piercing Shot",
+        "ATTACK",
+        22,
+        1.4,
+        "LONG",
+        "Игнорирует 20% DEF цели.",
+        "RARE",
+        0,
+        "Дальний выстрел по слабому месту.",
+    ),
+    (
+        "Whirlwind",
+        "ATTACK",
+        26,
+        1.6,
+        "MELEE",
+        "Снижает DEF цели на 10% на 2 хода.",
+        "RARE",
+        0,
+        "Вихревой удар по площади.",
+    ),
+    (
+        "Seismic удар",
+        "ATTACK",
+        30,
+        1.8,
+        "MID",
+        "Отбрасывает цель на 1 позицию.",
+        "EPIC",
+        0,
+        "Сильный удар с ударной волной.",
+    ),
+    (
+        "Shadow Lunge",
+        "ATTACK",
+        28,
+        1.7,
+        "MID",
+        "Сближает на 1 позицию и даёт +10% крит.",
+        "EPIC",
+        1,
+        "Скрытый выпад из тени. Открывается после победы над 10 монстрами.",
+    ),
+    (
+        "Iron Wall",
+        "DEFENSE",
+        15,
+        0.8,
+        "MELEE",
+        "Снижает урон на 30% в этом ходу.",
+        "COMMON",
+        0,
+        "Глухая оборона.",
+    ),
+    (
+        "Mirror Guard",
+        "DEFENSE",
+        20,
+        0.9,
+        "MID",
+        "Шанс отразить 20% урона.",
+        "RARE",
+        0,
+        "Защита с отражением.",
+    ),
+    (
+        "Evasion Step",
+        "DEFENSE",
+        18,
+        0.7,
+        "LONG",
+        "Отступает на 1 позицию, +15% уклон.",
+        "RARE",
+        0,
+        "Лёгкий шаг в сторону.",
+    ),
+    (
+        "Fortress Stance",
+        "DEFENSE",
+        24,
+        0.6,
+        "MELEE",
+        "Иммунитет к криту на 1 ход.",
+        "EPIC",
+        1,
+        "Секретная стойка. Открывается при ранге B.",
+    ),
+    (
+        "Second Wind",
+        "SUPPORT",
+        0,
+        0.0,
+        "MID",
+        "Восстанавливает 25 STA.",
+        "COMMON",
+        0,
+        "Восстановление дыхания.",
+    ),
+    (
+        "Battle Focus",
+        "SUPPORT",
+        10,
+        0.0,
+        "MID",
+        "Даёт +10% уклон и +10% крит на 2 хода.",
+        "RARE",
+        0,
+        "Фокус и холодный разум.",
+    ),
+    (
+        "Smoke Bomb",
+        "SUPPORT",
+        16,
+        0.0,
+        "LONG",
+        "Увеличивает дистанцию на 1.",
+        "RARE",
+        0,
+        "Дымовая завеса для отступления.",
+    ),
+    (
+        "Blazing Uppercut",
+        "ATTACK",
+        24,
+        1.45,
+        "MELEE",
+        "Подбрасывает цель, снижая её уклон на 10% на 1 ход.",
+        "COMMON",
+        0,
+        "Мощный удар снизу с огненным следом.",
+    ),
+    (
+        "Frost Lance",
+        "ATTACK",
+        26,
+        1.55,
+        "MID",
+        "Замедляет цель: -10% шанс уклонения на 2 хода.",
+        "RARE",
+        0,
+        "Ледяной выпад с контролем дистанции.",
+    ),
+    (
+        "Ranger Volley",
+        "ATTACK",
+        28,
+        1.6,
+        "LONG",
+        "Наносит урон и увеличивает дистанцию на 1.",
+        "RARE",
+        0,
+        "Серия дальних выстрелов.",
+    ),
+    (
+        "Crimson Edge",
+        "ATTACK",
+        32,
+        1.8,
+        "MELEE",
+        "Усиливает кровотечение: +1 ход к длительности.",
+        "EPIC",
+        0,
+        "Алый клинок оставляет глубокие раны.",
+    ),
+    (
+        "Meteor Break",
+        "ATTACK",
+        36,
+        2.0,
+        "MID",
+        "Снижает DEF цели на 20% на 2 хода.",
+        "LEGENDARY",
+        1,
+        "Легендарный удар с небес. Открывается после ранга A.",
+    ),
+    (
+        "Aegis Shift",
+        "DEFENSE",
+        18,
+        0.7,
+        "MID",
+        "Снимает отрицательный эффект и даёт +10% DEF на 2 хода.",
+        "COMMON",
+        0,
+        "Смена стойки, очищающая ауры.",
+    ),
+    (
+        "Steel Pulse",
+        "DEFENSE",
+        22,
+        0.6,
+        "MELEE",
+        "Отражает 10% урона и сдвигает позицию к средней.",
+        "RARE",
+        0,
+        "Ритмичная стойка стража.",
+    ),
+    (
+        "Guardian Halo",
+        "DEFENSE",
+        30,
+        0.5,
+        "MID",
+        "Снижает входящий урон на 40% на 1 ход.",
+        "EPIC",
+        0,
+        "Защитный барьер света.",
+    ),
+    (
+        "Void Bastion",
+        "DEFENSE",
+        34,
+        0.5,
+        "MELEE",
+        "Иммунитет к криту и -20% входящего урона на 1 ход.",
+        "LEGENDARY",
+        1,
+        "Тёмная бастилия. Открывается после 5 побед над S-рангом.",
+    ),
+    (
+        "Quick Reset",
+        "SUPPORT",
+        12,
+        0.0,
+        "MID",
+        "Восстанавливает 15 STA и даёт +5% крит на 1 ход.",
+        "COMMON",
+        0,
+        "Быстрое восстановление темпа.",
+    ),
+    (
+        "Adrenal Rush",
+        "SUPPORT",
+        20,
+        0.0,
+        "MELEE",
+        "Сближает на 1 позицию и даёт +15% урон на 1 ход.",
+        "RARE",
+        0,
+        "Рывок с выбросом адреналина.",
+    ),
+    (
+        "Arcane Surge",
+        "SUPPORT",
+        24,
+        0.0,
+        "LONG",
+        "Восстанавливает 30 STA и даёт +10% уклон на 2 хода.",
+        "EPIC",
+        0,
+        "Всплеск магической энергии.",
+    ),
+    (
+        "Eclipse Pact",
+        "SUPPORT",
+        0,
+        0.0,
+        "MID",
+        "Обнуляет STA, но даёт +30% крит и +20% урон на 1 ход.",
+        "LEGENDARY",
+        1,
+        "Договор затмения. Открывается на ранге S.",
+    ),
+]
+
+
+SKILL_EFFECT_SEED = {
+    "Power Strike": (
+        json.dumps(
+            [{"type": "stun", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["STARTER"]),
+    ),
+    "Twin Slash": (
+        json.dumps(
+            [{"type": "bleed", "value": 5, "duration": 2, "stacks": 1, "max_stacks": 2, "target": "enemy"}]
+        ),
+        json.dumps(["LINK"]),
+    ),
+    "Piercing Shot": (
+        json.dumps(
+            [{"type": "ignore_def", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["STARTER"]),
+    ),
+    "Whirlwind": (
+        json.dumps(
+            [{"type": "def_down", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["LINK"]),
+    ),
+    "Seismic удар": (
+        json.dumps(
+            [{"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Shadow Lunge": (
+        json.dumps(
+            [{"type": "move", "value": -1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["STARTER", "MOTION"]),
+    ),
+    "Iron Wall": (
+        json.dumps(
+            [{"type": "def_up", "value": 30, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Mirror Guard": (
+        json.dumps(
+            [{"type": "def_up", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Evasion Step": (
+        json.dumps(
+            [{"type": "dodge_up", "value": 15, "duration": 2, "stacks": 1, "max_stacks": 2, "target": "self"},
+             {"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["MOTION"]),
+    ),
+    "Fortress Stance": (
+        json.dumps(
+            [{"type": "crit_down", "value": 100, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Second Wind": (
+        json.dumps(
+            [{"type": "stamina_restore", "value": 25, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["SUPPORT"]),
+    ),
+    "Battle Focus": (
+        json.dumps(
+            [{"type": "dodge_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"},
+             {"type": "crit_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["LINK"]),
+    ),
+    "Smoke Bomb": (
+        json.dumps(
+            [{"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["MOTION"]),
+    ),
+    "Blazing Uppercut": (
+        json.dumps(
+            [{"type": "dodge_down", "value": 10, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["STARTER"]),
+    ),
+    "Frost Lance": (
+        json.dumps(
+            [{"type": "dodge_down", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["LINK", "CONTROL"]),
+    ),
+    "Ranger Volley": (
+        json.dumps(
+            [{"type": "move", "value": 1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["MOTION"]),
+    ),
+    "Crimson Edge": (
+        json.dumps(
+            [{"type": "bleed", "value": 6, "duration": 3, "stacks": 1, "max_stacks": 2, "target": "enemy"}]
+        ),
+        json.dumps(["FINISH"]),
+    ),
+    "Meteor Break": (
+        json.dumps(
+            [{"type": "def_down", "value": 20, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "enemy"}]
+        ),
+        json.dumps(["FINISH"]),
+    ),
+    "Aegis Shift": (
+        json.dumps(
+            [{"type": "def_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["SUPPORT"]),
+    ),
+    "Steel Pulse": (
+        json.dumps(
+            [{"type": "def_up", "value": 10, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Guardian Halo": (
+        json.dumps(
+            [{"type": "def_up", "value": 40, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Void Bastion": (
+        json.dumps(
+            [{"type": "def_up", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["CONTROL"]),
+    ),
+    "Quick Reset": (
+        json.dumps(
+            [{"type": "stamina_restore", "value": 15, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
+             {"type": "crit_up", "value": 5, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["LINK"]),
+    ),
+    "Adrenal Rush": (
+        json.dumps(
+            [{"type": "move", "value": -1, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
+             {"type": "damage_up", "value": 15, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["STARTER", "MOTION"]),
+    ),
+    "Arcane Surge": (
+        json.dumps(
+            [{"type": "stamina_restore", "value": 30, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
+             {"type": "dodge_up", "value": 10, "duration": 2, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["SUPPORT"]),
+    ),
+    "Eclipse Pact": (
+        json.dumps(
+            [{"type": "stamina_restore", "value": -1000, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
+             {"type": "crit_up", "value": 30, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"},
+             {"type": "damage_up", "value": 20, "duration": 1, "stacks": 1, "max_stacks": 1, "target": "self"}]
+        ),
+        json.dumps(["FINISH"]),
+    ),
+}
+
+
+# code, name, description, title, case_reward, case_qty, counter, threshold
+ACHIEVEMENT_SEED = [
+    ("first_win", "Первая кровь", "Победить в бою 1 раз.", "Боец", "Novice Case", 1, "wins_pve", 1),
+    ("level_5", "Страж", "Достичь 5 уровня.", "Страж", "Hunter Case", 1, "level", 5),
+    ("level_10", "Ветеран", "Достичь 10 уровня.", "Ветеран", "Champion Case", 1, "level", 10),
+    ("cases_5", "Коллекционер", "Открыть 5 кейсов.", "Коллекционер", "Novice Case", 2, "cases_opened", 5),
+]
+
+
+CASE_SEED = [
+    (
+        "Novice Case",
+        "Стартовый кейс новичка. Содержит COMMON навыки.",
+        3,
+        4,
+        json.dumps({"COMMON": 1.0}),
+        0,
+        50,
+    ),
+    (
+        "Hunter Case",
+        "Награда за охоту. COMMON/RARE навыки.",
+        3,
+        5,
+        json.dumps({"COMMON": 0.65, "RARE": 0.30, "EPIC": 0.05}),
+        0,
+        120,
+    ),
+    (
+        "Champion Case",
+        "Кейс чемпиона. RARE/EPIC навыки.",
+        3,
+        5,
+        json.dumps({"RARE": 0.55, "EPIC": 0.35, "LEGENDARY": 0.10}),
+        0,
+        250,
+    ),
+    (
+        "Shadow Case",
+        "Теневой кейс. EPIC/LEGENDARY навыки.",
+        4,
+        5,
+        json.dumps({"RARE": 0.05, "EPIC": 0.55, "LEGENDARY": 0.40}),
+        1,
+        500,
+    ),
+    (
+        "Event Case",
+        "Ивентовый кейс. RARE/EPIC/LEGENDARY навыки.",
+        3,
+        5,
+        json.dumps({"RARE": 0.45, "EPIC": 0.40, "LEGENDARY": 0.15}),
+        1,
+        300,
+    ),
+]
+
+
+CASE_PRICES = {
+    "Novice Case": 50,
+    "Hunter Case": 120,
+    "Champion Case": 250,
+    "Shadow Case": 500,
+    "Event Case": 300,
+}
+
+
+SKILL_LEVEL_THRESHOLDS = {
+    "COMMON": 1,
+    "RARE": 5,
+    "EPIC": 10,
+    "LEGENDARY": 15,
+}
+
+
+def catalog_fingerprint() -> str:
+    payload = json.dumps(
+        [
+            MONSTER_SEED,
+            SKILL_SEED,
+            SKILL_EFFECT_SEED,
+            ACHIEVEMENT_SEED,
+            CASE_SEED,
+            CASE_PRICES,
+            SKILL_LEVEL_THRESHOLDS,
+        ],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
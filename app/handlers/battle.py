@@ -1,28 +1,33 @@
-from aiogram import Router
+import sqlite3
+from typing import Optional
+
+from aiogram import Bot, Router
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message
-from aiogram.exceptions import TelegramBadRequest
 
-from app import state
-import json
 from app.combat.engine import FighterState, process_pve_turn, process_pvp_turn
+from app.combat.events import render_battle_event, turn_event
+from app.combat.rng import BattleRng
 from app.combat.formulas import ATTACK, DEFEND, DODGE, SKILL, SKIP, POSITIONS, clamp_stamina
-from app.combat.status import apply_dot_effects, effects_to_modifiers, parse_effects_json, summarize_effects
+from app.combat.status import CompiledEffects, Modifiers, turn_modifiers
 from app.combat.combo import apply_combo, dump_combo_state, load_combo_state
-from app.db import (
+from app.db_async import (
+    add_battle_event,
     add_battle_message,
+    after_commit,
+    apply_battle_effects,
     delete_battle_message,
     get_battle,
-    get_connection,
     get_monster_by_id,
     get_player_by_id,
-    get_player_by_telegram,
     get_skill_by_id,
     get_player_skill_meta,
     list_battle_messages,
     list_battle_effects,
     list_player_skills,
+    recent_battle_events,
     reward_player,
+    run_battle_turn,
     increment_wins,
     tick_battle_effects,
     upsert_battle_effect,
@@ -30,9 +35,10 @@ from app.db import (
     update_player_battle,
 )
 from app.keyboards import battle_keyboard, skills_select_keyboard
-from app.ui import templates
 from app.cases import roll_quest_case_drop
-from app.db import grant_case
+from app.db_async import grant_case
+from app.models import Battle, Player
+from app.outbox import get_outbox
 
 
 router = Router()
@@ -49,133 +55,131 @@ def _range_allows(position: str, skill_range: str) -> bool:
     return True
 
 
-def _build_bonus_from_effects(effects_rows: list) -> dict:
-    parsed = [
-        {
-            "effect_type": row["effect_type"],
-            "value": row["value"],
-            "duration": row["duration"],
-            "stacks": row["stacks"],
-        }
-        for row in effects_rows
-    ]
-    return effects_to_modifiers(parsed)
-
-
 def _shift_position_by_delta(position: str, delta: int) -> str:
     idx = POSITIONS.index(position)
     new_idx = max(0, min(len(POSITIONS) - 1, idx + delta))
     return POSITIONS[new_idx]
 
 
-def _apply_skill_effects(
+async def _duel_players(
+    conn: sqlite3.Connection, battle: Battle, player: Player
+) -> tuple[Optional[Player], Optional[Player]]:
+    # Свою сторону уже загрузил middleware, из БД берём только соперника.
+    if player.id == battle.player_id:
+        return player, await get_player_by_id(conn, battle.enemy_player_id)
+    return await get_player_by_id(conn, battle.player_id), player
+
+
+async def _cast_skill_effects(
     conn,
     battle_id: int,
     target: str,
-    effects_json: str,
-) -> dict:
-    effects = parse_effects_json(effects_json)
-    immediate = {"stamina_restore": 0, "move": 0, "ignore_def": 0, "damage_up": 0}
-    for eff in effects:
-        etype = eff.get("type")
-        value = eff.get("value", 0)
-        duration = eff.get("duration", 1)
-        max_stacks = eff.get("max_stacks", 1)
-        eff_target = eff.get("target", target)
-        if etype in {"stamina_restore", "move", "ignore_def", "damage_up"}:
-            immediate[etype] += value
-            continue
-        upsert_battle_effect(
-            conn,
-            battle_id=battle_id,
-            target=eff_target,
-            effect_type=etype,
-            value=value,
-            duration=duration,
-            max_stacks=max_stacks,
-        )
-    return immediate
+    effects: CompiledEffects,
+    mods: Modifiers,
+) -> None:
+    lasting = effects.cast(mods, target)
+    if lasting:
+        await apply_battle_effects(conn, battle_id, lasting)
 
 
-async def _send_battle_message(
+def _send_battle_message(
     source: Message,
     conn,
     battle_id: int,
     text: str,
     reply_markup=None,
 ) -> None:
-    sent = await source.answer(text, reply_markup=reply_markup)
-    add_battle_message(conn, battle_id, sent.chat.id, sent.message_id)
-    await _cleanup_battle_messages(source, conn, battle_id, sent.chat.id)
+    # Сообщение уходит только после коммита хода: откатанный или пересчитанный ход ничего не шлёт.
+    async def send() -> None:
+        sent = await source.answer(text, reply_markup=reply_markup)
+        await add_battle_message(conn, battle_id, sent.chat.id, sent.message_id)
+        await _cleanup_battle_messages(source, conn, battle_id, sent.chat.id)
+
+    after_commit(conn, send)
+
+
+def _answer(conn, callback: CallbackQuery, text: Optional[str] = None) -> None:
+    after_commit(conn, lambda: callback.answer(text))
 
 
 async def _cleanup_battle_messages(
     source: Message, conn, battle_id: int, chat_id: int
 ) -> None:
-    rows = list_battle_messages(conn, battle_id, chat_id)
-    for row in rows[KEEP_BATTLE_MESSAGES:]:
-        try:
-            await source.bot.delete_message(chat_id=chat_id, message_id=row["message_id"])
-        except TelegramBadRequest:
-            pass
-        delete_battle_message(conn, row["id"])
-
-
-@router.message(Command("battle"))
-async def cmd_battle(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, message.from_user.id)
-    if not player or not player.current_battle_id:
+    rows = await list_battle_messages(conn, battle_id, chat_id)
+    stale = rows[KEEP_BATTLE_MESSAGES:]
+    for row in stale:
+        await delete_battle_message(conn, row["id"])
+    if stale:
+        # Из чата удаляем только после коммита: при откате и строки, и сообщения остаются.
+        message_ids = [row["message_id"] for row in stale]
+        after_commit(conn, lambda: _post_deletes(source.bot, chat_id, message_ids))
+
+
+async def _post_deletes(bot: Bot, chat_id: int, message_ids: list[int]) -> None:
+    outbox = get_outbox()
+    for message_id in message_ids:
+        # Удаление ждать не нужно: оно уходит в очередь после подсказок боя.
+        outbox.post(bot.delete_message(chat_id=chat_id, message_id=message_id))
+
+
+@router.message(Command("battle"), flags={"player": True})
+async def cmd_battle(message: Message, conn: sqlite3.Connection, player: Player) -> None:
+    if not player.current_battle_id:
         await message.answer("🗺 Активных боев нет. Возьми контракт через /quest.")
-        conn.close()
         return
 
-    battle = get_battle(conn, player.current_battle_id)
+    battle = await get_battle(conn, player.current_battle_id)
     if not battle or battle.status != "active":
-        update_player_battle(conn, player.id, None)
+        await update_player_battle(conn, player.id, None)
         await message.answer("🏁 Бой завершен или не найден.")
-        conn.close()
         return
 
-    await _send_battle_message(
+    text = f"⚔️ Ход {battle.turn}. Выбери действие:"
+    # Напоминаем последний ход: текст собирается из события только здесь, при отправке.
+    events = await recent_battle_events(conn, battle.id)
+    if events:
+        monster = await get_monster_by_id(conn, battle.monster_id) if battle.type == "PVE" else None
+        text = f"{render_battle_event(events[-1], monster.name if monster else None)}\n\n{text}"
+    _send_battle_message(
         message,
         conn,
         battle.id,
-        f"⚔️ Ход {battle.turn}. Выбери действие:",
+        text,
         reply_markup=battle_keyboard(),
     )
-    conn.close()
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("battle:"))
-async def callback_battle_action(callback: CallbackQuery) -> None:
+@router.callback_query(lambda c: c.data and c.data.startswith("battle:"), flags={"player": True})
+async def callback_battle_action(
+    callback: CallbackQuery, conn: sqlite3.Connection, player: Player
+) -> None:
     action = callback.data.split(":", 1)[1]
     if action not in {ATTACK, DEFEND, SKILL, DODGE, SKIP}:
         await callback.answer("Неизвестное действие.")
         return
 
-    if not state.db_path:
-        await callback.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, callback.from_user.id)
-    if not player or not player.current_battle_id:
+    if not player.current_battle_id:
         await callback.answer("Нет активного боя.")
-        conn.close()
         return
 
-    battle = get_battle(conn, player.current_battle_id)
+    await run_battle_turn(
+        conn,
+        player.current_battle_id,
+        lambda: _battle_action(callback, conn, player, action),
+    )
+
+
+async def _battle_action(
+    callback: CallbackQuery, conn: sqlite3.Connection, player: Player, action: str
+) -> None:
+    battle = await get_battle(conn, player.current_battle_id)
     if not battle or battle.status != "active":
-        update_player_battle(conn, player.id, None)
-        await callback.answer("Бой завершен.")
-        conn.close()
+        await update_player_battle(conn, player.id, None)
+        _answer(conn, callback, "Бой завершен.")
         return
 
     if action == SKILL:
-        skills = list_player_skills(conn, player.id)
+        skills = await list_player_skills(conn, player.id)
         available = [
             skill
             for skill in skills
@@ -183,42 +187,35 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
             and skill.stamina_cost <= battle.player_stamina
         ]
         if not available:
-            await callback.answer("Нет доступных навыков по позиции.")
-            conn.close()
+            _answer(conn, callback, "Нет доступных навыков по позиции.")
             return
-        await _send_battle_message(
+        _send_battle_message(
             callback.message,
             conn,
             battle.id,
             "💥 Выбери навык:",
             reply_markup=skills_select_keyboard(available),
         )
-        await callback.answer()
-        conn.close()
+        _answer(conn, callback)
         return
 
     if battle.type == "PVE":
-        monster = get_monster_by_id(conn, battle.monster_id)
-        player_effects_rows = list_battle_effects(conn, battle.id, "player")
-        monster_effects_rows = list_battle_effects(conn, battle.id, "enemy")
-        battle.player_hp, player_dot = apply_dot_effects(player_effects_rows, battle.player_hp)
-        battle.enemy_hp, monster_dot = apply_dot_effects(monster_effects_rows, battle.enemy_hp)
-        player_bonus = _build_bonus_from_effects(player_effects_rows)
-        monster_bonus = _build_bonus_from_effects(monster_effects_rows)
-        if player_bonus.get("stunned"):
+        monster = await get_monster_by_id(conn, battle.monster_id)
+        player_effects_rows = await list_battle_effects(conn, battle.id, "player")
+        monster_effects_rows = await list_battle_effects(conn, battle.id, "enemy")
+        player_bonus = turn_modifiers(player_effects_rows)
+        monster_bonus = turn_modifiers(monster_effects_rows)
+        battle.player_hp = max(0, battle.player_hp - player_bonus.dot)
+        battle.enemy_hp = max(0, battle.enemy_hp - monster_bonus.dot)
+        if player_bonus.stunned:
             action = SKIP
 
         player_combo_state = load_combo_state(battle.player_combo_json)
         player_combo_state, combo_result = apply_combo(player_combo_state, [], action)
         battle.player_combo_json = dump_combo_state(player_combo_state)
-        combo_text = (
-            f"🔗 Комбо: шагов {player_combo_state['steps']} | осталось {player_combo_state['remaining']}"
-            if player_combo_state["active"]
-            else "🔗 Комбо: нет"
-        )
 
-        player_def = int(player.defense * (1 + player_bonus.get("def_pct", 0.0) / 100))
-        monster_def = int(monster.defense * (1 + monster_bonus.get("def_pct", 0.0) / 100))
+        player_def = int(player.defense * (1 + player_bonus.def_pct / 100))
+        monster_def = int(monster.defense * (1 + monster_bonus.def_pct / 100))
         player_state = FighterState(
             name=player.username,
             hp=battle.player_hp,
@@ -238,9 +235,9 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
             max_hp=monster.hp,
         )
 
+        rng = BattleRng(battle.rng_seed, battle.rng_draws)
         (
             monster_action,
-            log_entry,
             player_hp,
             player_sta,
             monster_hp,
@@ -253,18 +250,29 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
             player=player_state,
             monster=monster_state,
             monster_behavior=monster.behavior_type,
-            battle_turn=battle.turn,
             position=battle.position,
             player_bonus=player_bonus,
             monster_bonus=monster_bonus,
-            player_status_text=summarize_effects(player_effects_rows),
-            monster_status_text=summarize_effects(monster_effects_rows),
-            combo_text=combo_text,
             player_skill_cost=None,
             monster_skill_cost=None,
             player_skill_multiplier=1.0,
             monster_skill_multiplier=1.0,
+            rng=rng,
+        )
+
+        event = turn_event(
+            battle=battle,
+            player_action=action,
+            enemy_action=monster_action,
+            new_position=new_position,
+            player=player_state,
+            enemy=monster_state,
+            player_effects=player_effects_rows,
+            enemy_effects=monster_effects_rows,
+            player_combo=player_combo_state,
         )
+        await add_battle_event(conn, battle.id, event)
+        log_entry = render_battle_event(event, monster.name)
 
         battle.turn += 1
         battle.player_action = action
@@ -273,28 +281,26 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
         battle.player_stamina = player_sta
         battle.enemy_hp = monster_hp
         battle.enemy_stamina = monster_sta
+        battle.rng_draws = rng.draws
         battle.position = new_position
-        battle.log = templates.trim_battle_log(
-            (battle.log + "\n\n" + log_entry).strip()
-        )
-        tick_battle_effects(conn, battle.id)
+        await tick_battle_effects(conn, battle.id)
 
         if player_dead:
             battle.status = "lose"
-            update_player_battle(conn, player.id, None)
+            await update_player_battle(conn, player.id, None)
             result_text = "💀 Ты проиграл. Часть золота потеряна."
-            reward_player(conn, player.id, xp=0, gold=-10)
+            await reward_player(conn, player.id, xp=0, gold=-10)
         elif monster_dead:
             battle.status = "win"
-            update_player_battle(conn, player.id, None)
-            reward_player(
+            await update_player_battle(conn, player.id, None)
+            await reward_player(
                 conn, player.id, xp=monster.reward_xp, gold=monster.reward_gold
             )
-            increment_wins(conn, player.id, 1)
+            await increment_wins(conn, player.id, 1)
             drop_case = roll_quest_case_drop(player.rank)
             drop_text = ""
             if drop_case:
-                grant_case(conn, player.id, drop_case, 1)
+                await grant_case(conn, player.id, drop_case, 1)
                 drop_text = f"\n🎁 Выпал кейс: {drop_case}"
             result_text = (
                 f"🏆 Победа! +{monster.reward_xp} XP, +{monster.reward_gold} золота."
@@ -303,12 +309,10 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
         else:
             result_text = "⚔️ Бой продолжается."
     else:
-        p1 = get_player_by_id(conn, battle.player_id)
-        p2 = get_player_by_id(conn, battle.enemy_player_id)
+        p1, p2 = await _duel_players(conn, battle, player)
         if not p1 or not p2:
-            update_player_battle(conn, player.id, None)
-            await callback.answer("Противник не найден.")
-            conn.close()
+            await update_player_battle(conn, player.id, None)
+            _answer(conn, callback, "Противник не найден.")
             return
 
         if player.id == battle.player_id:
@@ -321,27 +325,26 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
             side_label = "Противник"
 
         if not battle.player_action or not battle.enemy_action:
-            update_battle(conn, battle)
-            await _send_battle_message(
+            await update_battle(conn, battle)
+            _send_battle_message(
                 callback.message,
                 conn,
                 battle.id,
                 f"⏳ {side_label} выбрал действие. Ожидаем второго игрока.",
             )
-            await callback.answer()
-            conn.close()
+            _answer(conn, callback)
             return
 
-        player_effects_rows = list_battle_effects(conn, battle.id, "player")
-        enemy_effects_rows = list_battle_effects(conn, battle.id, "enemy")
-        battle.player_hp, _ = apply_dot_effects(player_effects_rows, battle.player_hp)
-        battle.enemy_hp, _ = apply_dot_effects(enemy_effects_rows, battle.enemy_hp)
-        player_bonus = _build_bonus_from_effects(player_effects_rows)
-        enemy_bonus = _build_bonus_from_effects(enemy_effects_rows)
+        player_effects_rows = await list_battle_effects(conn, battle.id, "player")
+        enemy_effects_rows = await list_battle_effects(conn, battle.id, "enemy")
+        player_bonus = turn_modifiers(player_effects_rows)
+        enemy_bonus = turn_modifiers(enemy_effects_rows)
+        battle.player_hp = max(0, battle.player_hp - player_bonus.dot)
+        battle.enemy_hp = max(0, battle.enemy_hp - enemy_bonus.dot)
 
-        if player_bonus.get("stunned"):
+        if player_bonus.stunned:
             battle.player_action = SKIP
-        if enemy_bonus.get("stunned"):
+        if enemy_bonus.stunned:
             battle.enemy_action = SKIP
 
         player_combo_state = load_combo_state(battle.player_combo_json)
@@ -350,13 +353,9 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
         enemy_combo_state, _ = apply_combo(enemy_combo_state, [], battle.enemy_action)
         battle.player_combo_json = dump_combo_state(player_combo_state)
         battle.enemy_combo_json = dump_combo_state(enemy_combo_state)
-        combo_text = (
-            f"🔗 Комбо: Игрок {player_combo_state['steps']}/{player_combo_state['remaining']} | "
-            f"Противник {enemy_combo_state['steps']}/{enemy_combo_state['remaining']}"
-        )
 
-        p1_def = int(p1.defense * (1 + player_bonus.get("def_pct", 0.0) / 100))
-        p2_def = int(p2.defense * (1 + enemy_bonus.get("def_pct", 0.0) / 100))
+        p1_def = int(p1.defense * (1 + player_bonus.def_pct / 100))
+        p2_def = int(p2.defense * (1 + enemy_bonus.def_pct / 100))
         player_state = FighterState(
             name=p1.username,
             hp=battle.player_hp,
@@ -376,9 +375,9 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
             max_hp=p2.hp,
         )
 
+        rng = BattleRng(battle.rng_seed, battle.rng_draws)
         (
             _enemy_action,
-            log_entry,
             player_hp,
             player_sta,
             enemy_hp,
@@ -391,18 +390,30 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
             enemy_action=battle.enemy_action,
             player=player_state,
             enemy=enemy_state,
-            battle_turn=battle.turn,
             position=battle.position,
             player_bonus=player_bonus,
             enemy_bonus=enemy_bonus,
-            player_status_text=summarize_effects(player_effects_rows),
-            enemy_status_text=summarize_effects(enemy_effects_rows),
-            combo_text=combo_text,
             player_skill_cost=None,
             enemy_skill_cost=None,
             player_skill_multiplier=1.0,
             enemy_skill_multiplier=1.0,
+            rng=rng,
+        )
+
+        event = turn_event(
+            battle=battle,
+            player_action=battle.player_action,
+            enemy_action=battle.enemy_action,
+            new_position=new_position,
+            player=player_state,
+            enemy=enemy_state,
+            player_effects=player_effects_rows,
+            enemy_effects=enemy_effects_rows,
+            player_combo=player_combo_state,
+            enemy_combo=enemy_combo_state,
         )
+        await add_battle_event(conn, battle.id, event)
+        log_entry = render_battle_event(event)
 
         battle.turn += 1
         battle.player_action = None
@@ -411,93 +422,88 @@ async def callback_battle_action(callback: CallbackQuery) -> None:
         battle.player_stamina = player_sta
         battle.enemy_hp = enemy_hp
         battle.enemy_stamina = enemy_sta
+        battle.rng_draws = rng.draws
         battle.position = new_position
-        battle.log = templates.trim_battle_log(
-            (battle.log + "\n\n" + log_entry).strip()
-        )
-        tick_battle_effects(conn, battle.id)
+        await tick_battle_effects(conn, battle.id)
 
         if player_dead or enemy_dead:
             battle.status = "win"
-            update_player_battle(conn, battle.player_id, None)
-            update_player_battle(conn, battle.enemy_player_id, None)
+            await update_player_battle(conn, battle.player_id, None)
+            await update_player_battle(conn, battle.enemy_player_id, None)
             result_text = "🏁 Дуэль завершена."
         else:
             result_text = "⚔️ Дуэль продолжается."
 
-    update_battle(conn, battle)
-    await _send_battle_message(
+    await update_battle(conn, battle)
+    _send_battle_message(
         callback.message,
         conn,
         battle.id,
         f"{log_entry}\n\n{result_text}",
     )
     if battle.status == "active":
-        await _send_battle_message(
+        _send_battle_message(
             callback.message,
             conn,
             battle.id,
             "🎯 Выбери действие:",
             reply_markup=battle_keyboard(),
         )
-    await callback.answer()
-    conn.close()
+    _answer(conn, callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("skill:"))
-async def callback_skill_action(callback: CallbackQuery) -> None:
-    if not state.db_path:
-        await callback.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, callback.from_user.id)
-    if not player or not player.current_battle_id:
+@router.callback_query(lambda c: c.data and c.data.startswith("skill:"), flags={"player": True})
+async def callback_skill_action(
+    callback: CallbackQuery, conn: sqlite3.Connection, player: Player
+) -> None:
+    if not player.current_battle_id:
         await callback.answer("Нет активного боя.")
-        conn.close()
         return
 
-    battle = get_battle(conn, player.current_battle_id)
+    await run_battle_turn(
+        conn,
+        player.current_battle_id,
+        lambda: _skill_action(callback, conn, player),
+    )
+
+
+async def _skill_action(callback: CallbackQuery, conn: sqlite3.Connection, player: Player) -> None:
+    battle = await get_battle(conn, player.current_battle_id)
     if not battle or battle.status != "active":
-        await callback.answer("Бой завершен.")
-        conn.close()
+        _answer(conn, callback, "Бой завершен.")
         return
 
     skill_id = int(callback.data.split(":")[1])
-    skill = get_skill_by_id(conn, skill_id)
+    skill = await get_skill_by_id(conn, skill_id)
     if not skill or not _range_allows(battle.position, skill.range):
-        await callback.answer("Навык недоступен на этой дистанции.")
-        conn.close()
+        _answer(conn, callback, "Навык недоступен на этой дистанции.")
         return
 
     if battle.type == "PVE":
-        monster = get_monster_by_id(conn, battle.monster_id)
-        player_effects_rows = list_battle_effects(conn, battle.id, "player")
-        monster_effects_rows = list_battle_effects(conn, battle.id, "enemy")
-        battle.player_hp, _ = apply_dot_effects(player_effects_rows, battle.player_hp)
-        battle.enemy_hp, _ = apply_dot_effects(monster_effects_rows, battle.enemy_hp)
-
-        player_bonus = _build_bonus_from_effects(player_effects_rows)
-        monster_bonus = _build_bonus_from_effects(monster_effects_rows)
-        if player_bonus.get("stunned"):
-            await callback.answer("Ты оглушен.")
-            conn.close()
+        monster = await get_monster_by_id(conn, battle.monster_id)
+        player_effects_rows = await list_battle_effects(conn, battle.id, "player")
+        monster_effects_rows = await list_battle_effects(conn, battle.id, "enemy")
+        player_bonus = turn_modifiers(player_effects_rows)
+        monster_bonus = turn_modifiers(monster_effects_rows)
+        battle.player_hp = max(0, battle.player_hp - player_bonus.dot)
+        battle.enemy_hp = max(0, battle.enemy_hp - monster_bonus.dot)
+        if player_bonus.stunned:
+            _answer(conn, callback, "Ты оглушен.")
             return
 
-        immediate = _apply_skill_effects(conn, battle.id, "enemy", skill.effects_json)
-        player_bonus["ignore_def_pct"] = immediate["ignore_def"]
-        player_bonus["damage_pct"] = player_bonus.get("damage_pct", 0.0) + immediate["damage_up"]
-        battle.player_stamina = clamp_stamina(battle.player_stamina + immediate["stamina_restore"])
-        meta = get_player_skill_meta(conn, player.id, skill.id)
+        await _cast_skill_effects(conn, battle.id, "enemy", skill.effects, player_bonus)
+        battle.player_stamina = clamp_stamina(battle.player_stamina + player_bonus.stamina_restore)
+        meta = await get_player_skill_meta(conn, player.id, skill.id)
         skill_level = meta["level"] if meta else 1
         skill_multiplier = skill.damage_multiplier * (1 + 0.05 * (skill_level - 1))
 
-        tags = json.loads(skill.combo_tags_json) if skill.combo_tags_json else []
+        tags = list(skill.combo_tags)
         combo_state = load_combo_state(battle.player_combo_json)
         combo_state, combo_result = apply_combo(combo_state, tags, SKILL)
         battle.player_combo_json = dump_combo_state(combo_state)
         if combo_result.get("finisher_effect"):
             fin = combo_result["finisher_effect"]
-            upsert_battle_effect(
+            await upsert_battle_effect(
                 conn,
                 battle.id,
                 "enemy",
@@ -506,17 +512,10 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
                 fin["duration"],
                 fin["max_stacks"],
             )
-        player_bonus["damage_pct"] = player_bonus.get("damage_pct", 0.0) + combo_result.get(
-            "bonus_damage_pct", 0
-        )
-        combo_text = (
-            f"🔗 Комбо: шагов {combo_state['steps']} | осталось {combo_state['remaining']}"
-            if combo_state["active"]
-            else "🔗 Комбо: нет"
-        )
+        player_bonus.damage_pct += combo_result.get("bonus_damage_pct", 0)
 
-        player_def = int(player.defense * (1 + player_bonus.get("def_pct", 0.0) / 100))
-        monster_def = int(monster.defense * (1 + monster_bonus.get("def_pct", 0.0) / 100))
+        player_def = int(player.defense * (1 + player_bonus.def_pct / 100))
+        monster_def = int(monster.defense * (1 + monster_bonus.def_pct / 100))
         player_state = FighterState(
             name=player.username,
             hp=battle.player_hp,
@@ -536,9 +535,9 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
             max_hp=monster.hp,
         )
 
+        rng = BattleRng(battle.rng_seed, battle.rng_draws)
         (
             monster_action,
-            log_entry,
             player_hp,
             player_sta,
             monster_hp,
@@ -551,21 +550,32 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
             player=player_state,
             monster=monster_state,
             monster_behavior=monster.behavior_type,
-            battle_turn=battle.turn,
             position=battle.position,
             player_bonus=player_bonus,
             monster_bonus=monster_bonus,
-            player_status_text=summarize_effects(player_effects_rows),
-            monster_status_text=summarize_effects(monster_effects_rows),
-            combo_text=combo_text,
             player_skill_cost=skill.stamina_cost,
             monster_skill_cost=None,
             player_skill_multiplier=skill_multiplier,
             monster_skill_multiplier=1.0,
+            rng=rng,
         )
 
-        if immediate["move"]:
-            new_position = _shift_position_by_delta(new_position, int(immediate["move"]))
+        if player_bonus.move:
+            new_position = _shift_position_by_delta(new_position, int(player_bonus.move))
+
+        event = turn_event(
+            battle=battle,
+            player_action=SKILL,
+            enemy_action=monster_action,
+            new_position=new_position,
+            player=player_state,
+            enemy=monster_state,
+            player_effects=player_effects_rows,
+            enemy_effects=monster_effects_rows,
+            player_combo=combo_state,
+        )
+        await add_battle_event(conn, battle.id, event)
+        log_entry = render_battle_event(event, monster.name)
 
         battle.turn += 1
         battle.player_action = SKILL
@@ -574,46 +584,45 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
         battle.player_stamina = player_sta
         battle.enemy_hp = monster_hp
         battle.enemy_stamina = monster_sta
+        battle.rng_draws = rng.draws
         battle.position = new_position
-        battle.log = templates.trim_battle_log((battle.log + "\n\n" + log_entry).strip())
 
         if player_dead:
             battle.status = "lose"
-            update_player_battle(conn, player.id, None)
+            await update_player_battle(conn, player.id, None)
             result_text = "💀 Ты проиграл. Часть золота потеряна."
-            reward_player(conn, player.id, xp=0, gold=-10)
+            await reward_player(conn, player.id, xp=0, gold=-10)
         elif monster_dead:
             battle.status = "win"
-            update_player_battle(conn, player.id, None)
-            reward_player(conn, player.id, xp=monster.reward_xp, gold=monster.reward_gold)
-            increment_wins(conn, player.id, 1)
+            await update_player_battle(conn, player.id, None)
+            await reward_player(conn, player.id, xp=monster.reward_xp, gold=monster.reward_gold)
+            await increment_wins(conn, player.id, 1)
             drop_case = roll_quest_case_drop(player.rank)
             drop_text = ""
             if drop_case:
-                grant_case(conn, player.id, drop_case, 1)
+                await grant_case(conn, player.id, drop_case, 1)
                 drop_text = f"\n🎁 Выпал кейс: {drop_case}"
             result_text = f"🏆 Победа! +{monster.reward_xp} XP, +{monster.reward_gold} золота.{drop_text}"
         else:
             result_text = "⚔️ Бой продолжается."
 
-        tick_battle_effects(conn, battle.id)
-        update_battle(conn, battle)
-        await _send_battle_message(
+        await tick_battle_effects(conn, battle.id)
+        await update_battle(conn, battle)
+        _send_battle_message(
             callback.message,
             conn,
             battle.id,
             f"{log_entry}\n\n{result_text}",
         )
         if battle.status == "active":
-            await _send_battle_message(
+            _send_battle_message(
                 callback.message,
                 conn,
                 battle.id,
                 "🎯 Выбери действие:",
                 reply_markup=battle_keyboard(),
             )
-        await callback.answer()
-        conn.close()
+        _answer(conn, callback)
         return
 
     if player.id == battle.player_id:
@@ -626,52 +635,47 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
         side_label = "Противник"
 
     if not battle.player_action or not battle.enemy_action:
-        update_battle(conn, battle)
-        await _send_battle_message(
+        await update_battle(conn, battle)
+        _send_battle_message(
             callback.message,
             conn,
             battle.id,
             f"⏳ {side_label} выбрал навык. Ожидаем второго игрока.",
         )
-        await callback.answer()
-        conn.close()
+        _answer(conn, callback)
         return
 
-    p1 = get_player_by_id(conn, battle.player_id)
-    p2 = get_player_by_id(conn, battle.enemy_player_id)
+    p1, p2 = await _duel_players(conn, battle, player)
     if not p1 or not p2:
-        update_player_battle(conn, player.id, None)
-        await callback.answer("Противник не найден.")
-        conn.close()
+        await update_player_battle(conn, player.id, None)
+        _answer(conn, callback, "Противник не найден.")
         return
 
-    skill_p1 = get_skill_by_id(conn, battle.player_skill_id) if battle.player_skill_id else None
-    skill_p2 = get_skill_by_id(conn, battle.enemy_skill_id) if battle.enemy_skill_id else None
-    meta_p1 = get_player_skill_meta(conn, battle.player_id, skill_p1.id) if skill_p1 else None
-    meta_p2 = get_player_skill_meta(conn, battle.enemy_player_id, skill_p2.id) if skill_p2 else None
+    skill_p1 = await get_skill_by_id(conn, battle.player_skill_id) if battle.player_skill_id else None
+    skill_p2 = await get_skill_by_id(conn, battle.enemy_skill_id) if battle.enemy_skill_id else None
+    meta_p1 = await get_player_skill_meta(conn, battle.player_id, skill_p1.id) if skill_p1 else None
+    meta_p2 = await get_player_skill_meta(conn, battle.enemy_player_id, skill_p2.id) if skill_p2 else None
     p1_level = meta_p1["level"] if meta_p1 else 1
     p2_level = meta_p2["level"] if meta_p2 else 1
     p1_multiplier = skill_p1.damage_multiplier * (1 + 0.05 * (p1_level - 1)) if skill_p1 else 1.0
     p2_multiplier = skill_p2.damage_multiplier * (1 + 0.05 * (p2_level - 1)) if skill_p2 else 1.0
 
-    player_effects_rows = list_battle_effects(conn, battle.id, "player")
-    enemy_effects_rows = list_battle_effects(conn, battle.id, "enemy")
-    battle.player_hp, _ = apply_dot_effects(player_effects_rows, battle.player_hp)
-    battle.enemy_hp, _ = apply_dot_effects(enemy_effects_rows, battle.enemy_hp)
-    player_bonus = _build_bonus_from_effects(player_effects_rows)
-    enemy_bonus = _build_bonus_from_effects(enemy_effects_rows)
-
-    immediate_p1 = _apply_skill_effects(conn, battle.id, "enemy", skill_p1.effects_json) if skill_p1 else {"stamina_restore": 0, "move": 0, "ignore_def": 0, "damage_up": 0}
-    immediate_p2 = _apply_skill_effects(conn, battle.id, "player", skill_p2.effects_json) if skill_p2 else {"stamina_restore": 0, "move": 0, "ignore_def": 0, "damage_up": 0}
-    player_bonus["ignore_def_pct"] = immediate_p1["ignore_def"]
-    enemy_bonus["ignore_def_pct"] = immediate_p2["ignore_def"]
-    player_bonus["damage_pct"] = player_bonus.get("damage_pct", 0.0) + immediate_p1["damage_up"]
-    enemy_bonus["damage_pct"] = enemy_bonus.get("damage_pct", 0.0) + immediate_p2["damage_up"]
-    battle.player_stamina = clamp_stamina(battle.player_stamina + immediate_p1["stamina_restore"])
-    battle.enemy_stamina = clamp_stamina(battle.enemy_stamina + immediate_p2["stamina_restore"])
-
-    tags_p1 = json.loads(skill_p1.combo_tags_json) if skill_p1 and skill_p1.combo_tags_json else []
-    tags_p2 = json.loads(skill_p2.combo_tags_json) if skill_p2 and skill_p2.combo_tags_json else []
+    player_effects_rows = await list_battle_effects(conn, battle.id, "player")
+    enemy_effects_rows = await list_battle_effects(conn, battle.id, "enemy")
+    player_bonus = turn_modifiers(player_effects_rows)
+    enemy_bonus = turn_modifiers(enemy_effects_rows)
+    battle.player_hp = max(0, battle.player_hp - player_bonus.dot)
+    battle.enemy_hp = max(0, battle.enemy_hp - enemy_bonus.dot)
+
+    if skill_p1:
+        await _cast_skill_effects(conn, battle.id, "enemy", skill_p1.effects, player_bonus)
+    if skill_p2:
+        await _cast_skill_effects(conn, battle.id, "player", skill_p2.effects, enemy_bonus)
+    battle.player_stamina = clamp_stamina(battle.player_stamina + player_bonus.stamina_restore)
+    battle.enemy_stamina = clamp_stamina(battle.enemy_stamina + enemy_bonus.stamina_restore)
+
+    tags_p1 = list(skill_p1.combo_tags) if skill_p1 else []
+    tags_p2 = list(skill_p2.combo_tags) if skill_p2 else []
     combo_state_p1 = load_combo_state(battle.player_combo_json)
     combo_state_p2 = load_combo_state(battle.enemy_combo_json)
     combo_state_p1, combo_result_p1 = apply_combo(combo_state_p1, tags_p1, SKILL)
@@ -680,16 +684,15 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
     battle.enemy_combo_json = dump_combo_state(combo_state_p2)
     if combo_result_p1.get("finisher_effect"):
         fin = combo_result_p1["finisher_effect"]
-        upsert_battle_effect(conn, battle.id, "enemy", fin["type"], fin["value"], fin["duration"], fin["max_stacks"])
+        await upsert_battle_effect(conn, battle.id, "enemy", fin["type"], fin["value"], fin["duration"], fin["max_stacks"])
     if combo_result_p2.get("finisher_effect"):
         fin = combo_result_p2["finisher_effect"]
-        upsert_battle_effect(conn, battle.id, "player", fin["type"], fin["value"], fin["duration"], fin["max_stacks"])
-    player_bonus["damage_pct"] = player_bonus.get("damage_pct", 0.0) + combo_result_p1.get("bonus_damage_pct", 0)
-    enemy_bonus["damage_pct"] = enemy_bonus.get("damage_pct", 0.0) + combo_result_p2.get("bonus_damage_pct", 0)
-    combo_text = f"🔗 Комбо: Игрок {combo_state_p1['steps']} | Противник {combo_state_p2['steps']}"
+        await upsert_battle_effect(conn, battle.id, "player", fin["type"], fin["value"], fin["duration"], fin["max_stacks"])
+    player_bonus.damage_pct += combo_result_p1.get("bonus_damage_pct", 0)
+    enemy_bonus.damage_pct += combo_result_p2.get("bonus_damage_pct", 0)
 
-    p1_def = int(p1.defense * (1 + player_bonus.get("def_pct", 0.0) / 100))
-    p2_def = int(p2.defense * (1 + enemy_bonus.get("def_pct", 0.0) / 100))
+    p1_def = int(p1.defense * (1 + player_bonus.def_pct / 100))
+    p2_def = int(p2.defense * (1 + enemy_bonus.def_pct / 100))
     player_state = FighterState(
         name=p1.username,
         hp=battle.player_hp,
@@ -709,9 +712,9 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
         max_hp=p2.hp,
     )
 
+    rng = BattleRng(battle.rng_seed, battle.rng_draws)
     (
         _enemy_action,
-        log_entry,
         player_hp,
         player_sta,
         enemy_hp,
@@ -724,23 +727,35 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
         enemy_action=battle.enemy_action,
         player=player_state,
         enemy=enemy_state,
-        battle_turn=battle.turn,
         position=battle.position,
         player_bonus=player_bonus,
         enemy_bonus=enemy_bonus,
-        player_status_text=summarize_effects(player_effects_rows),
-        enemy_status_text=summarize_effects(enemy_effects_rows),
-        combo_text=combo_text,
         player_skill_cost=skill_p1.stamina_cost if skill_p1 else None,
         enemy_skill_cost=skill_p2.stamina_cost if skill_p2 else None,
         player_skill_multiplier=p1_multiplier,
         enemy_skill_multiplier=p2_multiplier,
+        rng=rng,
     )
 
-    move_delta = int(immediate_p1["move"]) + int(immediate_p2["move"])
+    move_delta = int(player_bonus.move) + int(enemy_bonus.move)
     if move_delta:
         new_position = _shift_position_by_delta(new_position, move_delta)
 
+    event = turn_event(
+        battle=battle,
+        player_action=battle.player_action,
+        enemy_action=battle.enemy_action,
+        new_position=new_position,
+        player=player_state,
+        enemy=enemy_state,
+        player_effects=player_effects_rows,
+        enemy_effects=enemy_effects_rows,
+        player_combo=combo_state_p1,
+        enemy_combo=combo_state_p2,
+    )
+    await add_battle_event(conn, battle.id, event)
+    log_entry = render_battle_event(event)
+
     battle.turn += 1
     battle.player_action = None
     battle.enemy_action = None
@@ -750,32 +765,31 @@ async def callback_skill_action(callback: CallbackQuery) -> None:
     battle.player_stamina = player_sta
     battle.enemy_hp = enemy_hp
     battle.enemy_stamina = enemy_sta
+    battle.rng_draws = rng.draws
     battle.position = new_position
-    battle.log = templates.trim_battle_log((battle.log + "\n\n" + log_entry).strip())
 
     if player_dead or enemy_dead:
         battle.status = "win"
-        update_player_battle(conn, battle.player_id, None)
-        update_player_battle(conn, battle.enemy_player_id, None)
+        await update_player_battle(conn, battle.player_id, None)
+        await update_player_battle(conn, battle.enemy_player_id, None)
         result_text = "🏁 Дуэль завершена."
     else:
         result_text = "⚔️ Дуэль продолжается."
 
-    tick_battle_effects(conn, battle.id)
-    update_battle(conn, battle)
-    await _send_battle_message(
+    await tick_battle_effects(conn, battle.id)
+    await update_battle(conn, battle)
+    _send_battle_message(
         callback.message,
         conn,
         battle.id,
         f"{log_entry}\n\n{result_text}",
     )
     if battle.status == "active":
-        await _send_battle_message(
+        _send_battle_message(
             callback.message,
             conn,
             battle.id,
             "🎯 Выбери действие:",
             reply_markup=battle_keyboard(),
         )
-    await callback.answer()
-    conn.close()
+    _answer(conn, callback)
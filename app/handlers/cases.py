@@ -1,16 +1,16 @@
+import sqlite3
+
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message
 
-from app import state
-from app.db import (
-    get_connection,
-    get_player_by_telegram,
+from app.db_async import (
     get_case_by_id,
     list_cases_for_player,
-    open_case,
     open_case_by_id,
+    open_cases_by_name,
 )
+from app.models import CaseOpening, Player
 from app.keyboards import cases_open_keyboard
 from app.ui import templates
 
@@ -18,22 +18,39 @@ from app.ui import templates
 router = Router()
 
 
-@router.message(Command("cases"))
-async def cmd_cases(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, message.from_user.id)
-    if not player:
-        await message.answer("🏰 Сначала зарегистрируйся через /start.")
-        conn.close()
-        return
+def _parse_open_args(args: str) -> tuple[str, int | None]:
+    # "/case open Novice Case all" или "/case open Novice Case 5"; без числа — один кейс.
+    name, _, tail = args.rpartition(" ")
+    if name and tail.lower() == "all":
+        return name.strip(), None
+    if name and tail.isdigit():
+        return name.strip(), int(tail)
+    return args.strip(), 1
 
-    cases = list_cases_for_player(conn, player.id)
+
+def _summary_text(opening: CaseOpening) -> str:
+    counts: dict[int, int] = {}
+    names: dict[int, str] = {}
+    for skill in opening.rewards:
+        counts[skill.id] = counts.get(skill.id, 0) + 1
+        names[skill.id] = skill.name
+    drops = [
+        (
+            names[skill_id],
+            times,
+            skill_id in opening.new_skill_ids,
+            opening.level_ups.get(skill_id, 0),
+        )
+        for skill_id, times in sorted(counts.items(), key=lambda item: (-item[1], names[item[0]]))
+    ]
+    return templates.case_open_summary(opening.case.name, opening.opened, drops)
+
+
+@router.message(Command("cases"), flags={"player": True})
+async def cmd_cases(message: Message, conn: sqlite3.Connection, player: Player) -> None:
+    cases = await list_cases_for_player(conn, player.id)
     if not cases:
         await message.answer("🎁 У тебя пока нет кейсов.")
-        conn.close()
         return
 
     lines = [templates.case_list_header()]
@@ -41,85 +58,66 @@ async def cmd_cases(message: Message) -> None:
         lines.append(
             templates.case_list_item(case["name"], case["quantity"], case["description"])
         )
-    lines.append("ℹ️ Открыть: /case open Название или кнопкой ниже")
+    lines.append("ℹ️ Открыть: /case open Название [all|N] или кнопкой ниже")
     await message.answer(
         "\n".join(lines),
         reply_markup=cases_open_keyboard(cases),
     )
-    conn.close()
 
 
-@router.message(Command("case"))
-async def cmd_case(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, message.from_user.id)
-    if not player:
-        await message.answer("🏰 Сначала зарегистрируйся через /start.")
-        conn.close()
-        return
-
+@router.message(Command("case"), flags={"player": True})
+async def cmd_case(message: Message, conn: sqlite3.Connection, player: Player) -> None:
     parts = message.text.split(maxsplit=2)
     if len(parts) < 3 or parts[1].lower() != "open":
-        await message.answer("Использование: /case open Название")
-        conn.close()
+        await message.answer("Использование: /case open Название [all|N]")
         return
 
-    case_name = parts[2]
-    rewards = open_case(conn, player.id, case_name)
-    if rewards is None:
+    case_name, count = _parse_open_args(parts[2])
+    if count == 0:
+        await message.answer("Укажи, сколько кейсов открыть.")
+        return
+    opening = await open_cases_by_name(conn, player.id, case_name, count)
+    if opening is None:
         await message.answer("Кейс не найден или закончился.")
-        conn.close()
         return
 
-    if not rewards:
+    if opening.opened > 1:
+        await message.answer(_summary_text(opening))
+        return
+
+    if not opening.rewards:
         await message.answer("🎁 Кейс открыт, но новых навыков не выпало.")
-        conn.close()
         return
 
-    reward_names = [r.name for r in rewards]
+    reward_names = [r.name for r in opening.rewards]
     await message.answer(templates.case_open_result(case_name, reward_names))
-    conn.close()
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("case:open:"))
-async def callback_case_open(callback: CallbackQuery) -> None:
-    if not state.db_path:
-        await callback.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, callback.from_user.id)
-    if not player:
-        await callback.answer("Сначала /start.")
-        conn.close()
-        return
+@router.callback_query(lambda c: c.data and c.data.startswith("case:open:"), flags={"player": True})
+async def callback_case_open(callback: CallbackQuery, conn: sqlite3.Connection, player: Player) -> None:
     case_id = int(callback.data.split(":")[2])
-    case_row = get_case_by_id(conn, case_id)
-    rewards = open_case_by_id(conn, player.id, case_id)
+    case_row = await get_case_by_id(conn, case_id)
+    rewards = await open_case_by_id(conn, player.id, case_id)
     if rewards is None:
         await callback.message.answer("Кейс не найден или закончился.")
         await callback.answer()
-        conn.close()
         return
     if not rewards:
         await callback.message.answer("🎁 Кейс открыт, но новых навыков не выпало.")
         await callback.answer()
-        conn.close()
         return
     reward_names = [r.name for r in rewards]
-    case_name = case_row["name"] if case_row else "Кейс"
+    case_name = case_row.name if case_row else "Кейс"
     await callback.message.answer(templates.case_open_result(case_name, reward_names))
     # обновляем список кейсов и клавиатуру в исходном сообщении
-    cases = list_cases_for_player(conn, player.id)
+    cases = await list_cases_for_player(conn, player.id)
     if cases:
         lines = [templates.case_list_header()]
         for case in cases:
             lines.append(
                 templates.case_list_item(case["name"], case["quantity"], case["description"])
             )
-        lines.append("ℹ️ Открыть: /case open Название или кнопкой ниже")
+        lines.append("ℹ️ Открыть: /case open Название [all|N] или кнопкой ниже")
         await callback.message.edit_text(
             "\n".join(lines),
             reply_markup=cases_open_keyboard(cases),
@@ -127,4 +125,3 @@ async def callback_case_open(callback: CallbackQuery) -> None:
     else:
         await callback.message.edit_text("🎁 У тебя пока нет кейсов.")
     await callback.answer()
-    conn.close()
@@ -1,27 +1,27 @@
+import sqlite3
+
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from app import state
 from app.keyboards import skills_inline_keyboard
 from app.progression import xp_to_next_level
 from app.ui import templates
-from app.db import create_player, get_connection, get_player_by_telegram, list_top_players
+from app.db_async import create_player, get_player_by_telegram
+from app.leaderboard import get_leaderboard
+from app.models import Player
 
 
 router = Router()
+TOP_LIMIT = 10
 
 
 @router.message(Command("start"))
-async def cmd_start(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, message.from_user.id)
+async def cmd_start(message: Message, conn: sqlite3.Connection) -> None:
+    player = await get_player_by_telegram(conn, message.from_user.id)
     if not player:
         username = message.from_user.username or f"user_{message.from_user.id}"
-        player = create_player(conn, message.from_user.id, username)
+        player = await create_player(conn, message.from_user.id, username)
         greet = "🏰 Добро пожаловать в Гильдию авантюристов! Регистрация завершена."
     else:
         greet = "✨ С возвращением, авантюрист."
@@ -39,20 +39,10 @@ async def cmd_start(message: Message) -> None:
         "ℹ️ /help — помощь"
     )
     await message.answer(f"{greet}\n\n{commands}")
-    conn.close()
 
 
-@router.message(Command("me"))
-async def cmd_me(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, message.from_user.id)
-    if not player:
-        await message.answer("Сначала зарегистрируйся через /start.")
-        conn.close()
-        return
+@router.message(Command("me"), flags={"player": True})
+async def cmd_me(message: Message, conn: sqlite3.Connection, player: Player) -> None:
     next_xp = xp_to_next_level(player.level)
     xp_left = max(0, next_xp - player.xp)
     title_text = f"🎖 Титул: {player.title}\n" if player.title else ""
@@ -66,27 +56,33 @@ async def cmd_me(message: Message) -> None:
         f"🗡 ATK: {player.attack} | 🛡 DEF: {player.defense} | 🍀 LUCK: {player.luck}"
     )
     await message.answer(text, reply_markup=skills_inline_keyboard())
-    conn.close()
 
 
 @router.message(Command("top"))
 async def cmd_top(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    players = list_top_players(conn, limit=10)
+    # Рейтинг целиком в памяти, БД здесь не нужна.
+    leaderboard = get_leaderboard()
+    players = leaderboard.top(TOP_LIMIT)
     if not players:
         await message.answer("🏆 Рейтинг пока пуст.")
-        conn.close()
         return
     lines = [templates.top_header()]
     for idx, player in enumerate(players, start=1):
         lines.append(
             templates.top_entry(idx, player.username, player.rank, player.level, player.xp)
         )
+    player_id = leaderboard.player_id(message.from_user.id)
+    position = leaderboard.position(player_id) if player_id else None
+    if position:
+        if position > TOP_LIMIT:
+            lines.append("…")
+            for idx, player in leaderboard.around(player_id):
+                if idx > TOP_LIMIT:
+                    lines.append(
+                        templates.top_entry(idx, player.username, player.rank, player.level, player.xp)
+                    )
+        lines.append(templates.top_position(position, len(leaderboard)))
     await message.answer("\n".join(lines))
-    conn.close()
 
 
 @router.message(Command("help"))
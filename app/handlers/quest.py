@@ -1,39 +1,28 @@
+import sqlite3
+
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from app import state
-from app.db import (
+from app.db_async import (
     create_pve_battle,
-    get_connection,
     get_monster_by_rank,
-    get_player_by_telegram,
     update_player_battle,
 )
+from app.models import Player
 
 
 router = Router()
 
 
-@router.message(Command("quest"))
-async def cmd_quest(message: Message) -> None:
-    if not state.db_path:
-        await message.answer("Ошибка конфигурации БД.")
-        return
-    conn = get_connection(state.db_path)
-    player = get_player_by_telegram(conn, message.from_user.id)
-    if not player:
-        await message.answer("🏰 Сначала зарегистрируйся через /start.")
-        conn.close()
-        return
-
+@router.message(Command("quest"), flags={"player": True})
+async def cmd_quest(message: Message, conn: sqlite3.Connection, player: Player) -> None:
     if player.current_battle_id:
         await message.answer("⚔️ У тебя уже есть активный бой. Используй /battle.")
-        conn.close()
         return
 
-    monster = get_monster_by_rank(conn, player.rank)
-    battle = create_pve_battle(conn, player, monster)
+    monster = await get_monster_by_rank(conn, player.rank)
+    battle = await create_pve_battle(conn, player, monster)
 
     text = (
         "📝 Контракт принят!\n"
@@ -42,4 +31,3 @@ async def cmd_quest(message: Message) -> None:
         "⚔️ Используй /battle для начала."
     )
     await message.answer(text)
-    conn.close()
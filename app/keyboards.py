@@ -2,6 +2,7 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from app.combat.formulas import ATTACK, DEFEND, DODGE, SKILL, SKIP
+from app.models import Case
 from app.ui.templates import action_label
 
 
@@ -16,13 +17,13 @@ def battle_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def shop_keyboard(cases: list[dict]) -> InlineKeyboardMarkup:
+def shop_keyboard(cases: list[Case]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for case in cases:
         builder.add(
             InlineKeyboardButton(
-                text=f"Купить {case['name']} ({case['price']}💰)",
-                callback_data=f"shop:buy:{case['id']}",
+                text=f"Купить {case.name} ({case.price}💰)",
+                callback_data=f"shop:buy:{case.id}",
             )
         )
     builder.adjust(1)
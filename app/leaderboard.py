@@ -0,0 +1,89 @@
+import threading
+from typing import Iterable, Optional
+
+from sortedcontainers import SortedList
+
+from app.models import LeaderboardEntry, Player
+
+
+SortKey = tuple[int, int, int]
+
+
+def _sort_key(entry: LeaderboardEntry) -> SortKey:
+    # Порядок как в старом ORDER BY level DESC, xp DESC; при равенстве — кто раньше зарегистрировался.
+    return (-entry.level, -entry.xp, entry.player_id)
+
+
+def _entry(player: Player) -> LeaderboardEntry:
+    return LeaderboardEntry(
+        player_id=player.id,
+        telegram_id=player.telegram_id,
+        username=player.username,
+        rank=player.rank,
+        level=player.level,
+        xp=player.xp,
+    )
+
+
+class Leaderboard:
+    def __init__(self, entries: Iterable[LeaderboardEntry] = ()) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[int, LeaderboardEntry] = {}
+        self._by_telegram: dict[int, int] = {}
+        # Ключи в порядке топа: вставка и удаление за логарифм, а не сдвиг списка.
+        self._keys: SortedList = SortedList()
+        self.reset(entries)
+
+    def reset(self, entries: Iterable[LeaderboardEntry]) -> None:
+        with self._lock:
+            self._entries = {entry.player_id: entry for entry in entries}
+            self._by_telegram = {e.telegram_id: e.player_id for e in self._entries.values()}
+            self._keys = SortedList(_sort_key(entry) for entry in self._entries.values())
+
+    def update(self, player: Player) -> None:
+        entry = _entry(player)
+        with self._lock:
+            current = self._entries.get(player.id)
+            if current == entry:
+                return
+            if current is not None:
+                self._keys.remove(_sort_key(current))
+            self._keys.add(_sort_key(entry))
+            self._entries[player.id] = entry
+            self._by_telegram[entry.telegram_id] = player.id
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def top(self, limit: int) -> list[LeaderboardEntry]:
+        with self._lock:
+            return [self._entries[key[2]] for key in self._keys.islice(0, limit)]
+
+    def player_id(self, telegram_id: int) -> Optional[int]:
+        return self._by_telegram.get(telegram_id)
+
+    def position(self, player_id: int) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(player_id)
+            if entry is None:
+                return None
+            return self._keys.bisect_left(_sort_key(entry)) + 1
+
+    def around(self, player_id: int, radius: int = 2) -> list[tuple[int, LeaderboardEntry]]:
+        with self._lock:
+            entry = self._entries.get(player_id)
+            if entry is None:
+                return []
+            idx = self._keys.bisect_left(_sort_key(entry))
+            start = max(0, idx - radius)
+            return [
+                (start + offset + 1, self._entries[key[2]])
+                for offset, key in enumerate(self._keys.islice(start, idx + radius + 1))
+            ]
+
+
+_leaderboard = Leaderboard()
+
+
+def get_leaderboard() -> Leaderboard:
+    return _leaderboard
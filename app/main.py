@@ -1,26 +1,30 @@
 import asyncio
 import logging
 
-from aiogram import Bot, Dispatcher
-
 from app.config import load_config
-from app.db import init_db
-from app.handlers import get_routers
-from app import state
+from app.runtime import build_dispatcher, create_bot, game_runtime
+from app.sharding import run_front
+from app.webhook import run_webhook
 
 
 async def main() -> None:
     logging.basicConfig(level=logging.INFO)
     config = load_config()
-    init_db(config.db_path)
-
-    bot = Bot(token=config.bot_token)
-    dp = Dispatcher()
-    for router in get_routers():
-        dp.include_router(router)
-
-    state.db_path = config.db_path
-    await dp.start_polling(bot)
+    if config.shards > 1:
+        await run_front(config)
+        return
+
+    bot = create_bot(config)
+    dp, serialization = build_dispatcher(config)
+    try:
+        async with game_runtime(config):
+            if config.run_mode == "webhook":
+                await run_webhook(bot, dp, config)
+            else:
+                await dp.start_polling(bot, tasks_concurrency_limit=config.max_concurrent_updates)
+    finally:
+        await bot.session.close()
+        logging.info("Updates: %s", serialization.stats())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from app.db_async import get_player_by_telegram, session
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    def __init__(self, db_path: str) -> None:
+        self.db_path = db_path
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with session(self.db_path) as conn:
+            data["conn"] = conn
+            return await handler(event, data)
+
+
+class PlayerContextMiddleware(UnitOfWorkMiddleware):
+    # Хендлерам с флагом player игрок загружается один раз на апдейт и приходит аргументом;
+    # незарегистрированным отвечаем здесь, до хендлера.
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if "conn" in data:
+            return await self._with_player(handler, event, data)
+        return await super().__call__(
+            lambda event, data: self._with_player(handler, event, data), event, data
+        )
+
+    async def _with_player(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not get_flag(data, "player"):
+            return await handler(event, data)
+        user = data.get("event_from_user")
+        player = await get_player_by_telegram(data["conn"], user.id) if user else None
+        if player is None:
+            if isinstance(event, CallbackQuery):
+                await event.answer("Сначала /start.")
+            else:
+                await event.answer("🏰 Сначала зарегистрируйся через /start.")
+            return None
+        data["player"] = player
+        return await handler(event, data)
+
+
+class RecentKeys:
+    # Недавно увиденные ключи: ограничены и по числу, и по времени жизни.
+    # Порядок вставки совпадает с порядком времени, поэтому истёкшие всегда в начале.
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._seen: OrderedDict[Hashable, float] = OrderedDict()
+
+    def add(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        while self._seen:
+            oldest, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.ttl:
+                break
+            del self._seen[oldest]
+        if key in self._seen:
+            return False
+        self._seen[key] = now
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class UserSerializationMiddleware(BaseMiddleware):
+    # Внешний middleware апдейтов: повторы отбрасываются до любого обращения к БД,
+    # а апдейты одного пользователя обрабатываются строго по очереди.
+    def __init__(self, dedupe_size: int = 10000, dedupe_ttl: float = 600.0) -> None:
+        self.recent = RecentKeys(dedupe_size, dedupe_ttl)
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.duplicates = 0
+        self.lock_waits = 0
+        self.lock_wait_total = 0.0
+        self.lock_wait_max = 0.0
+
+    def _is_duplicate(self, event: Update) -> bool:
+        fresh = self.recent.add(("update", event.update_id))
+        if event.callback_query is not None:
+            # Переотправленный колбэк может прийти с новым update_id, но с тем же id.
+            fresh = self.recent.add(("callback", event.callback_query.id)) and fresh
+        return not fresh
+
+    def _lock(self, user_id: int) -> asyncio.Lock:
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        return lock
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update) and self._is_duplicate(event):
+            self.duplicates += 1
+            return None
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        lock = self._lock(user.id)
+        contended = lock.locked()
+        started = time.monotonic()
+        async with lock:
+            if contended:
+                waited = time.monotonic() - started
+                self.lock_waits += 1
+                self.lock_wait_total += waited
+                self.lock_wait_max = max(self.lock_wait_max, waited)
+            return await handler(event, data)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "duplicates": self.duplicates,
+            "tracked_keys": len(self.recent),
+            "lock_waits": self.lock_waits,
+            "lock_wait_avg": self.lock_wait_total / self.lock_waits if self.lock_waits else 0.0,
+            "lock_wait_max": self.lock_wait_max,
+        }
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    # Не больше limit апдейтов в обработке одновременно, остальные ждут слота.
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, limit)
+        self._slots = asyncio.Semaphore(self.limit)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with self._slots:
+            return await handler(event, data)
@@ -0,0 +1,432 @@
+import sqlite3
+from typing import Callable
+
+
+SCHEMA_VERSION_KEY = "schema_version"
+
+MigrationFn = Callable[[sqlite3.Connection], None]
+
+MIGRATIONS: dict[int, MigrationFn] = {}
+
+
+def migration(version: int) -> Callable[[MigrationFn], MigrationFn]:
+    def decorator(fn: MigrationFn) -> MigrationFn:
+        if version in MIGRATIONS:
+            raise ValueError(f"Migration {version} is already registered")
+        MIGRATIONS[version] = fn
+        return fn
+
+    return decorator
+
+
+def latest_version() -> int:
+    return max(MIGRATIONS, default=0)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    row = conn.execute(
+        "SELECT value FROM app_meta WHERE key = ?", (SCHEMA_VERSION_KEY,)
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    # При актуальной схеме старт сводится к одной проверке версии.
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        """
+    )
+    version = current_version(conn)
+    for target in sorted(v for v in MIGRATIONS if v > version):
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN")
+        try:
+            MIGRATIONS[target](conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO app_meta (key, value) VALUES (?, ?)",
+                (SCHEMA_VERSION_KEY, str(target)),
+            )
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        version = target
+    return version
+
+
+@migration(1)
+def _initial_schema(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS players (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            telegram_id INTEGER UNIQUE NOT NULL,
+            username TEXT NOT NULL,
+            rank TEXT NOT NULL,
+            level INTEGER NOT NULL,
+            xp INTEGER NOT NULL,
+            gold INTEGER NOT NULL,
+            hp INTEGER NOT NULL,
+            stamina INTEGER NOT NULL,
+            attack INTEGER NOT NULL,
+            defense INTEGER NOT NULL,
+            luck INTEGER NOT NULL,
+            current_battle_id INTEGER,
+            title TEXT,
+            wins_pve INTEGER NOT NULL DEFAULT 0,
+            cases_opened INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS monsters (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            rank TEXT NOT NULL,
+            hp INTEGER NOT NULL,
+            atk INTEGER NOT NULL,
+            defense INTEGER NOT NULL,
+            behavior_type TEXT NOT NULL,
+            reward_xp INTEGER NOT NULL,
+            reward_gold INTEGER NOT NULL
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS battles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            turn INTEGER NOT NULL,
+            player_action TEXT,
+            enemy_action TEXT,
+            log TEXT NOT NULL,
+            status TEXT NOT NULL,
+            player_id INTEGER NOT NULL,
+            monster_id INTEGER,
+            enemy_player_id INTEGER,
+            player_hp INTEGER NOT NULL,
+            player_stamina INTEGER NOT NULL,
+            enemy_hp INTEGER NOT NULL,
+            enemy_stamina INTEGER NOT NULL,
+            position TEXT NOT NULL
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS skills (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            type TEXT NOT NULL,
+            stamina_cost INTEGER NOT NULL,
+            damage_multiplier REAL NOT NULL,
+            range TEXT NOT NULL,
+            effect TEXT NOT NULL,
+            rarity TEXT NOT NULL,
+            hidden INTEGER NOT NULL DEFAULT 0,
+            description TEXT NOT NULL,
+            effects_json TEXT NOT NULL DEFAULT '[]',
+            combo_tags_json TEXT NOT NULL DEFAULT '[]'
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS battle_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            battle_id INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS battle_effects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            battle_id INTEGER NOT NULL,
+            target TEXT NOT NULL,
+            effect_type TEXT NOT NULL,
+            value REAL NOT NULL,
+            duration INTEGER NOT NULL,
+            stacks INTEGER NOT NULL,
+            max_stacks INTEGER NOT NULL
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS cases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            description TEXT NOT NULL,
+            min_rolls INTEGER NOT NULL,
+            max_rolls INTEGER NOT NULL,
+            weights_json TEXT NOT NULL,
+            allow_hidden INTEGER NOT NULL DEFAULT 0,
+            price INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS player_cases (
+            player_id INTEGER NOT NULL,
+            case_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, case_id)
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            description TEXT NOT NULL,
+            title TEXT,
+            case_reward TEXT,
+            case_qty INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS player_achievements (
+            player_id INTEGER NOT NULL,
+            achievement_id INTEGER NOT NULL,
+            unlocked_at TEXT NOT NULL,
+            PRIMARY KEY (player_id, achievement_id)
+        )
+        """
+    )
+    _ensure_battle_columns(conn)
+    _ensure_skill_columns(conn)
+    _ensure_player_skills_table(conn)
+    _ensure_player_skills_columns(conn)
+    _ensure_case_columns(conn)
+    _ensure_player_columns(conn)
+
+
+def _ensure_battle_columns(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(battles)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "position" not in columns:
+        cursor.execute(
+            "ALTER TABLE battles ADD COLUMN position TEXT NOT NULL DEFAULT 'medium'"
+        )
+    if "player_skill_id" not in columns:
+        cursor.execute(
+            "ALTER TABLE battles ADD COLUMN player_skill_id INTEGER"
+        )
+    if "enemy_skill_id" not in columns:
+        cursor.execute(
+            "ALTER TABLE battles ADD COLUMN enemy_skill_id INTEGER"
+        )
+    if "player_combo_json" not in columns:
+        cursor.execute(
+            "ALTER TABLE battles ADD COLUMN player_combo_json TEXT NOT NULL DEFAULT '{}'"
+        )
+    if "enemy_combo_json" not in columns:
+        cursor.execute(
+            "ALTER TABLE battles ADD COLUMN enemy_combo_json TEXT NOT NULL DEFAULT '{}'"
+        )
+
+
+def _ensure_skill_columns(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(skills)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    required = {
+        "type": "TEXT NOT NULL DEFAULT 'ATTACK'",
+        "range": "TEXT NOT NULL DEFAULT 'MID'",
+        "effect": "TEXT NOT NULL DEFAULT ''",
+        "rarity": "TEXT NOT NULL DEFAULT 'COMMON'",
+        "hidden": "INTEGER NOT NULL DEFAULT 0",
+        "description": "TEXT NOT NULL DEFAULT ''",
+        "effects_json": "TEXT NOT NULL DEFAULT '[]'",
+        "combo_tags_json": "TEXT NOT NULL DEFAULT '[]'",
+    }
+    for name, ddl in required.items():
+        if name not in columns:
+            cursor.execute(f"ALTER TABLE skills ADD COLUMN {name} {ddl}")
+
+
+def _ensure_player_skills_table(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS player_skills (
+            player_id INTEGER NOT NULL,
+            skill_id INTEGER NOT NULL,
+            is_unlocked INTEGER NOT NULL DEFAULT 1,
+            level INTEGER NOT NULL DEFAULT 1,
+            copies INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, skill_id)
+        )
+        """
+    )
+
+
+def _ensure_player_skills_columns(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(player_skills)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "level" not in columns:
+        cursor.execute("ALTER TABLE player_skills ADD COLUMN level INTEGER NOT NULL DEFAULT 1")
+    if "copies" not in columns:
+        cursor.execute("ALTER TABLE player_skills ADD COLUMN copies INTEGER NOT NULL DEFAULT 0")
+
+
+def _ensure_player_columns(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(players)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "title" not in columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN title TEXT")
+    if "wins_pve" not in columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN wins_pve INTEGER NOT NULL DEFAULT 0")
+    if "cases_opened" not in columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN cases_opened INTEGER NOT NULL DEFAULT 0")
+
+
+def _ensure_case_columns(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(cases)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "price" not in columns:
+        cursor.execute("ALTER TABLE cases ADD COLUMN price INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(2)
+def _hot_path_indexes(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_username ON players (username)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_players_level_xp ON players (level DESC, xp DESC)"
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_battle_effects_lookup
+        ON battle_effects (battle_id, target, effect_type)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_battle_messages_battle_chat
+        ON battle_messages (battle_id, chat_id)
+        """
+    )
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_monsters_rank ON monsters (rank)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cases_lower_name ON cases (lower(name))")
+
+
+@migration(3)
+def _unique_battle_effects(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    # Параллельные нажатия могли наплодить дубли эффекта — оставляем самую свежую строку.
+    cursor.execute(
+        """
+        DELETE FROM battle_effects
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM battle_effects
+            GROUP BY battle_id, target, effect_type
+        )
+        """
+    )
+    cursor.execute("DROP INDEX IF EXISTS idx_battle_effects_lookup")
+    cursor.execute(
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_battle_effects_key
+        ON battle_effects (battle_id, target, effect_type)
+        """
+    )
+
+
+@migration(4)
+def _achievement_rules(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(achievements)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "counter" not in columns:
+        cursor.execute("ALTER TABLE achievements ADD COLUMN counter TEXT")
+    if "threshold" not in columns:
+        cursor.execute("ALTER TABLE achievements ADD COLUMN threshold INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(5)
+def _battle_rng(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(battles)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "rng_seed" not in columns:
+        cursor.execute("ALTER TABLE battles ADD COLUMN rng_seed INTEGER NOT NULL DEFAULT 0")
+    if "rng_draws" not in columns:
+        cursor.execute("ALTER TABLE battles ADD COLUMN rng_draws INTEGER NOT NULL DEFAULT 0")
+    # Идущим боям выдаём свой сид, завершённые переигрывать уже нечего.
+    cursor.execute(
+        """
+        UPDATE battles
+        SET rng_seed = random() & 9223372036854775807
+        WHERE status = 'active' AND rng_seed = 0
+        """
+    )
+
+
+@migration(6)
+def _battle_events(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    # Ходы боя в структурном виде; действия и позиции — коды из combat.formulas.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS battle_events (
+            battle_id INTEGER NOT NULL,
+            turn INTEGER NOT NULL,
+            rng_draws INTEGER NOT NULL,
+            player_action INTEGER NOT NULL,
+            enemy_action INTEGER NOT NULL,
+            player_damage INTEGER NOT NULL,
+            player_hit INTEGER NOT NULL,
+            enemy_damage INTEGER NOT NULL,
+            enemy_hit INTEGER NOT NULL,
+            position_from INTEGER NOT NULL,
+            position_to INTEGER NOT NULL,
+            player_hp INTEGER NOT NULL,
+            player_stamina INTEGER NOT NULL,
+            enemy_hp INTEGER NOT NULL,
+            enemy_stamina INTEGER NOT NULL,
+            extra_json TEXT NOT NULL,
+            PRIMARY KEY (battle_id, turn)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+@migration(7)
+def _battle_version(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(battles)")
+    columns = {row["name"] for row in cursor.fetchall()}
+    if "version" not in columns:
+        cursor.execute("ALTER TABLE battles ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+
+@migration(8)
+def _drop_unused_indexes(conn: sqlite3.Connection) -> None:
+    cursor = conn.cursor()
+    # Топ считается по лидерборду в памяти, монстры и кейсы ищутся в каталоге:
+    # эти индексы больше ни один запрос не читает, а на запись они стоят.
+    cursor.execute("DROP INDEX IF EXISTS idx_players_level_xp")
+    cursor.execute("DROP INDEX IF EXISTS idx_cases_lower_name")
+    cursor.execute("DROP INDEX IF EXISTS idx_monsters_rank")
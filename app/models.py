@@ -1,5 +1,7 @@
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Mapping, Optional
+
+from app.combat.status import NO_EFFECTS, CompiledEffects
 
 
 @dataclass
@@ -18,9 +20,13 @@ class Player:
     luck: int
     current_battle_id: Optional[int]
     title: Optional[str] = None
+    wins_pve: int = 0
+    cases_opened: int = 0
+    # Открытые достижения; подгружаются при первой проверке и живут вместе с игроком в кэше.
+    achievement_ids: Optional[frozenset[int]] = field(default=None, compare=False, repr=False)
 
 
-@dataclass
+@dataclass(frozen=True)
 class Monster:
     id: int
     name: str
@@ -33,7 +39,7 @@ class Monster:
     reward_gold: int
 
 
-@dataclass
+@dataclass(frozen=True)
 class Skill:
     id: int
     name: str
@@ -49,9 +55,11 @@ class Skill:
     combo_tags_json: str
     level: int = 1
     copies: int = 0
+    effects: CompiledEffects = NO_EFFECTS
+    combo_tags: tuple[str, ...] = ()
 
 
-@dataclass
+@dataclass(frozen=True)
 class Case:
     id: int
     name: str
@@ -60,6 +68,21 @@ class Case:
     max_rolls: int
     weights_json: str
     allow_hidden: int
+    price: int = 0
+    weights: Mapping[str, float] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Achievement:
+    id: int
+    code: str
+    name: str
+    description: str
+    title: Optional[str]
+    case_reward: Optional[str]
+    case_qty: int
+    counter: Optional[str] = None
+    threshold: int = 0
 
 
 @dataclass
@@ -83,3 +106,51 @@ class Battle:
     enemy_skill_id: Optional[int]
     player_combo_json: str
     enemy_combo_json: str
+    # Сид ГСЧ боя и число сделанных бросков: по ним любой ход воспроизводится заново.
+    rng_seed: int = 0
+    rng_draws: int = 0
+    # Растёт на каждом коммите хода: по ней ловим параллельные записи одного боя.
+    version: int = 0
+
+
+@dataclass(frozen=True)
+class BattleEvent:
+    # Один разрешённый ход боя в структурном виде; текст рендерится только при отправке.
+    turn: int
+    rng_draws: int
+    player_action: str
+    enemy_action: str
+    player_damage: int
+    player_hit: int
+    enemy_damage: int
+    enemy_hit: int
+    position_from: str
+    position_to: str
+    player_hp: int
+    player_stamina: int
+    enemy_hp: int
+    enemy_stamina: int
+    # Эффекты как (тип, длительность, стаки), комбо как (активно, шагов, осталось).
+    player_effects: tuple[tuple[str, int, int], ...] = ()
+    enemy_effects: tuple[tuple[str, int, int], ...] = ()
+    player_combo: tuple[int, int, int] = (0, 0, 0)
+    enemy_combo: Optional[tuple[int, int, int]] = None
+
+
+@dataclass
+class CaseOpening:
+    case: Case
+    opened: int
+    rewards: list[Skill]
+    new_skill_ids: frozenset[int] = frozenset()
+    level_ups: dict[int, int] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class LeaderboardEntry:
+    player_id: int
+    telegram_id: int
+    username: str
+    rank: str
+    level: int
+    xp: int
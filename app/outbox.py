@@ -0,0 +1,344 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Hashable, Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import DeleteMessage, EditMessageReplyMarkup, EditMessageText, SendMessage
+from aiogram.methods.base import TelegramMethod
+
+
+PRIORITY_PROMPT, PRIORITY_CLEANUP = range(2)
+# Через очередь идут только сообщения в чат; остальное (getUpdates, answerCallbackQuery,
+# setWebhook) уходит напрямую.
+METHOD_PRIORITIES = {
+    SendMessage: PRIORITY_PROMPT,
+    EditMessageText: PRIORITY_PROMPT,
+    EditMessageReplyMarkup: PRIORITY_PROMPT,
+    DeleteMessage: PRIORITY_CLEANUP,
+}
+# Из нескольких ждущих правок одного сообщения отправляется только последняя.
+COALESCED_METHODS = (EditMessageText, EditMessageReplyMarkup)
+CHAT_BURST = 3
+GROUP_BURST = 3
+# Общий лимит без всплесков: запросы просто идут равномерно.
+GLOBAL_BURST = 1
+MAX_RETRIES = 5
+# Больше стольких чатов — забываем простаивающие с полным ведром.
+LANE_PRUNE_THRESHOLD = 10000
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        # До этого момента ведро закрыто после RetryAfter.
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_at(self, now: float) -> float:
+        self._refill(now)
+        at = now if self.tokens >= 1 else now + (1 - self.tokens) / self.rate
+        return max(at, self.blocked_until)
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and self.blocked_until <= now
+
+
+@dataclass(eq=False)
+class _Outgoing:
+    bot: Bot
+    method: TelegramMethod
+    make_request: NextRequestMiddlewareType
+    priority: int
+    seq: int
+    waiters: list[asyncio.Future] = field(default_factory=list)
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass(eq=False)
+class _Lane:
+    # Очередь одного чата: запросы в чат уходят по одному, по приоритету, затем по порядку.
+    chat_id: Hashable
+    bucket: TokenBucket
+    items: list[tuple[int, int, _Outgoing]] = field(default_factory=list)
+    busy: bool = False
+    # Записи планировщика со старым билетом устарели и пропускаются.
+    ticket: int = 0
+    scheduled_priority: Optional[int] = None
+
+
+def _coalesce_key(method: TelegramMethod) -> Optional[tuple]:
+    if isinstance(method, COALESCED_METHODS) and method.message_id is not None:
+        return (type(method), method.chat_id, method.message_id)
+    return None
+
+
+class Outbox(BaseRequestMiddleware):
+    # Исходящие запросы с учётом лимитов Telegram: общее ведро на бота и ведро на чат.
+    def __init__(self, global_rate: float = 30.0, chat_rate: float = 1.0, group_rate: float = 20 / 60) -> None:
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self._global = TokenBucket(global_rate, GLOBAL_BURST)
+        self._lanes: dict[Hashable, _Lane] = {}
+        self._edits: dict[tuple, _Outgoing] = {}
+        self._ready: list[tuple[int, int, int, _Lane]] = []
+        self._waiting: list[tuple[float, int, int, _Lane]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0
+        self._runner: Optional[asyncio.Task] = None
+        self._sending: set[asyncio.Task] = set()
+        self._posted: set[asyncio.Task] = set()
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ) -> Any:
+        priority = METHOD_PRIORITIES.get(type(method))
+        if priority is None:
+            return await make_request(bot, method)
+        return await self.submit(make_request, bot, method, priority)
+
+    def submit(
+        self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod, priority: int
+    ) -> asyncio.Future:
+        waiter = asyncio.get_running_loop().create_future()
+        key = _coalesce_key(method)
+        queued = self._edits.get(key) if key else None
+        if queued is not None:
+            # Старая правка ещё не ушла: отправим новую вместо неё, ответ получат оба.
+            queued.method = method
+            queued.make_request = make_request
+            queued.waiters.append(waiter)
+            self.coalesced += 1
+            return waiter
+        item = _Outgoing(bot, method, make_request, priority, next(self._seq), [waiter])
+        if key:
+            self._edits[key] = item
+        self._pending += 1
+        self._idle.clear()
+        self._enqueue(self._lane(method.chat_id), item)
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+        return waiter
+
+    def post(self, call: Awaitable[Any]) -> None:
+        # Запрос, ответ на который хендлеру не нужен (например, уборка старых сообщений).
+        task = asyncio.ensure_future(call)
+        self._posted.add(task)
+        task.add_done_callback(self._posted_done)
+
+    def _posted_done(self, task: asyncio.Task) -> None:
+        self._posted.discard(task)
+        if task.cancelled():
+            return
+        exc = task.exception()
+        if exc is not None and not isinstance(exc, TelegramBadRequest):
+            logging.warning("Background request failed: %s", exc)
+
+    def _lane(self, chat_id: Hashable) -> _Lane:
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            if len(self._lanes) >= LANE_PRUNE_THRESHOLD:
+                self._prune()
+            group = not isinstance(chat_id, int) or chat_id < 0
+            bucket = TokenBucket(self.group_rate, GROUP_BURST) if group else TokenBucket(self.chat_rate, CHAT_BURST)
+            lane = self._lanes[chat_id] = _Lane(chat_id, bucket)
+        return lane
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        for chat_id, lane in list(self._lanes.items()):
+            if not lane.items and not lane.busy and lane.bucket.idle(now):
+                del self._lanes[chat_id]
+
+    def _enqueue(self, lane: _Lane, item: _Outgoing) -> None:
+        heapq.heappush(lane.items, (item.priority, item.seq, item))
+        self._schedule(lane)
+
+    def _schedule(self, lane: _Lane) -> None:
+        if lane.busy or not lane.items:
+            return
+        priority = lane.items[0][0]
+        if lane.scheduled_priority is not None and lane.scheduled_priority <= priority:
+            return
+        # Чат ещё не запланирован или в нём появился запрос важнее: новая запись, старая устаревает.
+        lane.ticket += 1
+        lane.scheduled_priority = priority
+        now = time.monotonic()
+        at = lane.bucket.ready_at(now)
+        if at <= now:
+            heapq.heappush(self._ready, (priority, lane.items[0][1], lane.ticket, lane))
+        else:
+            heapq.heappush(self._waiting, (at, lane.items[0][1], lane.ticket, lane))
+        self._wakeup.set()
+
+    def _pop_ready(self) -> Optional[_Lane]:
+        now = time.monotonic()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, seq, ticket, lane = heapq.heappop(self._waiting)
+            if ticket == lane.ticket:
+                # Ведро могли снова закрыть по RetryAfter, пока чат ждал.
+                at = lane.bucket.ready_at(now)
+                if at > now:
+                    heapq.heappush(self._waiting, (at, seq, ticket, lane))
+                    continue
+                heapq.heappush(self._ready, (lane.scheduled_priority, seq, ticket, lane))
+        while self._ready:
+            _, _, ticket, lane = heapq.heappop(self._ready)
+            if ticket == lane.ticket:
+                return lane
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            delay = self._global.ready_at(now) - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            lane = self._pop_ready()
+            if lane is None:
+                self._wakeup.clear()
+                timeout = self._waiting[0][0] - time.monotonic() if self._waiting else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, item = heapq.heappop(lane.items)
+            lane.busy = True
+            lane.ticket += 1
+            lane.scheduled_priority = None
+            key = _coalesce_key(item.method)
+            if key and self._edits.get(key) is item:
+                del self._edits[key]
+            now = time.monotonic()
+            lane.bucket.take(now)
+            self._global.take(now)
+            task = asyncio.create_task(self._send(lane, item))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, lane: _Lane, item: _Outgoing) -> None:
+        try:
+            result = await item.make_request(item.bot, item.method)
+        except TelegramRetryAfter as exc:
+            self.retried += 1
+            lane.bucket.block(time.monotonic() + exc.retry_after)
+            item.attempts += 1
+            if item.attempts > MAX_RETRIES:
+                self._finish(item, exc=exc)
+            else:
+                self._requeue(lane, item)
+        except Exception as exc:
+            self._finish(item, exc=exc)
+        else:
+            self._finish(item, result=result)
+        finally:
+            lane.busy = False
+            self._schedule(lane)
+
+    def _requeue(self, lane: _Lane, item: _Outgoing) -> None:
+        key = _coalesce_key(item.method)
+        newer = self._edits.get(key) if key else None
+        if newer is not None:
+            # Пока ждали RetryAfter, пришла правка новее: наша устарела.
+            newer.waiters.extend(item.waiters)
+            self.coalesced += 1
+            self._done(item)
+            return
+        if key:
+            self._edits[key] = item
+        heapq.heappush(lane.items, (item.priority, item.seq, item))
+
+    def _finish(self, item: _Outgoing, result: Any = None, exc: Optional[BaseException] = None) -> None:
+        if exc is None:
+            self.sent += 1
+        else:
+            self.failed += 1
+        waited = time.monotonic() - item.queued_at
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        for waiter in item.waiters:
+            if waiter.done():
+                continue
+            if exc is None:
+                waiter.set_result(result)
+            else:
+                waiter.set_exception(exc)
+        self._done(item)
+
+    def _done(self, item: _Outgoing) -> None:
+        self._pending -= 1
+        if not self._pending:
+            self._idle.set()
+
+    async def close(self, timeout: float = 10.0) -> None:
+        # Досылаем очередь при остановке; что не успело за timeout — теряется.
+        if self._posted:
+            await asyncio.wait(set(self._posted), timeout=timeout)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Outbox closed with %s requests still queued", self._pending)
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def stats(self) -> dict[str, float]:
+        finished = self.sent + self.failed
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+            "queued": self._pending,
+            "chats": len(self._lanes),
+            "wait_avg": self.wait_total / finished if finished else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+
+_outbox = Outbox()
+
+
+def init_outbox(global_rate: float, chat_rate: float, group_rate: float) -> Outbox:
+    global _outbox
+    _outbox = Outbox(global_rate, chat_rate, group_rate)
+    return _outbox
+
+
+def get_outbox() -> Outbox:
+    return _outbox
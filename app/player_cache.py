@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Iterable, Optional
+
+from app.models import Player
+
+
+class PlayerCache:
+    def __init__(self, max_size: int = 10000) -> None:
+        self.max_size = max(1, max_size)
+        self._by_id: OrderedDict[int, tuple[Player, int]] = OrderedDict()
+        self._id_by_telegram: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, player_id: Optional[int]) -> Optional[tuple[Player, int]]:
+        entry = self._by_id.get(player_id) if player_id is not None else None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._by_id.move_to_end(player_id)
+        self.hits += 1
+        return entry
+
+    def get_by_id(self, player_id: int) -> Optional[tuple[Player, int]]:
+        with self._lock:
+            entry = self._get(player_id)
+        return (replace(entry[0]), entry[1]) if entry else None
+
+    def get_by_telegram(self, telegram_id: int) -> Optional[tuple[Player, int]]:
+        with self._lock:
+            entry = self._get(self._id_by_telegram.get(telegram_id))
+        return (replace(entry[0]), entry[1]) if entry else None
+
+    def _store(self, player: Player) -> None:
+        self._clock += 1
+        self._by_id[player.id] = (replace(player), self._clock)
+        self._by_id.move_to_end(player.id)
+        self._id_by_telegram[player.telegram_id] = player.id
+        while len(self._by_id) > self.max_size:
+            _, (evicted, _) = self._by_id.popitem(last=False)
+            self._id_by_telegram.pop(evicted.telegram_id, None)
+            self.evictions += 1
+
+    def fill(self, player: Player) -> Optional[int]:
+        # Прочитанная из БД строка могла устареть, пока мы её читали: не затираем свежую запись.
+        with self._lock:
+            if player.id in self._by_id:
+                return None
+            self._store(player)
+            return self._clock
+
+    def publish(self, staged: Iterable[tuple[Player, Optional[int]]]) -> list[Player]:
+        # Вызывается после коммита. Если запись успели поменять из другой транзакции,
+        # наша копия могла разойтись с БД, поэтому просто выбрасываем её.
+        # Возвращает принятые копии.
+        accepted = []
+        with self._lock:
+            for player, version in staged:
+                current = self._by_id.get(player.id)
+                if current is not None and current[1] != version:
+                    self._drop(player.id)
+                    continue
+                self._store(player)
+                accepted.append(player)
+        return accepted
+
+    def _drop(self, player_id: int) -> None:
+        entry = self._by_id.pop(player_id, None)
+        if entry is not None:
+            self._id_by_telegram.pop(entry[0].telegram_id, None)
+
+    def invalidate(self, player_id: int) -> None:
+        with self._lock:
+            self._drop(player_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._id_by_telegram.clear()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._by_id),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
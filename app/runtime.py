@@ -0,0 +1,77 @@
+import asyncio
+import contextlib
+import logging
+from typing import AsyncIterator
+
+from aiogram import Bot, Dispatcher
+
+from app.config import Config
+from app.db import (
+    battle_store_stats,
+    close_pool,
+    init_battle_store,
+    init_db,
+    init_player_cache,
+    init_pool,
+    player_cache_stats,
+)
+from app.db_async import battle_flusher, flush_battles, init_executor, shutdown_executor
+from app.handlers import get_routers
+from app.middlewares import ConcurrencyLimitMiddleware, PlayerContextMiddleware, UserSerializationMiddleware
+from app.outbox import get_outbox, init_outbox
+from app import state
+
+
+def create_bot(config: Config, processes: int = 1) -> Bot:
+    # Общий лимит Telegram делится между процессами, которые шлют от имени бота.
+    # Личный чат — это один игрок, а игрок живёт на одном шарде; в группу же пишут игроки
+    # с разных шардов, поэтому её лимит тоже делится (запас на то, что группа — на всех шардах).
+    bot = Bot(token=config.bot_token)
+    bot.session.middleware(
+        init_outbox(
+            config.outbox_global_rate / processes,
+            config.outbox_chat_rate,
+            config.outbox_group_rate / processes,
+        )
+    )
+    return bot
+
+
+def build_dispatcher(config: Config) -> tuple[Dispatcher, UserSerializationMiddleware]:
+    dp = Dispatcher()
+    # Лимит первым: слот занимает и апдейт, который ждёт очереди своего пользователя.
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(config.max_concurrent_updates))
+    serialization = UserSerializationMiddleware(config.update_dedupe_size, config.update_dedupe_ttl)
+    dp.update.outer_middleware(serialization)
+    player_context = PlayerContextMiddleware(config.db_path)
+    dp.message.middleware(player_context)
+    dp.callback_query.middleware(player_context)
+    for router in get_routers():
+        dp.include_router(router)
+    return dp, serialization
+
+
+@contextlib.asynccontextmanager
+async def game_runtime(config: Config) -> AsyncIterator[None]:
+    # БД, кэши и фоновый сброс боёв одного процесса, который обрабатывает апдейты.
+    init_pool(config)
+    init_player_cache(config.player_cache_size)
+    init_battle_store(config.battle_idle_ttl)
+    init_db(config.db_path)
+    init_executor(config.db_workers)
+    state.db_path = config.db_path
+    flusher = asyncio.create_task(battle_flusher(config.db_path, config.battle_flush_interval))
+    try:
+        yield
+    finally:
+        outbox = get_outbox()
+        await outbox.close()
+        flusher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await flusher
+        await flush_battles(config.db_path)
+        shutdown_executor()
+        close_pool()
+        logging.info("Player cache: %s", player_cache_stats())
+        logging.info("Battle store: %s", battle_store_stats())
+        logging.info("Outbox: %s", outbox.stats())
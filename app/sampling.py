@@ -0,0 +1,102 @@
+import random
+from dataclasses import dataclass
+from typing import Generic, Mapping, Optional, TypeVar
+
+from app.models import Skill
+
+
+K = TypeVar("K")
+
+
+class AliasTable(Generic[K]):
+    # Метод Уолкера (вариант Возе): O(n) на построение, O(1) на выбор.
+    __slots__ = ("keys", "_prob", "_alias")
+
+    def __init__(self, weights: Mapping[K, float]) -> None:
+        self.keys = tuple(weights)
+        n = len(self.keys)
+        total = float(sum(weights.values()))
+        if n == 0 or total <= 0:
+            raise ValueError("AliasTable needs at least one positive weight")
+        scaled = [weights[key] * n / total for key in self.keys]
+        self._prob = [1.0] * n
+        self._alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._prob[less] = scaled[less]
+            self._alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rng: Optional[random.Random] = None) -> K:
+        roll = (rng or random).random() * len(self.keys)
+        idx = int(roll)
+        if roll - idx < self._prob[idx]:
+            return self.keys[idx]
+        return self.keys[self._alias[idx]]
+
+
+def skill_mask(skill_ids) -> int:
+    # Множество навыков как битовая маска по id: компактно и пересекается одной операцией.
+    mask = 0
+    for skill_id in skill_ids:
+        mask |= 1 << skill_id
+    return mask
+
+
+@dataclass(frozen=True)
+class CasePool:
+    case_id: int
+    allow_hidden: bool
+    weights: Mapping[str, float]
+    skills: Mapping[str, tuple[Skill, ...]]
+    masks: Mapping[str, int]
+    alias: Optional[AliasTable[str]]
+
+    @classmethod
+    def build(
+        cls,
+        case_id: int,
+        allow_hidden: bool,
+        weights: Mapping[str, float],
+        skills_by_rarity: Mapping[str, tuple[Skill, ...]],
+    ) -> "CasePool":
+        skills: dict[str, tuple[Skill, ...]] = {}
+        for rarity, weight in weights.items():
+            pool = tuple(
+                skill
+                for skill in skills_by_rarity.get(rarity, ())
+                if allow_hidden or not skill.hidden
+            )
+            if pool and weight > 0:
+                skills[rarity] = pool
+        usable = {rarity: float(weights[rarity]) for rarity in skills}
+        return cls(
+            case_id=case_id,
+            allow_hidden=allow_hidden,
+            weights=usable,
+            skills=skills,
+            masks={rarity: skill_mask(s.id for s in pool) for rarity, pool in skills.items()},
+            alias=AliasTable(usable) if usable else None,
+        )
+
+    def draw(self, owned: int, rng: Optional[random.Random] = None) -> Optional[Skill]:
+        rng = rng or random
+        available = [rarity for rarity, mask in self.masks.items() if mask & ~owned]
+        if not available:
+            return None
+        if len(available) == len(self.masks):
+            rarity = self.alias.sample(rng)
+        else:
+            # Редкость закончилась целиком — выбираем среди оставшихся с теми же весами.
+            rarity = AliasTable({key: self.weights[key] for key in available}).sample(rng)
+        pool = self.skills[rarity]
+        if not self.masks[rarity] & owned:
+            return rng.choice(pool)
+        for _ in range(8):
+            skill = rng.choice(pool)
+            if not owned >> skill.id & 1:
+                return skill
+        return rng.choice([skill for skill in pool if not owned >> skill.id & 1])
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import signal
+from dataclasses import asdict, replace
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from app.config import Config, load_config
+from app.db import (
+    apply_remote_players,
+    get_connection,
+    get_player_by_username,
+    init_db,
+    list_pvp_routes,
+    set_commit_listener,
+)
+from app.db_async import run
+from app.handlers import get_routers
+from app.handlers.duel import parse_duel_target
+from app.middlewares import ConcurrencyLimitMiddleware, UserSerializationMiddleware
+from app.models import Player
+from app.runtime import build_dispatcher, create_bot, game_runtime
+from app.webhook import run_webhook
+
+
+# Одна строка IPC — одно сообщение, апдейт целиком.
+IPC_LINE_LIMIT = 4 * 1024 * 1024
+SHARD_START_TIMEOUT = 60.0
+SHARD_STOP_TIMEOUT = 30.0
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    # Jump consistent hash: при изменении числа шардов переезжает лишь доля пользователей.
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _player_payload(player: Player) -> dict:
+    return asdict(replace(player, achievement_ids=None))
+
+
+class ShardFront:
+    # Фронт держит сокет к каждому шарду и решает, куда отправить апдейт.
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.shards = config.shards
+        # Соперник в дуэли обслуживается шардом зачинщика, пока бой не закончится:
+        # оба игрока боя всегда в одном процессе.
+        self.pins: dict[int, int] = {}
+        # Соперники, закреплённые по вызову на дуэль, пока коммит боя это не подтвердил:
+        # telegram_id -> update_id вызова.
+        self._tentative: dict[int, int] = {}
+        # Апдейты, отданные шардам и ещё не обработанные: update_id -> (шард, ожидание).
+        self._in_flight: dict[int, tuple[int, asyncio.Future]] = {}
+        self.forwarded = [0] * self.shards
+        self._writers: dict[int, asyncio.StreamWriter] = {}
+        self._processes: list[multiprocessing.Process] = []
+        self._connected = asyncio.Event()
+        self._server: asyncio.AbstractServer | None = None
+        self._stopping = False
+
+    def home(self, telegram_id: int) -> int:
+        return jump_hash(telegram_id, self.shards)
+
+    def shard_for(self, telegram_id: int) -> int:
+        shard = self.pins.get(telegram_id)
+        return self.home(telegram_id) if shard is None else shard
+
+    def load_pins(self, routes: Iterable[tuple[int, int]]) -> None:
+        for enemy, owner in routes:
+            shard = self.home(owner)
+            if shard != self.home(enemy):
+                self.pins[enemy] = shard
+
+    async def start(self) -> None:
+        path = self.config.shard_socket
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._accept, path=path, limit=IPC_LINE_LIMIT)
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.shards):
+            process = context.Process(target=worker_main, args=(index,), name=f"shard-{index}")
+            process.start()
+            self._processes.append(process)
+        await asyncio.wait_for(self._connected.wait(), SHARD_START_TIMEOUT)
+        logging.info("Started %s shards, %s pinned duel players", self.shards, len(self.pins))
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        index = json.loads(await reader.readline())["shard"]
+        self._writers[index] = writer
+        if len(self._writers) == self.shards:
+            self._connected.set()
+        while line := await reader.readline():
+            message = json.loads(line)
+            if "committed" in message:
+                self._committed(index, message["committed"])
+            elif "done" in message:
+                self._done(message["done"])
+        self._writers.pop(index, None)
+        writer.close()
+        for update_id, (shard, _) in list(self._in_flight.items()):
+            if shard == index:
+                self._done(update_id)
+        if not self._stopping:
+            # Без шарда часть пользователей осталась бы без ответа: останавливаемся целиком.
+            logging.error("Shard %s disconnected, stopping", index)
+            signal.raise_signal(signal.SIGTERM)
+
+    def _committed(self, origin: int, players: list[dict]) -> None:
+        for player in players:
+            telegram_id = player["telegram_id"]
+            if self.home(telegram_id) == origin:
+                continue
+            if player["current_battle_id"] is not None:
+                self.pins[telegram_id] = origin
+                self._tentative.pop(telegram_id, None)
+            elif self.pins.get(telegram_id) == origin:
+                del self.pins[telegram_id]
+                self._tentative.pop(telegram_id, None)
+        if self._stopping:
+            return
+        # Остальные шарды сбрасывают свою копию игрока и обновляют лидерборд; сообщение уходит
+        # раньше следующих апдейтов этого игрока, поэтому его новый шард видит свежую строку.
+        line = _encode({"players": players})
+        for index, writer in self._writers.items():
+            if index != origin:
+                writer.write(line)
+
+    def _done(self, update_id: int) -> None:
+        _, waiter = self._in_flight.pop(update_id, (None, None))
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+        for telegram_id, challenge in list(self._tentative.items()):
+            if challenge == update_id:
+                # Вызов обработан, а боя соперника коммит так и не принёс: дуэль не состоялась.
+                del self._tentative[telegram_id]
+                self.pins.pop(telegram_id, None)
+
+    def _lookup_telegram_id(self, username: str) -> Optional[int]:
+        conn = get_connection(self.config.db_path)
+        try:
+            player = get_player_by_username(conn, username)
+        finally:
+            conn.close()
+        return player.telegram_id if player else None
+
+    async def _pin_duel_target(self, telegram_id: int, shard: int, update: Update) -> None:
+        # Соперника закрепляем за шардом зачинщика ещё до того, как вызов уйдёт шарду:
+        # иначе его апдейт, пришедший раньше эха коммита, попал бы в другой процесс.
+        username = parse_duel_target(update.message.text if update.message else None)
+        if not username:
+            return
+        target = await run(self._lookup_telegram_id, username)
+        if target is None or target == telegram_id or target in self.pins or self.home(target) == shard:
+            return
+        self.pins[target] = shard
+        self._tentative[target] = update.update_id
+
+    async def forward(self, telegram_id: int, update: Update) -> None:
+        # Возвращается, когда шард закончил апдейт: лимит и очередь пользователя на фронте
+        # держатся всё время обработки, а не только пока апдейт пишется в сокет.
+        shard = self.shard_for(telegram_id)
+        writer = self._writers.get(shard)
+        if writer is None:
+            logging.warning("Shard %s is not connected, dropping update %s", shard, update.update_id)
+            return
+        await self._pin_duel_target(telegram_id, shard, update)
+        waiter = asyncio.get_running_loop().create_future()
+        self._in_flight[update.update_id] = (shard, waiter)
+        writer.write(_encode({"update": update.model_dump(mode="json", by_alias=True, exclude_none=True)}))
+        self.forwarded[shard] += 1
+        try:
+            await writer.drain()
+            await waiter
+        finally:
+            self._in_flight.pop(update.update_id, None)
+
+    async def stop(self) -> None:
+        # Шард дорабатывает полученные апдейты, сбрасывает бои и закрывает соединение сам.
+        self._stopping = True
+        for writer in self._writers.values():
+            writer.write_eof()
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, SHARD_STOP_TIMEOUT)
+            if process.is_alive():
+                logging.warning("Shard %s did not stop in time, terminating", process.name)
+                process.terminate()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if os.path.exists(self.config.shard_socket):
+            os.unlink(self.config.shard_socket)
+
+    def stats(self) -> dict[str, Any]:
+        return {"forwarded": list(self.forwarded), "pinned": len(self.pins), "in_flight": len(self._in_flight)}
+
+
+class ShardForwardMiddleware(BaseMiddleware):
+    # Внешний middleware фронта: апдейт уходит шарду и до хендлеров фронта не доходит.
+    def __init__(self, front: ShardFront) -> None:
+        self.front = front
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        chat = data.get("event_chat")
+        await self.front.forward(user.id if user else chat.id if chat else 0, event)
+        return None
+
+
+async def run_front(config: Config) -> None:
+    # Миграции и сид каталога — один раз до запуска шардов.
+    init_db(config.db_path)
+    conn = get_connection(config.db_path)
+    try:
+        routes = list_pvp_routes(conn)
+    finally:
+        conn.close()
+
+    front = ShardFront(config)
+    front.load_pins(routes)
+    bot = Bot(token=config.bot_token)
+    dp = Dispatcher()
+    # Апдейт занимает слот, пока его не обработает шард: очередь к шардам ограничена.
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(config.max_concurrent_updates * config.shards))
+    serialization = UserSerializationMiddleware(config.update_dedupe_size, config.update_dedupe_ttl)
+    dp.update.outer_middleware(serialization)
+    dp.update.outer_middleware(ShardForwardMiddleware(front))
+    # Роутеры фронту нужны только для allowed_updates.
+    for router in get_routers():
+        dp.include_router(router)
+
+    await front.start()
+    try:
+        if config.run_mode == "webhook":
+            await run_webhook(bot, dp, config)
+        else:
+            await dp.start_polling(bot, tasks_concurrency_limit=config.max_concurrent_updates)
+    finally:
+        await front.stop()
+        logging.info("Updates: %s", serialization.stats())
+        logging.info("Shards: %s", front.stats())
+
+
+async def _feed(dp: Dispatcher, bot: Bot, update: Update, writer: asyncio.StreamWriter) -> None:
+    try:
+        await dp.feed_update(bot, update)
+    except Exception:
+        logging.exception("Update %s failed", update.update_id)
+    finally:
+        writer.write(_encode({"done": update.update_id}))
+
+
+async def run_worker(index: int, config: Config) -> None:
+    bot = create_bot(config, config.shards)
+    dp, serialization = build_dispatcher(config)
+    reader, writer = await asyncio.open_unix_connection(config.shard_socket, limit=IPC_LINE_LIMIT)
+    loop = asyncio.get_running_loop()
+
+    def committed(players: list[Player]) -> None:
+        # Вызывается из потока БД сразу после коммита.
+        line = _encode({"committed": [_player_payload(player) for player in players]})
+        loop.call_soon_threadsafe(writer.write, line)
+
+    tasks: set[asyncio.Task] = set()
+    try:
+        async with game_runtime(config):
+            set_commit_listener(committed)
+            writer.write(_encode({"shard": index}))
+            while line := await reader.readline():
+                message = json.loads(line)
+                if "update" in message:
+                    update = Update.model_validate(message["update"], context={"bot": bot})
+                    task = asyncio.create_task(_feed(dp, bot, update, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                elif "players" in message:
+                    apply_remote_players(Player(**player) for player in message["players"])
+            if tasks:
+                await asyncio.gather(*tasks)
+            set_commit_listener(None)
+    finally:
+        writer.close()
+        await bot.session.close()
+        logging.info("Updates: %s", serialization.stats())
+
+
+def worker_main(index: int) -> None:
+    # Ctrl+C и SIGTERM получает вся группа процессов; шард останавливает фронт, закрывая сокет.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format=f"[shard {index}] %(levelname)s:%(name)s:%(message)s")
+    asyncio.run(run_worker(index, load_config()))
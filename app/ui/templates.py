@@ -90,20 +90,6 @@ def skill_info_text(
     )
 
 
-def trim_battle_log(log_text: str, keep_rounds: int = 2) -> str:
-    if not log_text.strip():
-        return log_text
-    marker = "🌀 Раунд"
-    if marker not in log_text:
-        return log_text
-    chunks = log_text.split(marker)
-    rounds = []
-    for chunk in chunks[1:]:
-        rounds.append(f"{marker}{chunk}".strip())
-    trimmed = rounds[-keep_rounds:]
-    return "\n\n".join(trimmed)
-
-
 def case_list_header() -> str:
     return "🎁 Твои кейсы"
 
@@ -121,6 +107,23 @@ def case_open_result(name: str, skills: list[str]) -> str:
     return "\n".join(lines)
 
 
+def case_open_summary(
+    name: str,
+    opened: int,
+    drops: list[tuple[str, int, bool, int]],
+) -> str:
+    # drops: (навык, сколько выпало, новый ли, сколько уровней получил)
+    if not drops:
+        return f"🫥 Открыто {name}: {opened} шт. — навыков не выпало."
+    lines = [f"🎉 Открыто {name}: {opened} шт.", "Ты получил:"]
+    for skill, times, is_new, levels in drops:
+        suffix = " 🆕" if is_new else ""
+        if levels:
+            suffix += f" ⬆️ +{levels} ур."
+        lines.append(f"• {skill} ×{times}{suffix}")
+    return "\n".join(lines)
+
+
 def shop_header(gold: int) -> str:
     return f"🛒 Магазин кейсов | 💰 Золото: {gold}"
 
@@ -144,3 +147,7 @@ def top_header() -> str:
 def top_entry(index: int, username: str, rank: str, level: int, xp: int) -> str:
     medal = {1: "🥇", 2: "🥈", 3: "🥉"}.get(index, "🔸")
     return f"{medal} {index}. {username} | Ранг {rank} | Ур. {level} | XP {xp}"
+
+
+def top_position(position: int, total: int) -> str:
+    return f"📍 Твоё место: {position} из {total}"
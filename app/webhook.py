@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import Config
+
+
+# Сколько при остановке ждём апдейты, уже принятые в обработку.
+SHUTDOWN_TIMEOUT = 30.0
+
+
+class WebhookRequestHandler(SimpleRequestHandler):
+    async def drain(self, timeout: float) -> None:
+        # aiogram отвечает Telegram сразу и обрабатывает апдейт в фоновой задаче,
+        # а при остановке приложения эти задачи не ждёт.
+        tasks = set(self._background_feed_update_tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        if pending:
+            logging.warning("Webhook stopped with %s updates still in progress", len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+WEBHOOK_HANDLER = web.AppKey("webhook_handler", WebhookRequestHandler)
+
+
+async def _health(request: web.Request) -> web.Response:
+    return web.Response(text="ok")
+
+
+def build_webhook_app(bot: Bot, dp: Dispatcher, config: Config) -> web.Application:
+    app = web.Application()
+    # Апдейт без верного X-Telegram-Bot-Api-Secret-Token получает 401 и до диспетчера не доходит.
+    handler = WebhookRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=config.webhook_secret,
+    )
+    handler.register(app, path=config.webhook_path)
+    app[WEBHOOK_HANDLER] = handler
+    # Проверка живости для балансировщика.
+    app.router.add_get("/healthz", _health)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher, config: Config) -> None:
+    # Telegram получает ответ сразу, апдейт обрабатывается в фоне; сколько апдейтов
+    # в работе одновременно, ограничивает middleware диспетчера.
+    app = build_webhook_app(bot, dp, config)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.webhook_host, config.webhook_port)
+    await site.start()
+    logging.info(
+        "Webhook server listening on %s:%s%s",
+        config.webhook_host,
+        config.webhook_port,
+        config.webhook_path,
+    )
+    if config.webhook_url:
+        await bot.set_webhook(
+            url=config.webhook_url.rstrip("/") + config.webhook_path,
+            secret_token=config.webhook_secret,
+            allowed_updates=dp.resolve_used_update_types(),
+        )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        # После cleanup новых апдейтов уже не будет; дорабатываем принятые, пока БД и outbox
+        # ещё открыты: их закрывает game_runtime сразу после возврата.
+        await runner.cleanup()
+        await app[WEBHOOK_HANDLER].drain(SHUTDOWN_TIMEOUT)
@@ -0,0 +1,109 @@
+import argparse
+import random
+import sys
+import timeit
+from typing import Optional, Sequence
+
+from app.combat.status import Modifiers, compile_effects, parse_effects_json, turn_modifiers
+from app.game_data import SKILL_EFFECT_SEED
+from scripts.legacy import status as old_status
+
+
+EFFECT_TYPES = [
+    "def_up", "def_down", "dodge_up", "dodge_down", "crit_up", "crit_down",
+    "damage_up", "stun", "bleed", "burn", "poison",
+]
+INSTANT_TYPES = ("stamina_restore", "move", "ignore_def", "damage_up")
+
+
+def random_stack(rng: random.Random, size: int) -> list[dict]:
+    return [
+        {
+            "battle_id": 1,
+            "target": "player",
+            "effect_type": rng.choice(EFFECT_TYPES),
+            "value": rng.choice([5, 10, 2.5]),
+            "duration": 2,
+            "stacks": rng.randint(1, 3),
+            "max_stacks": 3,
+        }
+        for _ in range(size)
+    ]
+
+
+def old_turn(stack: list[dict]) -> tuple[dict, int, int]:
+    # Так обработчик боя собирал модификаторы до реестра: перепаковка словарей и два прохода.
+    parsed = [
+        {"effect_type": e["effect_type"], "value": e["value"], "duration": e["duration"], "stacks": e["stacks"]}
+        for e in stack
+    ]
+    mods = old_status.effects_to_modifiers(parsed)
+    hp, dot = old_status.apply_dot_effects(stack, 100)
+    return mods, hp, dot
+
+
+def old_cast(effects: list[dict], target: str) -> tuple[dict, list[tuple]]:
+    # Разбор эффектов навыка при каждом применении, как в старом обработчике боя.
+    instant = dict.fromkeys(INSTANT_TYPES, 0)
+    lasting = []
+    for eff in effects:
+        etype = eff.get("type")
+        value = eff.get("value", 0)
+        if etype in instant:
+            instant[etype] += value
+            continue
+        lasting.append((eff.get("target", target), etype, value, eff.get("duration", 1), eff.get("max_stacks", 1)))
+    return instant, lasting
+
+
+def check_equivalence(rng: random.Random, stacks: int) -> None:
+    for _ in range(stacks):
+        stack = random_stack(rng, rng.randint(0, 14))
+        mods, hp, dot = old_turn(stack)
+        new = turn_modifiers(stack)
+        assert (mods["def_pct"], mods["dodge_pct"], mods["crit_pct"], mods["damage_pct"], mods["stunned"]) == (
+            new.def_pct, new.dodge_pct, new.crit_pct, new.damage_pct, new.stunned
+        ), (stack, mods, new)
+        assert dot == new.dot and hp == max(0, 100 - new.dot), stack
+    for name, (effects_json, _) in SKILL_EFFECT_SEED.items():
+        raw = parse_effects_json(effects_json)
+        instant, lasting = old_cast(raw, "enemy")
+        mods = Modifiers()
+        assert compile_effects(raw).cast(mods, "enemy") == lasting, name
+        assert (
+            instant["stamina_restore"], instant["move"], instant["ignore_def"], instant["damage_up"]
+        ) == (mods.stamina_restore, mods.move, mods.ignore_def_pct, mods.damage_pct), name
+
+
+def _best(call, number: int, repeat: int) -> float:
+    return min(timeit.repeat(call, number=number, repeat=repeat)) / number * 1e6
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Старый и новый расчёт эффектов, мкс на ход")
+    parser.add_argument("--effects", type=int, default=12, help="эффектов на бойце за ход")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", type=int, default=20_000, help="случайных наборов для сверки")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(1)
+    check_equivalence(rng, args.check)
+    print(f"equivalent on {args.check} stacks and {len(SKILL_EFFECT_SEED)} skills")
+
+    stack = random_stack(rng, args.effects)
+    print(
+        f"{args.effects} effects/turn: old {_best(lambda: old_turn(stack), args.calls, args.repeat):.2f} us, "
+        f"new {_best(lambda: turn_modifiers(stack), args.calls, args.repeat):.2f} us"
+    )
+    raw = parse_effects_json(SKILL_EFFECT_SEED["Twin Slash"][0]) * 6
+    compiled = compile_effects(raw)
+    print(
+        f"skill cast ({len(raw)} effects): old {_best(lambda: old_cast(raw, 'enemy'), args.calls, args.repeat):.2f} us, "
+        f"new {_best(lambda: compiled.cast(Modifiers(), 'enemy'), args.calls, args.repeat):.2f} us"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import argparse
+from contextlib import contextmanager
+import random
+import sys
+import timeit
+from typing import Iterator, Optional, Sequence
+
+from app.combat import engine
+from app.combat.ai import behavior_code, monster_action_code
+from app.combat.formulas import ACTION_CODES, ACTIONS, POSITION_CODES, POSITIONS
+from app.combat.rng import BattleRng
+from app.combat.status import Modifiers
+from scripts.legacy import ai as old_ai, engine as old_engine, formulas as old_formulas
+
+
+BEHAVIORS = ["aggressive", "defensive", "trickster", "berserk", "stamina_drain", "neutral"]
+BONUS_KEYS = ("ignore_def_pct", "damage_pct", "crit_pct", "dodge_pct")
+
+
+def _fighters(module):
+    # Здоровья хватает на любое число ходов, бой не кончается посреди замера.
+    player = module.FighterState("P", 10**9, 100, 30, 10, 8, 10**9)
+    monster = module.FighterState("M", 10**9, 100, 25, 12, 4, 10**9)
+    return player, monster
+
+
+def old_full_turn():
+    player, monster = _fighters(old_engine)
+
+    def turn() -> None:
+        old_engine.process_pve_turn(
+            "ATTACK", player, monster, "aggressive", 1, "medium", {}, {}, "", "", "", None, None, 1.0, 1.0
+        )
+
+    return turn
+
+
+def new_full_turn():
+    player, monster = _fighters(engine)
+    rng = random.Random(1)
+
+    def turn() -> None:
+        engine.process_pve_turn(
+            "ATTACK", player, monster, "aggressive", "medium", Modifiers(), Modifiers(), None, None, 1.0, 1.0, rng
+        )
+
+    return turn
+
+
+def old_kernel():
+    # Старый ход без сборки лога: только выбор действия, урон и сдвиг позиции.
+    player, monster = _fighters(old_engine)
+
+    def turn() -> None:
+        action = old_engine.choose_monster_action("aggressive", monster.hp, monster.max_hp, monster.stamina)
+        player.stamina = old_engine.apply_stamina("ATTACK", player.stamina, None)
+        monster.stamina = old_engine.apply_stamina(action, monster.stamina, None)
+        hit = old_formulas.compute_damage(
+            player.atk, monster.defense, "ATTACK", action, player.luck, player.stamina, monster.luck, "medium"
+        )
+        back = old_formulas.compute_damage(
+            monster.atk, player.defense, action, "ATTACK", monster.luck, monster.stamina, player.luck, "medium"
+        )
+        monster.hp -= hit.damage
+        player.hp -= back.damage
+        old_engine._shift_position("medium", "ATTACK", action)
+
+    return turn
+
+
+def new_kernel():
+    player, monster = _fighters(engine)
+    behavior = behavior_code("aggressive")
+    rng = random.Random(1)
+
+    def turn() -> None:
+        action = monster_action_code(behavior, monster.hp, monster.max_hp, monster.stamina, rng)
+        engine.resolve_turn(player, monster, 0, action, 1, rng)
+
+    return turn
+
+
+@contextmanager
+def legacy_rng(rng: random.Random) -> Iterator[None]:
+    # Старое ядро бросает кости через модуль random; подменяем его ГСЧ боя, чтобы считать броски.
+    modules = (old_formulas, old_ai, old_engine)
+    for module in modules:
+        module.random = rng
+    try:
+        yield
+    finally:
+        for module in modules:
+            module.random = random
+
+
+def _bonus(gen: random.Random) -> dict:
+    if gen.random() < 0.4:
+        return {}
+    return {key: gen.choice([5.0, 10.0, 25.0, 50.0]) for key in BONUS_KEYS if gen.random() < 0.5}
+
+
+def _skill(gen: random.Random, action: str) -> tuple[Optional[int], float]:
+    if action != "SKILL":
+        return None, 1.0
+    return gen.choice([None, 15, 25]), gen.choice([1.0, 1.5, 2.3])
+
+
+def _battle(module, gen: random.Random):
+    player = module.FighterState(
+        "P", gen.randint(50, 300), gen.randint(0, 100), gen.randint(5, 60), gen.randint(0, 40), gen.randint(0, 40), 300
+    )
+    enemy = module.FighterState(
+        "M", gen.randint(50, 300), gen.randint(0, 100), gen.randint(5, 60), gen.randint(0, 40), gen.randint(0, 40), 300
+    )
+    return player, enemy
+
+
+def _script(gen: random.Random, turns: int) -> list[tuple]:
+    # Сценарий боя: действия и модификаторы на каждый ход, одинаковые для старого и нового ядра.
+    script = []
+    for _ in range(turns):
+        player_action, enemy_action = gen.choice(ACTIONS), gen.choice(ACTIONS)
+        script.append(
+            (player_action, enemy_action, _bonus(gen), _bonus(gen), _skill(gen, player_action), _skill(gen, enemy_action))
+        )
+    return script
+
+
+def _old_battle(seed: int, pvp: bool, behavior: str, position: str, fighters: tuple, script: list) -> list[tuple]:
+    player, enemy = fighters
+    rng = BattleRng(seed)
+    trace = []
+    with legacy_rng(rng):
+        for player_action, enemy_action, p_bonus, e_bonus, (p_cost, p_mult), (e_cost, e_mult) in script:
+            args = (player, enemy)
+            if pvp:
+                result = old_engine.process_pvp_turn(
+                    player_action, enemy_action, *args, 1, position, p_bonus, e_bonus, "", "", "",
+                    p_cost, e_cost, p_mult, e_mult,
+                )
+            else:
+                result = old_engine.process_pve_turn(
+                    player_action, *args, behavior, 1, position, p_bonus, e_bonus, "", "", "",
+                    p_cost, e_cost, p_mult, e_mult,
+                )
+            enemy_action, position = result[0], result[8]
+            trace.append((enemy_action, player.hp, player.stamina, enemy.hp, enemy.stamina, position, rng.draws))
+            if player.hp <= 0 or enemy.hp <= 0:
+                break
+    return trace
+
+
+def _new_battle(seed: int, pvp: bool, behavior: str, position: str, fighters: tuple, script: list) -> list[tuple]:
+    player, enemy = fighters
+    rng = BattleRng(seed)
+    behavior_id, position_id = behavior_code(behavior), POSITION_CODES[position]
+    trace = []
+    for player_action, enemy_action, p_bonus, e_bonus, (p_cost, p_mult), (e_cost, e_mult) in script:
+        if pvp:
+            enemy_code = ACTION_CODES[enemy_action]
+        else:
+            enemy_code = monster_action_code(behavior_id, enemy.hp, enemy.max_hp, enemy.stamina, rng)
+        player.set_modifiers(Modifiers(**p_bonus), p_cost, p_mult)
+        enemy.set_modifiers(Modifiers(**e_bonus), e_cost, e_mult)
+        position_id = engine.resolve_turn(player, enemy, ACTION_CODES[player_action], enemy_code, position_id, rng, pvp)
+        trace.append(
+            (ACTIONS[enemy_code], player.hp, player.stamina, enemy.hp, enemy.stamina, POSITIONS[position_id], rng.draws)
+        )
+        if player.hp <= 0 or enemy.hp <= 0:
+            break
+    return trace
+
+
+def check_equivalence(battles: int, turns: int = 30, seed: int = 1) -> None:
+    # Один и тот же сид и сценарий через старый process_*_turn и новый resolve_turn:
+    # HP, выносливость, позиция, действие монстра и число бросков ГСЧ после каждого хода.
+    gen = random.Random(seed)
+    for _ in range(battles):
+        battle_seed, pvp = gen.getrandbits(63), gen.random() < 0.3
+        behavior, position = gen.choice(BEHAVIORS), gen.choice(POSITIONS)
+        fighters_seed = gen.getrandbits(32)
+        script = _script(gen, turns)
+        old = _old_battle(
+            battle_seed, pvp, behavior, position, _battle(old_engine, random.Random(fighters_seed)), script
+        )
+        new = _new_battle(battle_seed, pvp, behavior, position, _battle(engine, random.Random(fighters_seed)), script)
+        assert old == new, (battle_seed, pvp, behavior, position, old, new)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Старое и новое ядро хода PvE, мкс на ход")
+    parser.add_argument("--turns", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--battles", type=int, default=2_000, help="боёв в проверке эквивалентности")
+    args = parser.parse_args(argv)
+
+    check_equivalence(args.battles)
+    print(f"equivalence: {args.battles} seeded battles match")
+    cases = [
+        ("old process_pve_turn", old_full_turn()),
+        ("new process_pve_turn", new_full_turn()),
+        ("old turn w/o log", old_kernel()),
+        ("new kernel turn", new_kernel()),
+    ]
+    for name, turn in cases:
+        random.seed(1)
+        best = min(timeit.repeat(turn, number=args.turns, repeat=args.repeat))
+        print(f"{name:24s} {best / args.turns * 1e6:6.2f} us/turn")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# Ядро хода и эффекты боя в том виде, в каком они были до переписывания:
+# эталон для бенчмарков и проверок эквивалентности из scripts/.
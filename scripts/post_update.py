@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import copy
+import json
+import sys
+from pathlib import Path
+from typing import Optional, Sequence
+
+from aiohttp import ClientSession
+
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "start_update.json"
+
+
+def updates(template: dict, count: int) -> list[dict]:
+    # Каждая копия — отдельный апдейт от отдельного игрока, иначе дедупликация их склеит.
+    result = []
+    for offset in range(count):
+        update = copy.deepcopy(template)
+        update["update_id"] += offset
+        message = update.get("message")
+        if message and offset:
+            user_id = message["from"]["id"] + offset
+            message["from"]["id"] = message["chat"]["id"] = user_id
+            message["from"]["username"] = f"{message['from'].get('username', 'user')}{offset}"
+        result.append(update)
+    return result
+
+
+async def post_all(url: str, secret: str, batch: list[dict], concurrency: int) -> dict[int, int]:
+    statuses: dict[int, int] = {}
+    limit = asyncio.Semaphore(concurrency)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+
+    async def post(session: ClientSession, update: dict) -> None:
+        async with limit, session.post(url, json=update, headers=headers) as response:
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+
+    async with ClientSession() as session:
+        await asyncio.gather(*(post(session, update) for update in batch))
+    return statuses
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Отправить записанный апдейт на вебхук бота, как это делает Telegram")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", default="", help="значение WEBHOOK_SECRET")
+    parser.add_argument("--update", type=Path, default=FIXTURE, help="JSON апдейта")
+    parser.add_argument("--count", type=int, default=1, help="сколько разных игроков прислать")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    template = json.loads(args.update.read_text())
+    statuses = asyncio.run(post_all(args.url, args.secret, updates(template, args.count), args.concurrency))
+    print(" ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    return 0 if set(statuses) == {200} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config import Config  # noqa: E402
+from app.db import close_pool, init_battle_store, init_db, init_player_cache, init_pool  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> str:
+    path = str(tmp_path / "rpg_bot.sqlite3")
+    init_pool(Config(bot_token="test", db_path=path))
+    init_player_cache(1000)
+    init_battle_store(1800.0)
+    init_db(path)
+    yield path
+    close_pool()
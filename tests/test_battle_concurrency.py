@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+
+from app import db, db_async
+from app.handlers import battle as battle_handlers
+from app.outbox import get_outbox
+
+
+TURNS = 40
+_message_ids = itertools.count(1)
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.deleted: list[int] = []
+
+    async def delete_message(self, chat_id: int, message_id: int) -> bool:
+        self.deleted.append(message_id)
+        return True
+
+
+class FakeMessage:
+    def __init__(self, chat_id: int, bot: FakeBot, sent: list[str]) -> None:
+        self.chat = SimpleNamespace(id=chat_id)
+        self.message_id = next(_message_ids)
+        self.bot = bot
+        self._sent = sent
+
+    async def answer(self, text: str, reply_markup=None) -> "FakeMessage":
+        await asyncio.sleep(0)
+        self._sent.append(text)
+        return FakeMessage(self.chat.id, self.bot, self._sent)
+
+
+class FakeCallback:
+    def __init__(self, user_id: int, data: str, bot: FakeBot, sent: list[str]) -> None:
+        self.from_user = SimpleNamespace(id=user_id)
+        self.data = data
+        self.message = FakeMessage(user_id, bot, sent)
+        self.answers: list = []
+
+    async def answer(self, text=None) -> None:
+        if self.answers:
+            raise RuntimeError("query is too old and response timeout expired or query ID is invalid")
+        self.answers.append(text)
+
+
+@pytest.fixture
+def battle_id(db_path: str) -> int:
+    conn = db.get_connection(db_path)
+    with db.transaction(conn):
+        player = db.create_player(conn, 1, "alice")
+        battle = db.create_pve_battle(conn, player, db.get_monster_by_rank(conn, "F"))
+        # Бой не должен кончиться посреди теста.
+        db.update_battle(conn, replace(battle, player_hp=10**6, enemy_hp=10**6))
+    conn.close()
+    return battle.id
+
+
+@pytest.fixture
+def no_battle_lock(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Имитируем ходы в обход лока процесса (например, из другого воркера): спасает только версия.
+    monkeypatch.setattr(db_async, "battle_lock", lambda battle_id: asyncio.Lock())
+
+
+async def _turn(db_path: str, callback: FakeCallback) -> None:
+    async with db_async.session(db_path) as conn:
+        player = await db_async.get_player_by_telegram(conn, callback.from_user.id)
+        await battle_handlers.callback_battle_action(callback, conn, player)
+
+
+async def _turns(db_path: str, callbacks: list[FakeCallback]) -> list:
+    db_async.init_executor(4)
+    try:
+        results = await asyncio.gather(*(_turn(db_path, cb) for cb in callbacks), return_exceptions=True)
+        await get_outbox().close()
+        return results
+    finally:
+        db_async.shutdown_executor()
+
+
+def _check_battle(db_path: str, battle_id: int, turns: int) -> None:
+    conn = db.get_connection(db_path)
+    try:
+        battle = db.get_battle(conn, battle_id)
+        events = db.list_battle_events(conn, battle_id)
+    finally:
+        conn.close()
+    # Начальная версия 1 — после подготовки боя в фикстуре.
+    assert battle.version == 1 + turns
+    assert battle.turn == 1 + turns
+    assert [event.turn for event in events] == list(range(1, turns + 1))
+    assert (battle.player_hp, battle.enemy_hp) == (events[-1].player_hp, events[-1].enemy_hp)
+
+
+def _prompts(sent: list[str]) -> int:
+    return sum(text == "🎯 Выбери действие:" for text in sent)
+
+
+def test_concurrent_turns_lose_no_updates(db_path: str, battle_id: int) -> None:
+    bot, sent = FakeBot(), []
+    callbacks = [FakeCallback(1, "battle:ATTACK", bot, sent) for _ in range(TURNS)]
+
+    results = asyncio.run(_turns(db_path, callbacks))
+
+    assert [r for r in results if r is not None] == []
+    _check_battle(db_path, battle_id, TURNS)
+    assert _prompts(sent) == TURNS
+    assert all(cb.answers == [None] for cb in callbacks)
+
+
+def test_turns_without_lock_commit_once_or_fail(db_path: str, battle_id: int, no_battle_lock: None) -> None:
+    bot, sent = FakeBot(), []
+    callbacks = [FakeCallback(1, "battle:ATTACK", bot, sent) for _ in range(TURNS)]
+
+    results = asyncio.run(_turns(db_path, callbacks))
+
+    failed = [r for r in results if r is not None]
+    assert all(isinstance(r, db.BattleConflict) for r in failed), failed
+    done = TURNS - len(failed)
+    _check_battle(db_path, battle_id, done)
+    # Пересчитанный ход ничего не отправляет повторно, а проигравший все попытки — вообще ничего.
+    assert _prompts(sent) == done
+    assert sum(len(cb.answers) for cb in callbacks) == done
+    assert all(len(cb.answers) <= 1 for cb in callbacks)
+
+
+def test_retried_turn_sends_once(db_path: str, battle_id: int, no_battle_lock: None, monkeypatch) -> None:
+    bot, sent = FakeBot(), []
+    slow, fast = FakeCallback(1, "battle:ATTACK", bot, sent), FakeCallback(1, "battle:DEFEND", bot, sent)
+    action = battle_handlers._battle_action
+    calls = []
+
+    async def racing_action(callback, conn, player, name):
+        await action(callback, conn, player, name)
+        calls.append(callback)
+        if callback is slow and len(calls) == 1:
+            # Пока медленный ход не закоммичен, соседний ход по тому же бою успевает первым.
+            await _turn(db_path, fast)
+
+    monkeypatch.setattr(battle_handlers, "_battle_action", racing_action)
+
+    async def scenario() -> None:
+        db_async.init_executor(2)
+        try:
+            await _turn(db_path, slow)
+            await get_outbox().close()
+        finally:
+            db_async.shutdown_executor()
+
+    asyncio.run(scenario())
+
+    assert calls == [slow, fast, slow]
+    _check_battle(db_path, battle_id, 2)
+    assert _prompts(sent) == 2
+    assert slow.answers == [None] and fast.answers == [None]
+
+
+def test_cleanup_deletes_only_after_commit(db_path: str, battle_id: int) -> None:
+    bot = FakeBot()
+    source = FakeMessage(1, bot, [])
+    conn = db.get_connection(db_path)
+    with db.transaction(conn):
+        for message_id in range(1, 6):
+            db.add_battle_message(conn, battle_id, 1, message_id)
+    conn.close()
+
+    async def cleanup(fail: bool) -> None:
+        db_async.init_executor(1)
+        try:
+            async with db_async.session(db_path) as conn:
+                await battle_handlers._cleanup_battle_messages(source, conn, battle_id, 1)
+                if fail:
+                    raise RuntimeError("handler failed after cleanup")
+        except RuntimeError:
+            pass
+        finally:
+            await get_outbox().close()
+            db_async.shutdown_executor()
+
+    asyncio.run(cleanup(fail=True))
+    assert bot.deleted == []
+    asyncio.run(cleanup(fail=False))
+    assert sorted(bot.deleted) == [1, 2, 3]
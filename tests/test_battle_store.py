@@ -0,0 +1,91 @@
+import pytest
+
+from app.battle_store import BattleConflict, BattleStore, HotBattle
+from app.models import Battle
+
+
+def _battle(battle_id: int, version: int = 0) -> Battle:
+    return Battle(
+        id=battle_id,
+        type="pve",
+        turn=1,
+        player_action=None,
+        enemy_action=None,
+        log="",
+        status="active",
+        player_id=1,
+        monster_id=1,
+        enemy_player_id=None,
+        player_hp=100,
+        player_stamina=100,
+        enemy_hp=100,
+        enemy_stamina=100,
+        position="neutral",
+        player_skill_id=None,
+        enemy_skill_id=None,
+        player_combo_json="[]",
+        enemy_combo_json="[]",
+        version=version,
+    )
+
+
+def _store(*battle_ids: int) -> BattleStore:
+    store = BattleStore()
+    store.publish([HotBattle(_battle(battle_id)) for battle_id in battle_ids], lambda: None)
+    return store
+
+
+def _turn(store: BattleStore, battle_id: int, damage: int = 10) -> HotBattle:
+    hot = store.checkout(battle_id)
+    hot.battle.enemy_hp -= damage
+    hot.changed = True
+    return hot
+
+
+def test_commit_runs_outside_store_lock() -> None:
+    store = _store(1, 2)
+    seen = {}
+
+    def commit() -> None:
+        # Пока идёт fsync одного боя, другие бои читаются без ожидания.
+        seen["other"] = store.checkout(2)
+        seen["same"] = store.checkout(1)
+
+    store.publish([_turn(store, 1)], commit)
+
+    assert seen["other"].battle.id == 2
+    assert seen["same"].battle.version == 0
+    assert store.checkout(1).battle.version == 1
+    assert store.checkout(1).battle.enemy_hp == 90
+
+
+def test_concurrent_publish_of_committing_battle_conflicts() -> None:
+    store = _store(1)
+    first, second = _turn(store, 1), _turn(store, 1, damage=20)
+    raised = []
+
+    def commit() -> None:
+        with pytest.raises(BattleConflict):
+            store.publish([second], lambda: None)
+        raised.append(True)
+
+    store.publish([first], commit)
+
+    assert raised
+    assert store.checkout(1).battle.enemy_hp == 90
+    with pytest.raises(BattleConflict):
+        store.publish([second], lambda: None)
+
+
+def test_failed_commit_releases_battle() -> None:
+    store = _store(1)
+
+    def commit() -> None:
+        raise RuntimeError("disk full")
+
+    with pytest.raises(RuntimeError):
+        store.publish([_turn(store, 1)], commit)
+
+    assert store.checkout(1).battle.version == 0
+    store.publish([_turn(store, 1)], lambda: None)
+    assert store.checkout(1).battle.version == 1
@@ -0,0 +1,8 @@
+import random
+
+from scripts.bench_effects import check_equivalence
+
+
+def test_compiled_effects_match_legacy_status() -> None:
+    # Модификаторы, урон от DoT и мгновенные эффекты навыков — те же, что у старого разбора.
+    check_equivalence(random.Random(1), 2_000)
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+
+# Запросы горячих путей и индекс, которым каждый из них обязан пользоваться.
+HOT_QUERIES = [
+    ("SELECT * FROM players WHERE username = ?", ("alice",), "idx_players_username"),
+    ("SELECT * FROM players WHERE telegram_id = ?", (1,), "sqlite_autoindex_players_1"),
+    (
+        "SELECT * FROM battle_effects WHERE battle_id = ? ORDER BY id",
+        (1,),
+        "uq_battle_effects_key",
+    ),
+    (
+        "SELECT id, message_id FROM battle_messages WHERE battle_id = ? AND chat_id = ? ORDER BY id DESC",
+        (1, 1),
+        "idx_battle_messages_battle_chat",
+    ),
+    (
+        "SELECT * FROM battle_events WHERE battle_id = ? ORDER BY turn DESC LIMIT 2",
+        (1,),
+        "PRIMARY KEY",
+    ),
+    (
+        "SELECT skill_id, level, copies FROM player_skills WHERE player_id = ? AND is_unlocked = 1",
+        (1,),
+        "sqlite_autoindex_player_skills_1",
+    ),
+]
+
+DROPPED_INDEXES = ["idx_players_level_xp", "idx_cases_lower_name", "idx_monsters_rank"]
+
+
+@pytest.fixture
+def conn(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def _plan(conn: sqlite3.Connection, sql: str, params: tuple) -> str:
+    return " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+@pytest.mark.parametrize("sql, params, index", HOT_QUERIES)
+def test_hot_query_uses_index(conn: sqlite3.Connection, sql: str, params: tuple, index: str) -> None:
+    plan = _plan(conn, sql, params)
+    assert "SEARCH" in plan and index in plan, plan
+    assert "SCAN" not in plan, plan
+
+
+def test_unused_indexes_are_dropped(conn: sqlite3.Connection) -> None:
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert not indexes & set(DROPPED_INDEXES)
@@ -0,0 +1,45 @@
+from app.db import (
+    _player_for_update,
+    create_player,
+    get_connection,
+    reward_player,
+    transaction,
+    update_player_battle,
+)
+from app.leaderboard import Leaderboard, get_leaderboard
+from app.models import LeaderboardEntry
+
+
+def _entry(player_id: int, level: int, xp: int) -> LeaderboardEntry:
+    return LeaderboardEntry(player_id, player_id + 100, f"p{player_id}", "F", level, xp)
+
+
+def test_updates_keep_order() -> None:
+    board = Leaderboard([_entry(1, 1, 0), _entry(2, 2, 0), _entry(3, 1, 50)])
+    assert [e.player_id for e in board.top(3)] == [2, 3, 1]
+
+    board.reset([_entry(1, 3, 0), _entry(2, 2, 0), _entry(3, 1, 50)])
+    assert [e.player_id for e in board.top(2)] == [1, 2]
+    assert board.position(3) == 3
+    assert [(pos, e.player_id) for pos, e in board.around(2, radius=1)] == [(1, 1), (2, 2), (3, 3)]
+
+
+def test_stale_copy_does_not_reach_leaderboard(db_path: str) -> None:
+    conn = get_connection(db_path)
+    with transaction(conn):
+        player = create_player(conn, 1, "alice")
+    conn.close()
+
+    slow, fast = get_connection(db_path), get_connection(db_path)
+    # Медленная транзакция взяла копию игрока, быстрая успела начислить опыт раньше.
+    _player_for_update(slow, player.id)
+    with transaction(fast):
+        reward_player(fast, player.id, 7, 0)
+    with transaction(slow):
+        update_player_battle(slow, player.id, None)
+    xp = slow.execute("SELECT xp FROM players WHERE id = ?", (player.id,)).fetchone()["xp"]
+    slow.close()
+    fast.close()
+
+    assert xp == 7
+    assert get_leaderboard().top(1)[0].xp == xp
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import DeleteMessage, EditMessageText, SendMessage
+
+from app.config import Config
+from app.outbox import CHAT_BURST, Outbox, get_outbox
+from app.runtime import create_bot
+
+# Запас на планировщик event loop при сравнении интервалов.
+SLACK = 0.01
+
+
+class FakeApi:
+    # Вместо сети: записывает, что и когда ушло, и умеет ответить RetryAfter.
+    def __init__(self) -> None:
+        self.sent: list[tuple[float, str, int, object]] = []
+        self.flood: dict[int, int] = {}
+        self.gate: asyncio.Event | None = None
+
+    async def __call__(self, bot: Bot, method) -> object:
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.flood.get(method.chat_id):
+            self.flood[method.chat_id] -= 1
+            raise TelegramRetryAfter(method, "Flood control exceeded", 1)
+        self.sent.append((time.monotonic(), type(method).__name__, method.chat_id, getattr(method, "text", None)))
+        return getattr(method, "text", True)
+
+    def times(self, chat_id=None) -> list[float]:
+        return [at for at, _, chat, _ in self.sent if chat_id is None or chat == chat_id]
+
+
+def _send(outbox: Outbox, api: FakeApi, bot: Bot, chat_id: int, text: str) -> asyncio.Future:
+    return outbox(api, bot, SendMessage(chat_id=chat_id, text=text))
+
+
+def test_chat_rate_after_burst() -> None:
+    async def scenario() -> tuple[Outbox, FakeApi]:
+        outbox, api, bot = Outbox(global_rate=1000, chat_rate=20), FakeApi(), Bot("123456:TEST")
+        await asyncio.gather(*(_send(outbox, api, bot, 1, str(i)) for i in range(CHAT_BURST + 5)))
+        await outbox.close()
+        return outbox, api
+
+    outbox, api = asyncio.run(scenario())
+    times = api.times(1)
+    assert [text for *_, text in api.sent] == [str(i) for i in range(CHAT_BURST + 5)]
+    # Всплеск уходит сразу, дальше — не чаще chat_rate.
+    assert times[CHAT_BURST - 1] - times[0] < 0.05
+    gaps = [b - a for a, b in zip(times[CHAT_BURST:], times[CHAT_BURST + 1:])]
+    assert min(gaps) >= 1 / 20 - SLACK
+    assert outbox.stats()["sent"] == CHAT_BURST + 5
+
+
+def test_global_rate_across_chats() -> None:
+    async def scenario() -> FakeApi:
+        outbox, api, bot = Outbox(global_rate=20, chat_rate=1000), FakeApi(), Bot("123456:TEST")
+        await asyncio.gather(*(_send(outbox, api, bot, chat_id, "hi") for chat_id in range(1, 11)))
+        await outbox.close()
+        return api
+
+    times = asyncio.run(scenario()).times()
+    assert len(times) == 10
+    assert min(b - a for a, b in zip(times, times[1:])) >= 1 / 20 - SLACK
+
+
+def test_pending_edits_are_coalesced() -> None:
+    async def scenario() -> tuple[Outbox, FakeApi, list]:
+        outbox, api, bot = Outbox(global_rate=1000, chat_rate=1000), FakeApi(), Bot("123456:TEST")
+        api.gate = asyncio.Event()
+        # Пока первый запрос в чат висит, правки одного сообщения копятся в очереди.
+        head = _send(outbox, api, bot, 1, "head")
+        await asyncio.sleep(0.01)
+        edits = [outbox(api, bot, EditMessageText(chat_id=1, message_id=5, text=f"v{i}")) for i in range(5)]
+        api.gate.set()
+        results = await asyncio.gather(head, *edits)
+        await outbox.close()
+        return outbox, api, results
+
+    outbox, api, results = asyncio.run(scenario())
+    assert [text for *_, text in api.sent] == ["head", "v4"]
+    assert results[1:] == ["v4"] * 5
+    assert outbox.stats()["coalesced"] == 4
+
+
+def test_prompts_go_before_cleanup() -> None:
+    async def scenario() -> FakeApi:
+        outbox, api, bot = Outbox(global_rate=1000, chat_rate=1000), FakeApi(), Bot("123456:TEST")
+        api.gate = asyncio.Event()
+        head = _send(outbox, api, bot, 1, "head")
+        await asyncio.sleep(0.01)
+        deletes = [outbox(api, bot, DeleteMessage(chat_id=1, message_id=m)) for m in range(3)]
+        prompt = _send(outbox, api, bot, 1, "prompt")
+        api.gate.set()
+        await asyncio.gather(head, prompt, *deletes)
+        await outbox.close()
+        return api
+
+    kinds = [kind for _, kind, _, _ in asyncio.run(scenario()).sent]
+    assert kinds == ["SendMessage", "SendMessage", "DeleteMessage", "DeleteMessage", "DeleteMessage"]
+
+
+def test_retry_after_requeues_and_blocks_only_that_chat() -> None:
+    async def scenario() -> tuple[Outbox, FakeApi, float, str]:
+        outbox, api, bot = Outbox(global_rate=1000, chat_rate=1000), FakeApi(), Bot("123456:TEST")
+        api.flood[1] = 1
+        started = time.monotonic()
+        flooded = _send(outbox, api, bot, 1, "after flood")
+        other = _send(outbox, api, bot, 2, "other chat")
+        await other
+        text = await flooded
+        await outbox.close()
+        return outbox, api, started, text
+
+    outbox, api, started, text = asyncio.run(scenario())
+    assert text == "after flood"
+    assert api.times(2)[0] - started < 0.5
+    assert api.times(1)[0] - started >= 1 - SLACK
+    assert outbox.stats()["retried"] == 1 and outbox.stats()["failed"] == 0
+
+
+def test_shards_split_bot_and_group_rates() -> None:
+    config = Config(bot_token="123456:TEST", db_path=":memory:", outbox_global_rate=30, outbox_group_rate=0.3)
+
+    async def scenario() -> Outbox:
+        bot = create_bot(config, processes=3)
+        await bot.session.close()
+        return get_outbox()
+
+    outbox = asyncio.run(scenario())
+
+    # Группу пишут игроки со всех шардов: в сумме не больше общего лимита группы.
+    assert outbox.group_rate == pytest.approx(0.1)
+    assert outbox.chat_rate == config.outbox_chat_rate
+    assert outbox._global.rate == pytest.approx(10)
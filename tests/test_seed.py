@@ -0,0 +1,42 @@
+import sqlite3
+
+from app.db import CATALOG_HASH_KEY, _set_meta, create_player, get_connection, init_db, transaction
+
+
+def _novice_cases(db_path: str) -> dict[int, int]:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            """
+            SELECT pc.player_id, pc.quantity
+            FROM player_cases pc
+            JOIN cases c ON c.id = pc.case_id
+            WHERE c.name = 'Novice Case'
+            """
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def _reseed(db_path: str) -> None:
+    conn = get_connection(db_path)
+    with transaction(conn):
+        _set_meta(conn, CATALOG_HASH_KEY, "stale")
+    conn.close()
+    init_db(db_path)
+
+
+def test_catalog_change_does_not_hand_out_novice_cases(db_path: str) -> None:
+    conn = get_connection(db_path)
+    with transaction(conn):
+        player = create_player(conn, 1, "alice")
+        # Игрок из старой базы, которому стартовый кейс не выдавали.
+        legacy = create_player(conn, 2, "bob")
+        conn.execute("DELETE FROM player_cases WHERE player_id = ?", (legacy.id,))
+    conn.close()
+
+    _reseed(db_path)
+    _reseed(db_path)
+
+    assert _novice_cases(db_path) == {player.id: 1, legacy.id: 1}
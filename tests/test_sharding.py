@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from aiogram.types import Update
+
+from app.config import Config
+from app.db import create_player, get_connection, transaction
+from app.middlewares import ConcurrencyLimitMiddleware, UserSerializationMiddleware
+from app.runtime import build_dispatcher
+from app.sharding import ShardFront
+
+# При двух шардах alice живёт на шарде 0, bob — на шарде 1.
+ALICE, BOB = 1, 4
+
+
+class FakeWriter:
+    def __init__(self) -> None:
+        self.messages: list[dict] = []
+
+    def write(self, data: bytes) -> None:
+        self.messages.append(json.loads(data))
+
+    async def drain(self) -> None:
+        pass
+
+
+@pytest.fixture
+def front(db_path: str) -> ShardFront:
+    conn = get_connection(db_path)
+    with transaction(conn):
+        create_player(conn, ALICE, "alice")
+        create_player(conn, BOB, "bob")
+    conn.close()
+    front = ShardFront(Config(bot_token="test", db_path=db_path, shards=2))
+    front._writers = {0: FakeWriter(), 1: FakeWriter()}
+    assert (front.home(ALICE), front.home(BOB)) == (0, 1)
+    return front
+
+
+def _challenge(update_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": ALICE, "type": "private"},
+                "from": {"id": ALICE, "is_bot": False, "first_name": "Alice"},
+                "text": "/duel @bob",
+            },
+        }
+    )
+
+
+async def _forwarded(front: ShardFront, shard: int) -> asyncio.Task:
+    task = asyncio.create_task(front.forward(ALICE, _challenge(10)))
+    while not front._writers[shard].messages:
+        await asyncio.sleep(0.01)
+    return task
+
+
+def test_duel_target_pinned_when_challenge_is_forwarded(front: ShardFront) -> None:
+    async def scenario() -> None:
+        task = await _forwarded(front, 0)
+        # Эха коммита ещё нет, а апдейты соперника уже идут на шард зачинщика.
+        assert front.shard_for(BOB) == 0
+        assert not task.done()
+        front._committed(0, [{"telegram_id": BOB, "current_battle_id": 7}])
+        front._done(10)
+        await task
+
+    asyncio.run(scenario())
+    assert front.shard_for(BOB) == 0
+    assert front.stats()["in_flight"] == 0
+
+
+def test_pin_dropped_when_duel_did_not_start(front: ShardFront) -> None:
+    async def scenario() -> None:
+        task = await _forwarded(front, 0)
+        assert front.shard_for(BOB) == 0
+        front._done(10)
+        await task
+
+    asyncio.run(scenario())
+    assert front.shard_for(BOB) == 1
+
+
+def test_concurrency_limit_runs_before_user_serialization() -> None:
+    dp, _ = build_dispatcher(Config(bot_token="test", db_path=":memory:"))
+    kinds = [type(middleware) for middleware in dp.update.outer_middleware]
+    assert kinds.index(ConcurrencyLimitMiddleware) < kinds.index(UserSerializationMiddleware)
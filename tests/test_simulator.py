@@ -0,0 +1,22 @@
+import pytest
+
+from app.combat.simulator import cross_check
+
+
+SEED = 20240501
+
+
+@pytest.mark.parametrize(
+    "level, rank, policy",
+    [
+        (1, "F", None),
+        (5, "D", None),
+        (5, "D", {"ATTACK": 2.0, "DEFEND": 1.0, "DODGE": 1.0, "SKILL": 1.0}),
+        (15, "C", None),
+        (30, "B", None),
+    ],
+)
+def test_vector_simulator_matches_engine(level: int, rank: str, policy) -> None:
+    # Векторный симулятор обязан совпадать со скалярным движком боя в пределах статистической погрешности.
+    passed, report = cross_check(level, rank, fights=1000, policy=policy, seed=SEED)
+    assert passed, report
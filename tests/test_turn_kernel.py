@@ -0,0 +1,9 @@
+import pytest
+
+from scripts.bench_turn_kernel import check_equivalence
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_kernel_matches_legacy_turn(seed: int) -> None:
+    # Бит в бит со старым ядром: HP, выносливость, позиция и число бросков ГСЧ после каждого хода.
+    check_equivalence(300, seed=seed)
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+from pathlib import Path
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp import ClientSession
+
+from app.config import Config
+from app.webhook import run_webhook
+
+
+FIXTURE = Path(__file__).resolve().parents[1] / "scripts" / "fixtures" / "start_update.json"
+SECRET = "s3cret"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_shutdown_waits_for_updates_in_progress() -> None:
+    config = Config(
+        bot_token="123456:TEST",
+        db_path=":memory:",
+        run_mode="webhook",
+        webhook_host="127.0.0.1",
+        webhook_port=_free_port(),
+        webhook_secret=SECRET,
+    )
+    update = json.loads(FIXTURE.read_text())
+    dp = Dispatcher()
+    started, finished = asyncio.Event(), []
+
+    @dp.message()
+    async def slow_handler(message: Message) -> None:
+        started.set()
+        await asyncio.sleep(0.5)
+        finished.append(message.text)
+
+    async def scenario() -> int:
+        bot = Bot(token=config.bot_token)
+        server = asyncio.create_task(run_webhook(bot, dp, config))
+        url = f"http://127.0.0.1:{config.webhook_port}"
+        async with ClientSession() as session:
+            for _ in range(100):
+                try:
+                    async with session.get(f"{url}/healthz"):
+                        break
+                except OSError:
+                    await asyncio.sleep(0.05)
+            headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            async with session.post(f"{url}{config.webhook_path}", json=update, headers=headers) as response:
+                status = response.status
+        # Telegram получил ответ сразу, апдейт ещё в работе — и тут приходит SIGTERM.
+        await started.wait()
+        os.kill(os.getpid(), signal.SIGTERM)
+        await server
+        await bot.session.close()
+        return status
+
+    assert asyncio.run(scenario()) == 200
+    assert finished == ["/start"]